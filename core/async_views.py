@@ -0,0 +1,207 @@
+"""Variantes asíncronas (ASGI) de los endpoints de lectura más concurridos.
+
+Usan el ORM async de Django, por lo que una consulta lenta no retiene un hilo
+del servidor. La autorización reutiliza las clases de ``core.permissions`` y
+DRF: los entitlements del plan se cargan de forma asíncrona antes de evaluar
+los permisos, así ``PlanFeaturePermission`` los lee del memo sin ir a la base.
+
+Las rutas se habilitan una a una con ``settings.ASYNC_READ_ROUTES`` y se
+publican bajo ``/api/async/``. Las respuestas son JSON simple con paginación
+keyset por ``id`` (``?after=<id>&page_size=N``).
+"""
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from django.urls import path
+from django.views import View
+from rest_framework import serializers
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .authentication import VERSION_CLAIM, acurrent_auth_version, token_user
+from .catalog import GLOBAL_SCOPE
+from .models import Inventory, Product, User
+from .pagination import KeysetPagination
+from .permissions import IsAdminClienteOrGerente
+from .reports import alow_stock_summary
+from .serializers import BranchFilterSerializer, InventorySerializer, ProductSerializer, UserMeSerializer
+from .utils import aload_entitlements, build_menu_flags, get_company_plan
+from .web import BaseDashboardView
+
+
+class NotAuthenticated(Exception):
+    pass
+
+
+async def authenticate(request):
+    """Usuario del header ``Authorization: Bearer`` o de la sesión, con su compañía.
+
+    Con un token que trae ``ver`` el usuario se arma desde los claims firmados
+    (``token_user``), igual que en ``StatelessJWTAuthentication``: la única
+    lectura es la versión vigente, normalmente desde la caché.
+    """
+
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    if header is not None:
+        raw_token = authenticator.get_raw_token(header)
+        if raw_token is None:
+            raise NotAuthenticated
+        try:
+            token = authenticator.get_validated_token(raw_token)
+        except (InvalidToken, TokenError):
+            raise NotAuthenticated
+        user_id = token.get(jwt_settings.USER_ID_CLAIM)
+        if VERSION_CLAIM in token:
+            # Misma revocación que StatelessJWTAuthentication: rol, compañía,
+            # contraseña, desactivación o cambio de suscripción suben la versión.
+            try:
+                user_id = int(user_id)
+            except (TypeError, ValueError):
+                raise NotAuthenticated
+            if token[VERSION_CLAIM] != await acurrent_auth_version(user_id):
+                raise NotAuthenticated
+            return token_user(user_id, token)
+    else:
+        session_user = await request.auser()
+        if not session_user.is_authenticated:
+            return AnonymousUser()
+        user_id = session_user.pk
+
+    user = await User.objects.select_related('company').filter(pk=user_id, is_active=True).afirst()
+    if user is None:
+        raise NotAuthenticated
+    if user.company_id:
+        user.company._entitlements = await aload_entitlements(user.company_id)
+    return user
+
+
+class AsyncReadView(View):
+    """Base de las vistas async: autentica, evalúa permisos y responde JSON."""
+
+    http_method_names = ['get']
+    permission_classes = [IsAuthenticated]
+    required_plan_feature = None
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            request.user = await authenticate(request)
+        except NotAuthenticated:
+            return JsonResponse({'detail': 'Token inválido o usuario inactivo.'}, status=401)
+
+        for permission in self.permission_classes:
+            if not permission().has_permission(request, self):
+                if not request.user.is_authenticated:
+                    return JsonResponse({'detail': 'Debe autenticarse.'}, status=401)
+                return JsonResponse({'detail': 'No tiene permiso para realizar esta acción.'}, status=403)
+
+        try:
+            data = await self.get_data(request, *args, **kwargs)
+        except serializers.ValidationError as exc:
+            return JsonResponse(exc.detail, status=400, safe=False)
+        return JsonResponse(data, safe=False)
+
+    async def get_data(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    async def keyset_page(self, request, queryset, serializer_class):
+        """Página ordenada por ``id`` a partir de ``?after=``."""
+
+        try:
+            page_size = max(1, min(
+                int(request.GET.get(KeysetPagination.page_size_query_param, KeysetPagination.page_size)),
+                KeysetPagination.max_page_size,
+            ))
+            after = int(request.GET.get('after', 0))
+        except ValueError:
+            page_size, after = KeysetPagination.page_size, 0
+
+        rows = [obj async for obj in queryset.filter(pk__gt=after).order_by('pk')[:page_size + 1]]
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        return {
+            'next_after': rows[-1].pk if has_next else None,
+            'results': serializer_class(rows, many=True).data,
+        }
+
+
+class ProductListView(AsyncReadView):
+    permission_classes = [AllowAny]
+
+    async def get_data(self, request):
+        if request.user.is_authenticated and request.user.company_id:
+            scope = request.user.company_id
+        else:
+            company_id = request.GET.get('company', '')
+            scope = int(company_id) if company_id.isdigit() else GLOBAL_SCOPE
+        queryset = Product.objects.all() if scope == GLOBAL_SCOPE else Product.objects.for_tenant(scope)
+        category = request.GET.get('category')
+        if category:
+            queryset = queryset.filter(category=category)
+        return await self.keyset_page(request, queryset, ProductSerializer)
+
+
+class InventoryListView(AsyncReadView):
+    async def get_data(self, request):
+        queryset = Inventory.objects.for_tenant(request.user.company_id).select_related('product')
+        params = BranchFilterSerializer(data=request.GET)
+        params.is_valid(raise_exception=True)
+        branch_id = params.validated_data.get('branch')
+        if branch_id:
+            queryset = queryset.filter(branch_id=branch_id)
+        return await self.keyset_page(request, queryset, InventorySerializer)
+
+
+class MeView(AsyncReadView):
+    async def get_data(self, request):
+        # El usuario del token no trae nombre ni suscripción: una lectura, como en /api/users/me/.
+        user = await User.objects.select_related('company__subscription').aget(pk=request.user.pk)
+        return UserMeSerializer(user).data
+
+
+class DashboardContextView(AsyncReadView):
+    """Datos del dashboard (plan, flags de menú y stock bajo) en JSON."""
+
+    permission_classes = [IsAuthenticated]
+
+    async def get_data(self, request):
+        user = request.user
+        plan_name = get_company_plan(user.company)
+        data = {
+            'role': user.role,
+            'plan_name': plan_name or 'Sin Plan',
+            'menu_flags': build_menu_flags(user.role, plan_name),
+        }
+        if user.role in BaseDashboardView.low_stock_roles and user.company_id:
+            data['low_stock'] = await alow_stock_summary(user.company)
+        return data
+
+
+class LowStockView(AsyncReadView):
+    permission_classes = [IsAuthenticated, IsAdminClienteOrGerente]
+
+    async def get_data(self, request):
+        return await alow_stock_summary(request.user.company, limit=100)
+
+
+ASYNC_ROUTES = {
+    'products': ('products/', ProductListView),
+    'inventory': ('inventory/', InventoryListView),
+    'me': ('users/me/', MeView),
+    'dashboard': ('dashboard/', DashboardContextView),
+    'low-stock': ('inventory/low-stock/', LowStockView),
+}
+
+
+def async_urlpatterns(enabled=None):
+    """Rutas habilitadas en ``settings.ASYNC_READ_ROUTES`` (nombres de ``ASYNC_ROUTES``)."""
+
+    enabled = settings.ASYNC_READ_ROUTES if enabled is None else enabled
+    return [
+        path(route, view.as_view(), name=f'async_{name}')
+        for name, (route, view) in ASYNC_ROUTES.items()
+        if name in enabled
+    ]
@@ -0,0 +1,196 @@
+"""Autenticación JWT sin consulta del usuario por request.
+
+El token de acceso lleva firmados el rol, la compañía, el plan vigente y la
+versión de autenticación del usuario (``User.auth_version``).
+``StatelessJWTAuthentication`` arma con esos claims un ``User`` liviano, cuya
+compañía trae los entitlements ya cargados, sin leer ``core_user`` ni la
+suscripción.
+
+La revocación se resuelve comparando el claim ``ver`` con la versión vigente,
+que se lee de la caché (``AUTH_VERSION_CACHE_TIMEOUT``) y, si no está, de la
+base. La versión sube al desactivar el usuario o cambiar su rol, compañía o
+contraseña, y también cuando cambia la suscripción de su compañía (ver
+``User.save`` y ``core.signals``). Así un token con claims obsoletos deja de
+aceptarse y el cliente debe renovarlo en ``/api/token/refresh/``.
+
+El plan firmado no sobrevive a la suscripción: el access token vence a más
+tardar al terminar el día ``end_date`` (claim ``plan_exp``).
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import Company, User
+from .utils import NO_ENTITLEMENTS, Entitlements, get_entitlements
+
+VERSION_CLAIM = 'ver'
+PLAN_EXPIRY_CLAIM = 'plan_exp'
+# Versión guardada en caché para usuarios inactivos o eliminados.
+REVOKED = -1
+
+
+def auth_version_cache_key(user_id):
+    return f"auth_version:{user_id}"
+
+
+def current_auth_version(user_id):
+    """Versión vigente del usuario (``REVOKED`` si no existe o está inactivo)."""
+
+    key = auth_version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.filter(pk=user_id, is_active=True).values_list('auth_version', flat=True).first()
+        version = REVOKED if version is None else version
+        cache.set(key, version, settings.AUTH_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+async def acurrent_auth_version(user_id):
+    """Versión asíncrona de ``current_auth_version`` (misma clave de caché)."""
+
+    key = auth_version_cache_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        version = await User.objects.filter(pk=user_id, is_active=True).values_list('auth_version', flat=True).afirst()
+        version = REVOKED if version is None else version
+        await cache.aset(key, version, settings.AUTH_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def invalidate_auth_versions(user_ids):
+    cache.delete_many([auth_version_cache_key(user_id) for user_id in user_ids])
+
+
+def plan_expiry(entitlements):
+    """Timestamp del fin del último día del plan vigente (``None`` si no vence)."""
+
+    if not entitlements.effective_plan or entitlements.end_date is None:
+        return None
+    end = datetime.combine(entitlements.end_date + timedelta(days=1), time.min)
+    return int(timezone.make_aware(end).timestamp())
+
+
+def cap_to_plan_expiry(token):
+    """Adelanta el ``exp`` del token al vencimiento del plan que firma."""
+
+    expiry = token.payload.get(PLAN_EXPIRY_CLAIM)
+    if expiry is not None and token['exp'] > expiry:
+        token['exp'] = expiry
+
+
+def user_claims(user):
+    entitlements = get_entitlements(user.company) if user.company_id else NO_ENTITLEMENTS
+    return {
+        'role': user.role,
+        'company_id': user.company_id,
+        'plan': entitlements.effective_plan,
+        PLAN_EXPIRY_CLAIM: plan_expiry(entitlements),
+        VERSION_CLAIM: user.auth_version,
+    }
+
+
+class TenantRefreshToken(RefreshToken):
+    """Refresh token cuyo access token hereda los claims de ``user_claims``."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim, value in user_claims(user).items():
+            token[claim] = value
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        cap_to_plan_expiry(access)
+        return access
+
+
+class TenantTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = TenantRefreshToken
+
+
+class TenantTokenRefreshSerializer(TokenRefreshSerializer):
+    """Renueva el access token con los claims actuales del usuario.
+
+    Rechaza refresh tokens de usuarios inactivos o emitidos antes del último
+    cambio de contraseña.
+    """
+
+    default_error_messages = {
+        'no_active_account': "No hay una cuenta activa para este token.",
+        'token_revoked': "El token fue revocado; inicie sesión nuevamente.",
+    }
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = (
+            User.objects.select_related('company__subscription')
+            .filter(pk=refresh.payload.get(jwt_settings.USER_ID_CLAIM), is_active=True)
+            .first()
+        )
+        if user is None:
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        # Un cambio de plan o rol solo exige renovar el access token; el refresh
+        # se revoca con la contraseña (CHECK_REVOKE_TOKEN) o al desactivar.
+        revoke_claim = refresh.payload.get(jwt_settings.REVOKE_TOKEN_CLAIM)
+        if revoke_claim is not None and revoke_claim != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(self.error_messages['token_revoked'], 'token_revoked')
+
+        # Sin super().validate(), que volvería a leer el usuario.
+        claims = user_claims(user)
+        access = refresh.access_token
+        for claim, value in claims.items():
+            access[claim] = value
+        cap_to_plan_expiry(access)
+        data = {'access': str(access)}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            for claim, value in claims.items():
+                refresh[claim] = value
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` que arma el usuario desde los claims del token.
+
+    Los tokens sin ``ver`` (emitidos antes de este esquema) siguen el camino
+    normal con consulta a la base.
+    """
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        try:
+            user_id = int(validated_token[jwt_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken("El token no identifica a un usuario.")
+        if validated_token[VERSION_CLAIM] != current_auth_version(user_id):
+            raise AuthenticationFailed("El token fue revocado; renuévelo.", code='token_revoked')
+        return token_user(user_id, validated_token)
+
+
+def token_user(user_id, claims):
+    """``User`` sin consultar la base, con la compañía y sus entitlements."""
+
+    user = User(pk=user_id, role=claims['role'], company_id=claims['company_id'], is_active=True)
+    user._state.adding = False
+    if user.company_id:
+        company = Company(pk=user.company_id)
+        company._state.adding = False
+        plan = claims.get('plan')
+        company._entitlements = Entitlements.from_plan(plan) if plan else NO_ENTITLEMENTS
+        user.company = company
+    return user
@@ -0,0 +1,8 @@
+"""Estadísticas compartidas por los comandos de benchmark."""
+
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
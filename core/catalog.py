@@ -0,0 +1,114 @@
+"""Versionado del catálogo de productos para GET condicional y caché de páginas.
+
+Cada compañía tiene una versión de catálogo en la caché de Django que cambia
+con cualquier escritura de ``Product`` (ver ``core.signals``). El ETag de las
+respuestas deriva de esa versión, por lo que una petición con ``If-None-Match``
+vigente se responde ``304`` sin consultar la base.
+
+``Last-Modified`` tiene resolución de segundos y la versión de nanosegundos:
+solo se envía (y solo se atiende ``If-Modified-Since``) cuando el segundo de
+la versión ya terminó. Así una edición en ese mismo segundo no puede quedar
+oculta tras un ``304`` a clientes que solo revalidan por fecha.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+# Ámbito del catálogo público sin filtro de compañía.
+GLOBAL_SCOPE = 'all'
+
+
+def catalog_version_key(scope):
+    return f'catalog_version:{scope}'
+
+
+def get_catalog_version(scope):
+    """Versión vigente del ámbito (se crea si la caché no la tiene)."""
+
+    key = catalog_version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, settings.CATALOG_VERSION_TIMEOUT):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_catalog_version(company_id):
+    """Invalida el catálogo de la compañía y el catálogo público global."""
+
+    version = time.time_ns()
+    cache.set_many(
+        {catalog_version_key(company_id): version, catalog_version_key(GLOBAL_SCOPE): version},
+        settings.CATALOG_VERSION_TIMEOUT,
+    )
+
+
+def catalog_last_modified(version, now=None):
+    """Segundo de la versión si ya es estrictamente pasado (``None`` si no)."""
+
+    last_modified = version // 1_000_000_000
+    now = time.time() if now is None else now
+    return last_modified if last_modified < int(now) else None
+
+
+class CatalogConditionalMixin:
+    """Agrega ETag/Last-Modified y caché de páginas a ``list`` y ``retrieve``.
+
+    La vista define ``get_catalog_scope()`` con la compañía (o
+    ``GLOBAL_SCOPE``) cuyo catálogo sirve.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.catalog_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.catalog_response(super().retrieve, request, *args, **kwargs)
+
+    def catalog_response(self, handler, request, *args, **kwargs):
+        scope = self.get_catalog_scope()
+        version = get_catalog_version(scope)
+        variant = hashlib.md5(
+            f'{request.get_full_path()}|{request.headers.get("Accept", "")}'.encode(),
+            usedforsecurity=False,
+        ).hexdigest()[:16]
+        etag = quote_etag(f'catalog-{scope}-{version}-{variant}')
+        last_modified = catalog_last_modified(version)
+
+        if self._not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            page_key = f'catalog_page:{etag}'
+            timeout = settings.CATALOG_PAGE_CACHE_TIMEOUT
+            data = cache.get(page_key) if timeout else None
+            if data is not None:
+                response = Response(data)
+            else:
+                response = handler(request, *args, **kwargs)
+                if timeout and response.status_code == status.HTTP_200_OK:
+                    cache.set(page_key, response.data, timeout)
+
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            visibility = 'private' if request.user.is_authenticated else 'public'
+            response['Cache-Control'] = f'{visibility}, max-age=0, must-revalidate'
+            response['Vary'] = 'Accept, Authorization'
+        return response
+
+    def _not_modified(self, request, etag, last_modified):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            candidates = [value.strip() for value in if_none_match.split(',')]
+            return etag in candidates or f'W/{etag}' in candidates or '*' in candidates
+        if last_modified is None:
+            return False
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        return if_modified_since is not None and last_modified <= if_modified_since
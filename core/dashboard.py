@@ -0,0 +1,170 @@
+"""Foto de KPIs por compañía para los dashboards web.
+
+Los bloques (ventas del día, productos más vendidos, stock bajo y órdenes
+pendientes) se calculan una vez por compañía desde los rollups y los índices
+parciales, y se guardan en la caché con semántica *stale-while-revalidate*:
+
+* Durante ``DASHBOARD_FRESH_SECONDS`` la foto se sirve tal cual.
+* Pasado ese plazo (y hasta ``DASHBOARD_STALE_SECONDS``) se sigue sirviendo la
+  foto anterior mientras un único proceso la recalcula en segundo plano; el
+  candado es un ``cache.add``. El recálculo corre en un pool de a lo más
+  ``DASHBOARD_REFRESH_WORKERS`` hilos por proceso (con ``0``, en la misma
+  request que obtuvo el candado).
+* Sin foto, quien obtiene el candado la calcula y el resto espera hasta
+  ``DASHBOARD_LOCK_WAIT`` segundos antes de calcularla por su cuenta.
+
+Cada rol ve solo sus bloques (``ROLE_BLOCKS``), pero todos comparten la misma
+foto de la compañía: un cambio de turno con cientos de vendedores entrando a la
+vez lee una sola clave de caché.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import DailyBranchSales, Order
+from .reports import low_stock_summary, product_sales
+
+logger = logging.getLogger(__name__)
+
+TOP_PRODUCTS_DAYS = 7
+TOP_PRODUCTS_LIMIT = 5
+LOCK_POLL_INTERVAL = 0.05
+
+ROLE_BLOCKS = {
+    'admin_cliente': ('today_sales', 'top_products', 'low_stock', 'pending_orders'),
+    'gerente': ('today_sales', 'top_products', 'low_stock', 'pending_orders'),
+    'vendedor': ('today_sales', 'pending_orders'),
+}
+
+
+def snapshot_cache_key(company_id):
+    return f'dashboard:{company_id}'
+
+
+def _lock_key(company_id):
+    return f'dashboard_lock:{company_id}'
+
+
+def today_sales(company_id, today):
+    totals = DailyBranchSales.objects.filter(branch__company_id=company_id, date=today).aggregate(
+        sales_count=Sum('sales_count'), units=Sum('units'), revenue=Sum('revenue')
+    )
+    return {name: value or 0 for name, value in totals.items()}
+
+
+def pending_orders(company_id):
+    return Order.objects.for_tenant(company_id).filter(status='pendiente').aggregate(
+        count=Count('id'), total=Sum('total', default=0)
+    )
+
+
+def compute_snapshot(company_id):
+    """Calcula todos los bloques de la compañía (unas cinco consultas)."""
+
+    today = timezone.localdate()
+    return {
+        'computed_at': time.time(),
+        'blocks': {
+            'today_sales': today_sales(company_id, today),
+            'top_products': list(product_sales(
+                company_id, today - timedelta(days=TOP_PRODUCTS_DAYS - 1), today, limit=TOP_PRODUCTS_LIMIT
+            )),
+            'low_stock': low_stock_summary(company_id),
+            'pending_orders': pending_orders(company_id),
+        },
+    }
+
+
+def refresh_snapshot(company_id):
+    snapshot = compute_snapshot(company_id)
+    cache.set(snapshot_cache_key(company_id), snapshot, settings.DASHBOARD_STALE_SECONDS)
+    return snapshot
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _refresh_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.DASHBOARD_REFRESH_WORKERS, thread_name_prefix='dashboard-refresh'
+            )
+        return _executor
+
+
+def _refresh_locked(company_id):
+    """Recalcula la foto y libera el candado tomado por ``get_snapshot``."""
+
+    try:
+        refresh_snapshot(company_id)
+    except Exception:
+        logger.exception("No se pudo recalcular el dashboard de la compañía %s", company_id)
+    finally:
+        cache.delete(_lock_key(company_id))
+
+
+def _refresh_in_background(company_id):
+    def run():
+        close_old_connections()
+        try:
+            _refresh_locked(company_id)
+        finally:
+            close_old_connections()
+
+    if settings.DASHBOARD_REFRESH_WORKERS <= 0:
+        _refresh_locked(company_id)
+    else:
+        _refresh_executor().submit(run)
+
+
+def get_snapshot(company_id):
+    """Foto de la compañía desde la caché, recalculándola según su antigüedad."""
+
+    key = snapshot_cache_key(company_id)
+    lock = _lock_key(company_id)
+    snapshot = cache.get(key)
+    if snapshot is not None:
+        stale = time.time() - snapshot['computed_at'] > settings.DASHBOARD_FRESH_SECONDS
+        if stale and cache.add(lock, True, settings.DASHBOARD_LOCK_TIMEOUT):
+            _refresh_in_background(company_id)
+        return snapshot
+
+    if cache.add(lock, True, settings.DASHBOARD_LOCK_TIMEOUT):
+        try:
+            return refresh_snapshot(company_id)
+        finally:
+            cache.delete(lock)
+
+    deadline = time.monotonic() + settings.DASHBOARD_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            return snapshot
+    return refresh_snapshot(company_id)
+
+
+def dashboard_kpis(company_id, role):
+    """Bloques visibles para ``role`` o ``None`` si el rol no tiene KPIs."""
+
+    blocks = ROLE_BLOCKS.get(role)
+    if not blocks or not company_id:
+        return None
+    snapshot = get_snapshot(company_id)
+    return {
+        # Versión de la foto: forma parte de la clave del fragmento cacheado.
+        'version': int(snapshot['computed_at'] * 1000),
+        **{name: snapshot['blocks'][name] for name in blocks},
+    }
@@ -0,0 +1,144 @@
+"""Exportaciones en streaming (CSV o NDJSON, opcionalmente gzip).
+
+Las filas se leen con ``QuerySet.iterator()`` (cursores del lado del servidor
+en PostgreSQL) y se escriben por bloques, de modo que la memoria usada no
+depende del rango exportado.
+"""
+
+import csv
+import json
+import zlib
+
+from django.db.models import DecimalField, ExpressionWrapper, F
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from rest_framework import serializers
+
+from .models import Inventory, PurchaseItem, SaleItem
+from .utils import local_day_range
+
+CHUNK_SIZE = 2000
+OUTPUTS = ('csv', 'ndjson')
+LINE_TOTAL = ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=14, decimal_places=0))
+
+
+class _Echo:
+    """Pseudo-buffer para ``csv.writer``: devuelve lo escrito en vez de guardarlo."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_chunks(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _ndjson_chunks(columns, rows):
+    buffer = []
+    for row in rows:
+        buffer.append(json.dumps(dict(zip(columns, row)), default=str, ensure_ascii=False) + '\n')
+        if len(buffer) >= CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31: contenedor gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def sales_rows(company, date_from=None, date_to=None):
+    queryset = SaleItem.objects.filter(sale__company=company, **local_day_range('sale__created_at', date_from, date_to))
+    columns = [
+        'sale_id', 'created_at', 'branch_id', 'branch', 'seller', 'client_id',
+        'sku', 'product', 'quantity', 'price', 'line_total',
+    ]
+    rows = queryset.order_by('sale_id', 'id').values_list(
+        'sale_id', 'sale__created_at', 'sale__branch_id', 'sale__branch__name', 'sale__user__username',
+        'sale__client_id', 'product__sku', 'product__name', 'quantity', 'price', LINE_TOTAL,
+    )
+    return columns, rows
+
+
+def purchases_rows(company, date_from=None, date_to=None):
+    queryset = PurchaseItem.objects.filter(purchase__company=company)
+    if date_from:
+        queryset = queryset.filter(purchase__date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(purchase__date__lte=date_to)
+    columns = [
+        'purchase_id', 'date', 'branch_id', 'branch', 'supplier', 'supplier_rut',
+        'sku', 'product', 'quantity', 'price', 'line_total',
+    ]
+    rows = queryset.order_by('purchase_id', 'id').values_list(
+        'purchase_id', 'purchase__date', 'purchase__branch_id', 'purchase__branch__name',
+        'purchase__supplier__name', 'purchase__supplier__rut', 'product__sku', 'product__name',
+        'quantity', 'price', LINE_TOTAL,
+    )
+    return columns, rows
+
+
+def inventory_rows(company, branch_id=None):
+    queryset = Inventory.objects.for_tenant(company)
+    if branch_id:
+        queryset = queryset.filter(branch_id=branch_id)
+    columns = ['branch_id', 'branch', 'sku', 'product', 'stock', 'reorder_point']
+    rows = queryset.order_by('branch_id', 'product_id').values_list(
+        'branch_id', 'branch__name', 'product__sku', 'product__name', 'stock', 'reorder_point',
+    )
+    return columns, rows
+
+
+def export_params(request):
+    """Lee ``output``, ``gzip``, ``date_from`` y ``date_to`` de la query string."""
+
+    params = request.query_params
+    output = params.get('output', 'csv')
+    if output not in OUTPUTS:
+        raise serializers.ValidationError(f"output debe ser uno de: {', '.join(OUTPUTS)}.")
+    dates = {}
+    for name in ('date_from', 'date_to'):
+        value = params.get(name)
+        dates[name] = parse_date(value) if value else None
+        if value and dates[name] is None:
+            raise serializers.ValidationError('Formato de fecha inválido (use AAAA-MM-DD).')
+    if dates['date_from'] and dates['date_to'] and dates['date_from'] > dates['date_to']:
+        raise serializers.ValidationError('date_from debe ser anterior o igual a date_to.')
+    return {'output': output, 'compress': params.get('gzip') in ('1', 'true'), **dates}
+
+
+def streaming_export(filename, columns, rows, output='csv', compress=False):
+    """Arma la ``StreamingHttpResponse`` para ``rows`` (un ``values_list``)."""
+
+    iterator = rows.iterator(chunk_size=CHUNK_SIZE)
+    if output == 'ndjson':
+        chunks = _ndjson_chunks(columns, iterator)
+        content_type = 'application/x-ndjson'
+    else:
+        chunks = _csv_chunks(columns, iterator)
+        content_type = 'text/csv; charset=utf-8'
+
+    filename = f'{filename}.{output}'
+    if compress:
+        chunks = _gzip(chunks)
+        content_type = 'application/gzip'
+        filename += '.gz'
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,205 @@
+"""Importación masiva del catálogo de productos desde CSV o XLSX.
+
+Todas las filas se validan en memoria con las mismas reglas que ``Product``
+(formato de SKU, precio y costo no negativos, largos de campo) y luego se
+insertan o actualizan por ``(company, sku)`` con ``bulk_create`` en lotes. Las
+filas con errores se informan con su número de línea y no se importan.
+"""
+
+import csv
+import io
+import re
+import zipfile
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .catalog import bump_catalog_version
+from .models import Product
+
+BATCH_SIZE = 1000
+REQUIRED_COLUMNS = ('sku', 'name', 'price', 'cost')
+UPDATE_FIELDS = ['name', 'description', 'price', 'cost', 'category']
+
+SKU_RE = Product.sku_validator.regex
+# Montos en pesos: "1990", "1.990" o "$ 1.990".
+AMOUNT_RE = re.compile(r'^\$?\s*(\d{1,3}(?:\.\d{3})+|\d+)$')
+MAX_LENGTHS = {name: Product._meta.get_field(name).max_length for name in ('sku', 'name', 'category')}
+MAX_AMOUNT = 10 ** Product._meta.get_field('price').max_digits
+
+
+# Planillas exportadas por Excel en Windows suelen venir en cp1252.
+CSV_ENCODINGS = ('utf-8-sig', 'cp1252')
+
+
+def read_rows(upload, filename=''):
+    """Filas del archivo como diccionarios con encabezados en minúscula.
+
+    Los CSV se leen en UTF-8 y, si no lo son, en cp1252. Un archivo ilegible,
+    un CSV mal formado o un XLSX corrupto se informa como ``ValidationError``.
+    """
+
+    if filename.lower().endswith('.xlsx'):
+        return _read_xlsx(upload)
+    reader = csv.reader(io.StringIO(_decode(upload.read()), newline=''))
+    try:
+        header = next(reader, None)
+    except csv.Error as exc:
+        raise ValidationError(f"CSV inválido en la línea {reader.line_num}: {exc}.")
+    if header is None:
+        raise ValidationError("El archivo está vacío.")
+    return _rows_from_header(header, _checked_rows(reader))
+
+
+def _decode(data):
+    for encoding in CSV_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ValidationError("No se pudo leer el archivo: use CSV en UTF-8 o Windows-1252.")
+
+
+def _checked_rows(reader):
+    try:
+        yield from reader
+    except csv.Error as exc:
+        raise ValidationError(f"CSV inválido en la línea {reader.line_num}: {exc}.")
+
+
+def _read_xlsx(upload):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ValidationError("La importación XLSX requiere el paquete openpyxl; use CSV.")
+
+    try:
+        sheet = load_workbook(upload, read_only=True, data_only=True).active
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as exc:
+        # KeyError: un ZIP válido al que le faltan las partes del libro.
+        raise ValidationError(f"El archivo no es un XLSX válido: {exc}.")
+    values = sheet.iter_rows(values_only=True)
+    header = next(values, None)
+    if header is None:
+        raise ValidationError("El archivo está vacío.")
+    rows = (['' if value is None else str(value) for value in row] for row in values)
+    return _rows_from_header(['' if value is None else str(value) for value in header], rows)
+
+
+def _rows_from_header(header, rows):
+    names = [name.strip().lower() for name in header]
+    missing = [column for column in REQUIRED_COLUMNS if column not in names]
+    if missing:
+        raise ValidationError(f"Faltan columnas obligatorias: {', '.join(missing)}.")
+    for values in rows:
+        if any(value.strip() for value in values):
+            yield dict(zip(names, values))
+        else:
+            yield None  # Mantiene la numeración de líneas.
+
+
+def _parse_amount(value, label, errors):
+    match = AMOUNT_RE.match(value.strip())
+    if not match:
+        errors.append(f"{label} debe ser un monto entero no negativo.")
+        return None
+    try:
+        amount = Decimal(match.group(1).replace('.', ''))
+    except InvalidOperation:
+        errors.append(f"{label} no es un número válido.")
+        return None
+    if amount >= MAX_AMOUNT:
+        errors.append(f"{label} excede el máximo permitido.")
+        return None
+    return amount
+
+
+def validate_rows(rows):
+    """Valida el lote completo; retorna ``(productos por SKU, errores)``."""
+
+    products = {}
+    errors = []
+    first_line = {}
+    for line, row in enumerate(rows, start=2):
+        if row is None:
+            continue
+        row_errors = []
+        sku = (row.get('sku') or '').strip().upper()
+        name = (row.get('name') or '').strip()
+        category = (row.get('category') or '').strip()
+
+        if not SKU_RE.match(sku):
+            row_errors.append("Formato SKU inválido. Use AAA-0000")
+        elif sku in first_line:
+            row_errors.append(f"SKU duplicado en el archivo (línea {first_line[sku]}).")
+        if not name:
+            row_errors.append("El nombre es obligatorio.")
+        for field, value in (('name', name), ('category', category)):
+            if len(value) > MAX_LENGTHS[field]:
+                row_errors.append(f"{field} supera {MAX_LENGTHS[field]} caracteres.")
+        price = _parse_amount(row.get('price') or '', 'El precio', row_errors)
+        cost = _parse_amount(row.get('cost') or '', 'El costo', row_errors)
+
+        if row_errors:
+            errors.append({'line': line, 'sku': sku, 'errors': row_errors})
+            continue
+        first_line[sku] = line
+        products[sku] = {
+            'line': line,
+            'name': name,
+            'description': (row.get('description') or '').strip(),
+            'price': price,
+            'cost': cost,
+            'category': category,
+        }
+    return products, errors
+
+
+def import_products(company, rows, update_existing=True, dry_run=False):
+    """Inserta o actualiza el catálogo de ``company`` a partir de ``rows``.
+
+    Retorna un resumen con ``created``, ``updated``, ``skipped`` y los errores
+    por línea. Con ``update_existing=False`` los SKU ya registrados se
+    informan como error en vez de actualizarse.
+    """
+
+    products, errors = validate_rows(rows)
+    skus = list(products)
+    existing = set()
+    for start in range(0, len(skus), BATCH_SIZE):
+        existing.update(
+            Product.objects.filter(company=company, sku__in=skus[start:start + BATCH_SIZE]).values_list('sku', flat=True)
+        )
+    if not update_existing:
+        for sku in existing:
+            errors.append({'line': products.pop(sku)['line'], 'sku': sku, 'errors': ["El SKU ya existe en el catálogo."]})
+        existing = set()
+    errors.sort(key=lambda error: error['line'])
+
+    summary = {
+        'created': len(products) - len(existing),
+        'updated': len(existing),
+        'skipped': len(errors),
+        'dry_run': dry_run,
+        'errors': errors,
+    }
+    if dry_run or not products:
+        return summary
+
+    objects = [
+        Product(company=company, sku=sku, **{field: data[field] for field in UPDATE_FIELDS})
+        for sku, data in products.items()
+    ]
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            objects,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['company', 'sku'],
+            update_fields=UPDATE_FIELDS,
+        )
+        # bulk_create no emite post_save: se invalida el catálogo una sola vez.
+        transaction.on_commit(lambda: bump_catalog_version(company.pk))
+    return summary
@@ -0,0 +1,254 @@
+import json
+import platform
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from core.benchmarking import percentile
+from core.seeding import SEED_PASSWORD, SeedSizes, seed_company, seed_super_admin
+from temucosoft.urls import router
+
+# Rol con el que se mide cada prefijo del router (el resto usa ``gerente``).
+PREFIX_ROLES = {
+    'companies': 'super_admin',
+    'subscriptions': 'super_admin',
+    'users': 'admin_cliente',
+}
+# Query string para las acciones GET que requieren parámetros.
+ACTION_QUERIES = {
+    'product-search': '?q=producto',
+    'company-rut-lookup': '?rut={company_rut}',
+    'supplier-rut-lookup': '?rut={supplier_rut}',
+    'user-rut-lookup': '?rut={user_rut}',
+}
+DASHBOARDS = {
+    'super_admin': 'dashboard_super_admin',
+    'admin_cliente': 'dashboard_admin_cliente',
+    'gerente': 'dashboard_gerente',
+    'vendedor': 'dashboard_vendedor',
+    'cliente_final': 'dashboard_cliente_final',
+}
+BENCH_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench_api'}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea una base de pruebas, la puebla con core.seeding y mide latencia (p50/p95/p99) de "
+        "cada endpoint del router, el flujo JWT y los dashboards por rol, con requests secuenciales "
+        "en el mismo proceso (el throughput concurrente lo mide bench_async_reads). "
+        "El resultado es JSON y puede compararse con una línea base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, default=1)
+        parser.add_argument('--branches', type=int, default=3)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--sales', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--purchases', type=int, default=200)
+        parser.add_argument('--iterations', type=int, default=30, help='Mediciones por endpoint.')
+        parser.add_argument('--warmup', type=int, default=3, help='Requests descartadas antes de medir.')
+        parser.add_argument('--only', help='Solo endpoints cuyo nombre contenga este texto.')
+        parser.add_argument('--output', help='Archivo donde guardar el JSON (por defecto stdout).')
+        parser.add_argument('--baseline', help='JSON de una ejecución anterior para comparar.')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Alza relativa de p95 tolerada.')
+        parser.add_argument('--min-delta-ms', type=float, default=2.0, help='Alza absoluta mínima para reportar.')
+        parser.add_argument('--keepdb', action='store_true', help='Reutiliza la base de pruebas existente.')
+
+    def handle(self, *args, **options):
+        sizes = SeedSizes(
+            branches=options['branches'],
+            products=options['products'],
+            sales=options['sales'],
+            orders=options['orders'],
+            purchases=options['purchases'],
+        )
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            # Sin control de carga: el benchmark repite el login desde la misma IP.
+            with override_settings(CACHES=BENCH_CACHES, SLOW_REQUEST_THRESHOLD_MS=0, LOGIN_THROTTLE_RATES={}):
+                report = self.run_benchmark(sizes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        payload = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                handle.write(payload + '\n')
+            self.stderr.write(f"Resultados guardados en {options['output']}")
+        else:
+            self.stdout.write(payload)
+
+        if options['baseline']:
+            self.compare(report, options)
+
+    def run_benchmark(self, sizes, options):
+        self.stderr.write(f"Poblando {options['tenants']} tenant(s) en {connection.vendor}...")
+        start = time.perf_counter()
+        companies = [seed_company(index, sizes) for index in range(1, options['tenants'] + 1)]
+        seed_super_admin()
+        seed_seconds = time.perf_counter() - start
+
+        company = companies[0]
+        self.context = {
+            'company_rut': company.rut,
+            'supplier_rut': company.supplier_set.order_by('pk').first().rut,
+            'user_rut': company.user_set.order_by('pk').first().rut,
+        }
+        usernames = {role: f'{role}1' for role in ('admin_cliente', 'gerente', 'cliente_final')}
+        usernames['super_admin'] = 'superadmin'
+        usernames['vendedor'] = company.user_set.filter(role='vendedor').order_by('pk').first().username
+
+        results = {}
+        self.options = options
+        self.measure_auth(results, usernames['gerente'])
+        clients = {role: self.api_client(username) for role, username in usernames.items()}
+        self.measure_router(results, clients, company)
+        self.measure_dashboards(results, usernames)
+
+        return {
+            'meta': {
+                'vendor': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'timestamp': timezone.now().isoformat(),
+                'iterations': options['iterations'],
+                'tenants': options['tenants'],
+                'sizes': vars(sizes),
+                'seed_seconds': round(seed_seconds, 2),
+            },
+            'results': results,
+        }
+
+    def api_client(self, username):
+        client = Client()
+        response = client.post(
+            '/api/token/', {'username': username, 'password': SEED_PASSWORD}, content_type='application/json'
+        )
+        if response.status_code != 200:
+            raise CommandError(f"No se pudo obtener el token de {username}: {response.status_code}")
+        client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {response.json()['access']}"
+        return client
+
+    def measure(self, results, name, request):
+        """Ejecuta ``request()`` (que retorna la respuesta) y guarda sus estadísticas."""
+
+        if self.options['only'] and self.options['only'] not in name:
+            return
+        for _ in range(self.options['warmup']):
+            request()
+        timings = []
+        statuses = {}
+        for _ in range(self.options['iterations']):
+            start = time.perf_counter()
+            response = request()
+            if response.streaming:
+                b''.join(response.streaming_content)
+            timings.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        timings.sort()
+        results[name] = {
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            # Requests por segundo de un único cliente secuencial (1 / media).
+            'sequential_rps': round(len(timings) / (sum(timings) / 1000), 1),
+            'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        }
+        self.stderr.write(f"  {name:<40} p50 {results[name]['p50_ms']:>8.2f} ms  p95 {results[name]['p95_ms']:>8.2f} ms")
+
+    def measure_auth(self, results, username):
+        client = Client()
+        credentials = {'username': username, 'password': SEED_PASSWORD}
+        self.measure(
+            results, 'jwt:obtain',
+            lambda: client.post('/api/token/', credentials, content_type='application/json'),
+        )
+        refresh = client.post('/api/token/', credentials, content_type='application/json').json()['refresh']
+        self.measure(
+            results, 'jwt:refresh',
+            lambda: client.post('/api/token/refresh/', {'refresh': refresh}, content_type='application/json'),
+        )
+        self.measure(results, 'web:login', lambda: Client().post(reverse('login'), credentials))
+
+    def measure_router(self, results, clients, company):
+        for prefix, viewset, basename in router.registry:
+            client = clients[PREFIX_ROLES.get(prefix, 'gerente')]
+            if hasattr(viewset, 'list'):
+                list_url = f'/api/{prefix}/'
+                self.measure(results, f'{basename}:list', lambda url=list_url: client.get(url))
+                detail_id = self.first_id(client.get(list_url))
+                if detail_id is not None and hasattr(viewset, 'retrieve'):
+                    detail_url = f'/api/{prefix}/{detail_id}/'
+                    self.measure(results, f'{basename}:retrieve', lambda url=detail_url: client.get(url))
+
+            for extra in viewset.get_extra_actions():
+                if extra.detail or 'get' not in extra.mapping:
+                    continue
+                name = f"{basename}-{extra.url_name}"
+                query = ACTION_QUERIES.get(name, '').format(**self.context)
+                url = f'/api/{prefix}/{extra.url_path}/{query}'
+                self.measure(results, f'{basename}:{extra.url_name}', lambda url=url: client.get(url))
+
+        branch = company.branch_set.order_by('pk').first()
+        product = company.product_set.order_by('pk').first()
+        gerente = clients['gerente']
+        payload = {'branch': branch.pk, 'items': [{'product': product.pk, 'quantity': 1, 'price': int(product.price)}]}
+        # Stock suficiente para todas las ventas medidas.
+        branch.inventory_set.filter(product=product).update(stock=10 ** 6)
+        self.measure(
+            results, 'sale:create',
+            lambda: gerente.post('/api/sales/', payload, content_type='application/json'),
+        )
+
+    def measure_dashboards(self, results, usernames):
+        for role, url_name in DASHBOARDS.items():
+            client = Client()
+            client.login(username=usernames[role], password=SEED_PASSWORD)
+            url = reverse(url_name)
+            self.measure(results, f'dashboard:{role}', lambda url=url, client=client: client.get(url))
+
+    def first_id(self, response):
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        rows = data.get('results', data) if isinstance(data, dict) else data
+        if isinstance(rows, list) and rows and isinstance(rows[0], dict):
+            return rows[0].get('id')
+        return None
+
+    def compare(self, report, options):
+        with open(options['baseline'], encoding='utf-8') as handle:
+            baseline = json.load(handle)['results']
+
+        regressions = []
+        self.stderr.write(f"\n{'endpoint':<40} {'base p95':>10} {'p95':>10} {'cambio':>8}")
+        for name, current in report['results'].items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            change = (current['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] if previous['p95_ms'] else 0
+            regressed = (
+                change > options['tolerance'] and current['p95_ms'] - previous['p95_ms'] > options['min_delta_ms']
+            )
+            flag = ' REGRESIÓN' if regressed else ''
+            self.stderr.write(
+                f"{name:<40} {previous['p95_ms']:>10.2f} {current['p95_ms']:>10.2f} {change:>+8.0%}{flag}"
+            )
+            if regressed:
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} endpoint(s) con regresión de p95: {', '.join(regressions)}")
+        self.stderr.write(self.style.SUCCESS("Sin regresiones respecto de la línea base."))
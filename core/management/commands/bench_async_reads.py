@@ -0,0 +1,97 @@
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.async_views import ASYNC_ROUTES
+from core.benchmarking import percentile
+
+# Equivalente síncrono (DRF) de cada ruta async; ``dashboard`` no tiene versión JSON.
+SYNC_ROUTES = {
+    'products': '/api/products/',
+    'inventory': '/api/inventory/',
+    'me': '/api/users/me/',
+    'low-stock': '/api/inventory/low-stock/',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el throughput de las lecturas síncronas (WSGI/DRF) con las rutas de "
+        "/api/async/ bajo clientes concurrentes. Requiere los servidores levantados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync-url', default='http://127.0.0.1:8000', help='Base del servidor WSGI.')
+        parser.add_argument('--async-url', default=None, help='Base del servidor ASGI (por defecto --sync-url).')
+        parser.add_argument('--username', help='Usuario para obtener un JWT en /api/token/.')
+        parser.add_argument('--password', help='Contraseña del usuario.')
+        parser.add_argument('--token', help='JWT de acceso ya emitido.')
+        parser.add_argument('--concurrency', type=int, default=20, help='Clientes simultáneos.')
+        parser.add_argument('--requests', type=int, default=200, help='Peticiones por ruta y modo.')
+        parser.add_argument('--routes', default=','.join(ASYNC_ROUTES), help='Rutas a medir (separadas por coma).')
+
+    def handle(self, *args, **options):
+        sync_url = options['sync_url'].rstrip('/')
+        async_url = (options['async_url'] or sync_url).rstrip('/')
+        token = options['token'] or self.obtain_token(sync_url, options['username'], options['password'])
+        headers = {'Authorization': f'Bearer {token}', 'Accept': 'application/json'}
+
+        results = {}
+        for name in options['routes'].split(','):
+            if name not in ASYNC_ROUTES:
+                raise CommandError(f"Ruta desconocida: {name}")
+            modes = {'async': f"{async_url}/api/async/{ASYNC_ROUTES[name][0]}"}
+            if name in SYNC_ROUTES:
+                modes['sync'] = f"{sync_url}{SYNC_ROUTES[name]}"
+            for mode, url in sorted(modes.items(), reverse=True):
+                results[f'{name}:{mode}'] = self.measure(url, headers, options['requests'], options['concurrency'])
+
+        self.stdout.write(f"{'ruta':<20} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errores':>8}")
+        for key, row in results.items():
+            self.stdout.write(
+                f"{key:<20} {row['throughput']:>9.1f} {row['p50']:>9.1f} {row['p95']:>9.1f} {row['errors']:>8}"
+            )
+
+    def obtain_token(self, base_url, username, password):
+        if not username or not password:
+            raise CommandError("Indique --token o --username y --password.")
+        request = urllib.request.Request(
+            f"{base_url}/api/token/",
+            data=json.dumps({'username': username, 'password': password}).encode(),
+            headers={'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return json.load(response)['access']
+        except (urllib.error.URLError, KeyError) as exc:
+            raise CommandError(f"No se pudo obtener el token: {exc}")
+
+    def measure(self, url, headers, total, concurrency):
+        def fetch(_):
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as response:
+                    response.read()
+                    ok = response.status == 200
+            except urllib.error.URLError:
+                ok = False
+            return ok, (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(fetch, range(total)))
+        elapsed = time.perf_counter() - start
+
+        timings = sorted(ms for ok, ms in samples if ok)
+        if not timings:
+            return {'throughput': 0.0, 'p50': 0.0, 'p95': 0.0, 'errors': total}
+        return {
+            'throughput': len(timings) / elapsed,
+            'p50': percentile(timings, 0.50),
+            'p95': percentile(timings, 0.95),
+            'errors': total - len(timings),
+        }
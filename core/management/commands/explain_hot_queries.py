@@ -0,0 +1,104 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+
+from core.benchmarking import percentile
+from core.models import Company, Inventory, Order, Product, Purchase, Sale
+from core.seeding import SeedSizes, seed_company
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta las consultas más frecuentes de la API con EXPLAIN y mide su tiempo. "
+        "Con --seed genera un tenant sintético dentro de una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Compañía a usar (por defecto la con más ventas).')
+        parser.add_argument('--seed', type=int, default=0, help='Ventas a generar en un tenant temporal.')
+        parser.add_argument('--repeat', type=int, default=20, help='Ejecuciones por consulta para medir.')
+        parser.add_argument('--analyze', action='store_true', help='Usa EXPLAIN ANALYZE (PostgreSQL).')
+
+    def handle(self, *args, **options):
+        if not options['seed']:
+            self.run_queries(self.get_company(options['company']), options)
+            return
+
+        try:
+            with transaction.atomic():
+                sizes = SeedSizes(
+                    branches=3,
+                    products=max(options['seed'] // 10, 50),
+                    sales=options['seed'],
+                    orders=options['seed'] // 2,
+                    purchases=options['seed'] // 10,
+                )
+                self.stdout.write(f"Generando tenant temporal ({sizes.sales} ventas)...")
+                company = seed_company(900_000, sizes)
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE')
+                self.run_queries(company, options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Datos temporales revertidos.")
+
+    def get_company(self, company_id):
+        if company_id:
+            try:
+                return Company.objects.get(pk=company_id)
+            except Company.DoesNotExist:
+                raise CommandError(f"No existe la compañía {company_id}.")
+        company = (
+            Company.objects.annotate(sales=Count('branch__sale')).order_by('-sales').first()
+        )
+        if company is None:
+            raise CommandError("No hay datos: use --seed o el comando seed_data.")
+        return company
+
+    def hot_queries(self, company):
+        """Consultas equivalentes a las de los ViewSets en core/views.py."""
+
+        branch = company.branch_set.order_by('pk').first()
+        product = Product.objects.filter(company=company).order_by('pk').first()
+        page = 50
+        queries = {
+            'sales_list': Sale.objects.for_tenant(company).order_by('-created_at', '-id')[:page],
+            'orders_list': Order.objects.filter(company=company).order_by('-created_at', '-id')[:page],
+            'orders_pending': Order.objects.filter(company=company, status='pendiente').order_by('-created_at')[:page],
+            'products_by_category': Product.objects.filter(company=company, category='Bebidas').order_by('id')[:page],
+            'inventory_list': Inventory.objects.for_tenant(company).select_related('product').order_by('id')[:page],
+            'purchases_list': Purchase.objects.for_tenant(company).order_by('-date', '-id')[:page],
+        }
+        if branch:
+            queries['sales_by_branch'] = Sale.objects.filter(branch=branch).order_by('-created_at', '-id')[:page]
+            queries['purchases_by_branch'] = Purchase.objects.filter(branch=branch).order_by('-date', '-id')[:page]
+        if product:
+            queries['product_by_sku'] = Product.objects.filter(company=company, sku=product.sku)
+        return queries
+
+    def run_queries(self, company, options):
+        explain_options = {'analyze': True} if options['analyze'] and connection.vendor == 'postgresql' else {}
+        self.stdout.write(f"Compañía {company.pk} ({company.name}) en {connection.vendor}\n")
+
+        for name, queryset in self.hot_queries(company).items():
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write(
+                f"p50 {percentile(timings, 0.50):.2f} ms · p95 {percentile(timings, 0.95):.2f} ms · "
+                f"máx {timings[-1]:.2f} ms "
+                f"({options['repeat']} ejecuciones)\n"
+            )
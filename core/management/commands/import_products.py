@@ -0,0 +1,42 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import import_products, read_rows
+from core.models import Company
+
+
+class Command(BaseCommand):
+    help = "Importa o actualiza el catálogo de una compañía desde un archivo CSV o XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archivo CSV (UTF-8) o XLSX con columnas sku, name, price, cost.')
+        parser.add_argument('--company', type=int, required=True, help='ID de la compañía destino.')
+        parser.add_argument('--dry-run', action='store_true', help='Solo valida, sin escribir.')
+        parser.add_argument('--no-update', action='store_true', help='Informa los SKU existentes como error.')
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(pk=options['company'])
+        except Company.DoesNotExist:
+            raise CommandError(f"No existe la compañía {options['company']}.")
+
+        try:
+            with open(options['path'], 'rb') as upload:
+                summary = import_products(
+                    company,
+                    read_rows(upload, options['path']),
+                    update_existing=not options['no_update'],
+                    dry_run=options['dry_run'],
+                )
+        except OSError as exc:
+            raise CommandError(f"No se pudo leer el archivo: {exc}")
+        except ValidationError as exc:
+            raise CommandError(' '.join(exc.messages))
+
+        for error in summary['errors']:
+            self.stderr.write(f"Línea {error['line']} ({error['sku'] or 'sin SKU'}): {' '.join(error['errors'])}")
+        prefix = 'Validación' if summary['dry_run'] else 'Importación'
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}: {summary['created']} nuevos, {summary['updated']} actualizados, "
+            f"{summary['skipped']} con errores."
+        ))
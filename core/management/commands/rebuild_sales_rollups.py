@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.models import Company
+from core.reports import rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los rollups diarios de ventas (sucursal y producto) desde SaleItem."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='Fecha inicial (YYYY-MM-DD).')
+        parser.add_argument('--to', dest='date_to', help='Fecha final (YYYY-MM-DD).')
+        parser.add_argument('--company', type=int, help='ID de la compañía a reconstruir.')
+
+    def handle(self, *args, **options):
+        date_from = self._parse(options['date_from'])
+        date_to = self._parse(options['date_to'])
+        company = None
+        if options['company']:
+            try:
+                company = Company.objects.get(pk=options['company'])
+            except Company.DoesNotExist:
+                raise CommandError(f"No existe la compañía {options['company']}.")
+
+        created = rebuild_sales_rollups(date_from, date_to, company)
+        self.stdout.write(self.style.SUCCESS(f"Rollups reconstruidos: {created} filas por producto."))
+
+    def _parse(self, value):
+        if not value:
+            return None
+        date = parse_date(value)
+        if date is None:
+            raise CommandError(f"Fecha inválida: {value}")
+        return date
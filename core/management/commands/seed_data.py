@@ -0,0 +1,109 @@
+import multiprocessing
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from core.models import PLANES, Inventory, Order, OrderItem, Product, Purchase, PurchaseItem, Sale, SaleItem
+from core.reports import rebuild_sales_rollups
+from core.seeding import SEED_PASSWORD, SeedSizes, seed_company, seed_super_admin
+
+PLAN_NAMES = [name for name, _label in PLANES]
+# Tablas contadas para el resumen de filas por segundo.
+COUNTED_MODELS = (Product, Inventory, Sale, SaleItem, Purchase, PurchaseItem, Order, OrderItem)
+
+
+def _plan_for(plan, index):
+    """``mixto`` reparte los planes en rotación entre las compañías."""
+
+    return PLAN_NAMES[index % len(PLAN_NAMES)] if plan == 'mixto' else plan
+
+
+def _seed_tenant(args):
+    index, sizes, plan, seed, base_date, skip_rollups = args
+    start = time.perf_counter()
+    company = seed_company(index, sizes, plan_name=_plan_for(plan, index), seed=seed, base_date=base_date)
+    if not skip_rollups:
+        rebuild_sales_rollups(company=company)
+    return index, company.pk, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera compañías sintéticas completas (suscripción, usuarios por rol con RUT válido, "
+        "sucursales dentro del límite del plan, catálogo, inventario, proveedores, compras, "
+        "ventas y órdenes). Los datos dependen solo de --seed, --base-date y del índice de cada compañía."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=1)
+        parser.add_argument('--start-index', type=int, default=1, help='Índice de la primera compañía.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--plan', default='Premium', choices=PLAN_NAMES + ['mixto'])
+        parser.add_argument('--branches', type=int, default=3)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--suppliers', type=int, default=5)
+        parser.add_argument('--sales', type=int, default=5000)
+        parser.add_argument('--purchases', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--items-per-document', type=int, default=3)
+        parser.add_argument('--days', type=int, default=365, help='Días de historia de los movimientos.')
+        parser.add_argument(
+            '--base-date', type=date.fromisoformat, help='Último día de la historia (AAAA-MM-DD; por defecto hoy).'
+        )
+        parser.add_argument('--workers', type=int, default=1, help='Procesos en paralelo (uno por compañía).')
+        parser.add_argument('--skip-rollups', action='store_true', help='No recalcula los rollups de ventas.')
+
+    def handle(self, *args, **options):
+        if options['companies'] < 1 or options['start_index'] < 1:
+            raise CommandError("--companies y --start-index deben ser positivos.")
+        sizes = SeedSizes(
+            branches=options['branches'],
+            products=options['products'],
+            suppliers=options['suppliers'],
+            purchases=options['purchases'],
+            sales=options['sales'],
+            orders=options['orders'],
+            items_per_document=options['items_per_document'],
+            days=options['days'],
+        )
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stderr.write("SQLite no admite escrituras concurrentes: se usa un solo proceso.")
+            workers = 1
+
+        indexes = range(options['start_index'], options['start_index'] + options['companies'])
+        tasks = [
+            (index, sizes, options['plan'], options['seed'], options['base_date'], options['skip_rollups'])
+            for index in indexes
+        ]
+        rows_before = self.count_rows()
+        start = time.perf_counter()
+        seed_super_admin()
+
+        if workers > 1:
+            # Cada proceso hijo debe abrir su propia conexión.
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                for index, company_id, seconds in pool.imap_unordered(_seed_tenant, tasks):
+                    self.stdout.write(f"Compañía {index} (id {company_id}) en {seconds:.1f} s")
+        else:
+            for task in tasks:
+                index, company_id, seconds = _seed_tenant(task)
+                self.stdout.write(f"Compañía {index} (id {company_id}) en {seconds:.1f} s")
+
+        if connection.vendor == 'postgresql':
+            # Estadísticas del planificador al día tras la carga masiva.
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        elapsed = time.perf_counter() - start
+        rows = self.count_rows() - rows_before
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['companies']} compañía(s), {rows} filas en {elapsed:.1f} s "
+            f"({rows / elapsed:,.0f} filas/s). Contraseña de los usuarios: {SEED_PASSWORD}"
+        ))
+
+    def count_rows(self):
+        return sum(model.objects.count() for model in COUNTED_MODELS)
@@ -0,0 +1,319 @@
+"""Métricas de rendimiento por request en formato de texto de Prometheus.
+
+``MetricsMiddleware`` mide cada request (WSGI o ASGI) y etiqueta las series
+con la ruta (``view_name`` de la URL) y la acción del ViewSet. Las consultas
+SQL se cuentan con un ``execute_wrapper`` instalado en cada conexión (ver
+``install``, llamado desde ``CoreConfig.ready``) y la serialización de las
+respuestas de DRF (``serializer.data``) con ``SerializerTimingMixin``.
+
+El registro vive en memoria del proceso: con varios workers cada uno expone
+sus propias series en ``/metrics`` y Prometheus las distingue por instancia.
+Fuera de ``DEBUG`` el endpoint exige ``METRICS_TOKEN``.
+"""
+
+import contextvars
+import hmac
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+logger = logging.getLogger('core.slow_requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+MAX_CAPTURED_QUERIES = 50
+
+REGISTRY = []
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        for key, counts, total, count in items:
+            labels = dict(zip(self.labelnames, key))
+            for bound, cumulative in zip(self.buckets, counts):
+                yield f'{self.name}_bucket', {**labels, 'le': _format_number(bound)}, cumulative
+            yield f'{self.name}_bucket', {**labels, 'le': '+Inf'}, count
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+
+REQUEST_LABELS = ('route', 'action', 'method', 'status')
+ROUTE_LABELS = ('route', 'action')
+
+REQUEST_DURATION = Histogram(
+    'temucosoft_http_request_duration_seconds', 'Duración de la request.', REQUEST_LABELS,
+)
+RESPONSE_SIZE = Histogram(
+    'temucosoft_http_response_size_bytes', 'Tamaño del cuerpo de la respuesta.', ROUTE_LABELS, SIZE_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'temucosoft_db_queries_per_request', 'Consultas SQL por request.', ROUTE_LABELS, QUERY_BUCKETS,
+)
+DB_DURATION = Histogram(
+    'temucosoft_db_duration_seconds', 'Tiempo total en la base por request.', ROUTE_LABELS,
+)
+SERIALIZER_DURATION = Histogram(
+    'temucosoft_serializer_duration_seconds', 'Tiempo de serializer.data en la respuesta DRF.', ROUTE_LABELS,
+)
+SLOW_REQUESTS = Counter(
+    'temucosoft_slow_requests_total', 'Requests sobre SLOW_REQUEST_THRESHOLD_MS.', ROUTE_LABELS,
+)
+
+
+@dataclass
+class RequestStats:
+    capture_sql: bool = False
+    queries: int = 0
+    db_time: float = 0.0
+    serializer_time: float = 0.0
+    statements: list = field(default_factory=list)
+
+
+_current = contextvars.ContextVar('temucosoft_request_stats', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats.queries += 1
+        stats.db_time += elapsed
+        if stats.capture_sql and len(stats.statements) < MAX_CAPTURED_QUERIES:
+            stats.statements.append((elapsed, sql))
+
+
+def _install_query_wrapper(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+@contextmanager
+def timed_serialization():
+    """Suma el tiempo del bloque a la serialización de la request en curso."""
+
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_time += time.perf_counter() - start
+
+
+class SerializerTimingMixin:
+    """``list`` y ``retrieve`` de DRF midiendo ``serializer.data``.
+
+    Las acciones propias usan ``serialize()`` para quedar en la misma serie.
+    """
+
+    def serialize(self, instance, **kwargs):
+        with timed_serialization():
+            return self.get_serializer(instance, **kwargs).data
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize(page, many=True))
+        return Response(self.serialize(queryset, many=True))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.serialize(self.get_object()))
+
+
+def install():
+    """Instala el wrapper SQL en cada conexión."""
+
+    from django.db import connections
+
+    connection_created.connect(_install_query_wrapper, dispatch_uid='core.metrics.query_wrapper')
+    # Conexiones ya abiertas antes de ready() (p. ej. en el test runner).
+    for connection in connections.all(initialized_only=True):
+        _install_query_wrapper(None, connection)
+
+
+def route_labels(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return {'route': 'unmatched', 'action': ''}
+    actions = getattr(match.func, 'actions', None) or {}
+    return {'route': match.view_name or match.route, 'action': actions.get(request.method.lower(), '')}
+
+
+class MetricsMiddleware:
+    """Registra latencia, consultas, serialización y tamaño por ruta y acción.
+
+    Admite la cadena síncrona y la asíncrona, así bajo ASGI no agrega un
+    cambio de hilo a cada request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, start)
+
+    async def __acall__(self, request):
+        stats, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, start)
+
+    def start(self):
+        stats = RequestStats(capture_sql=settings.SLOW_REQUEST_THRESHOLD_MS > 0)
+        return stats, _current.set(stats), time.perf_counter()
+
+    def finish(self, request, response, stats, start):
+        elapsed = time.perf_counter() - start
+        labels = route_labels(request)
+        REQUEST_DURATION.observe(elapsed, method=request.method, status=response.status_code, **labels)
+        DB_QUERIES.observe(stats.queries, **labels)
+        DB_DURATION.observe(stats.db_time, **labels)
+        SERIALIZER_DURATION.observe(stats.serializer_time, **labels)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), **labels)
+
+        threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+        if threshold and elapsed * 1000 >= threshold:
+            SLOW_REQUESTS.inc(**labels)
+            self.log_slow_request(request, labels, elapsed, stats)
+        return response
+
+    def log_slow_request(self, request, labels, elapsed, stats):
+        slowest = sorted(stats.statements, key=lambda row: row[0], reverse=True)[:5]
+        logger.warning(
+            "Request lenta %s %s (%s) %.0f ms: %d consultas en %.0f ms, serialización %.0f ms\n%s",
+            request.method,
+            request.path,
+            labels['route'],
+            elapsed * 1000,
+            stats.queries,
+            stats.db_time * 1000,
+            stats.serializer_time * 1000,
+            '\n'.join(f'  {duration * 1000:.1f} ms  {sql}' for duration, sql in slowest),
+        )
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render():
+    """Todas las series del registro en formato de exposición de Prometheus."""
+
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in metric.samples():
+            rendered = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f'{name}{{{rendered}}} {_format_number(value)}' if rendered else f'{name} {_format_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Endpoint ``/metrics``; exige ``Authorization: Bearer <METRICS_TOKEN>``.
+
+    Sin token configurado solo responde con ``DEBUG`` activo.
+    """
+
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(
+                'Configure METRICS_TOKEN para exponer las métricas.\n', status=403, content_type='text/plain'
+            )
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse('No autorizado.\n', status=401, content_type='text/plain')
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,88 @@
+"""Operaciones de migración para tablas grandes en producción (PostgreSQL).
+
+Crean índices sin bloquear las escrituras (``CONCURRENTLY``) y en los demás
+motores se comportan como las operaciones estándar de Django. Las migraciones
+que las usan deben declarar ``atomic = False``.
+"""
+
+from django.db import migrations
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """``AddIndex`` que en PostgreSQL usa ``CREATE INDEX CONCURRENTLY``.
+
+    Así la creación no bloquea las escrituras sobre tablas grandes. En otros
+    motores se comporta como ``AddIndex``. Requiere una migración no atómica.
+    """
+
+    atomic = False
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.add_index(model, self.index, concurrently=True)
+        else:
+            schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.remove_index(model, self.index, concurrently=True)
+        else:
+            schema_editor.remove_index(model, self.index)
+
+
+class AddUniqueConstraintConcurrently(migrations.AddConstraint):
+    """``AddConstraint`` que en PostgreSQL arma primero el índice único con
+    ``CONCURRENTLY`` y luego lo adopta como restricción (``USING INDEX``)."""
+
+    atomic = False
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        quote = schema_editor.quote_name
+        table = quote(model._meta.db_table)
+        name = quote(self.constraint.name)
+        columns = ', '.join(quote(model._meta.get_field(field).column) for field in self.constraint.fields)
+        schema_editor.execute(f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})')
+        schema_editor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}')
+
+
+class AlterFieldNotNull(migrations.AlterField):
+    """``AlterField`` que pasa una columna a ``NOT NULL`` sin recorrer la tabla bloqueada.
+
+    En PostgreSQL agrega ``CHECK (columna IS NOT NULL) NOT VALID``, lo valida
+    (solo bloquea otros cambios de esquema, no las escrituras) y recién entonces
+    ejecuta ``SET NOT NULL``, que usa el CHECK validado en vez de recorrer la
+    tabla con ``ACCESS EXCLUSIVE``; al final quita el CHECK. Solo cambia la
+    nulabilidad: el resto de la definición del campo debe ser igual. En otros
+    motores se comporta como ``AlterField``.
+    """
+
+    atomic = False
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        quote = schema_editor.quote_name
+        table = quote(model._meta.db_table)
+        column = model._meta.get_field(self.name).column
+        check = quote(f'{model._meta.db_table}_{column}_not_null')
+        # IF EXISTS: un intento anterior pudo dejar el CHECK sin validar.
+        schema_editor.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {check}')
+        column = quote(column)
+        schema_editor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {check} CHECK ({column} IS NOT NULL) NOT VALID')
+        schema_editor.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {check}')
+        schema_editor.execute(f'ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL')
+        schema_editor.execute(f'ALTER TABLE {table} DROP CONSTRAINT {check}')
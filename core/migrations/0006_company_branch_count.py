@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:34
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_branch_count(apps, schema_editor):
+    Branch = apps.get_model('core', 'Branch')
+    Company = apps.get_model('core', 'Company')
+    counts = (
+        Branch.objects.filter(company=OuterRef('pk'))
+        .order_by()
+        .values('company')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Company.objects.update(branch_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_sale_client_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='branch_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_branch_count, migrations.RunPython.noop),
+    ]
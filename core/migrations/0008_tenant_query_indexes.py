@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:37
+
+from django.db import migrations, models
+from django.db.models import Count
+
+from core.migration_operations import AddIndexConcurrently, AddUniqueConstraintConcurrently
+
+UNIQUE_SKU_INDEX = 'product_company_sku_uniq'
+
+
+def check_duplicate_skus(apps, schema_editor):
+    """Falla con instrucciones si hay SKU repetidos dentro de una compañía.
+
+    Los duplicados no se fusionan automáticamente: ventas, compras, órdenes e
+    inventario los referencian y la decisión de cuál conservar es del cliente.
+    """
+
+    Product = apps.get_model('core', 'Product')
+    duplicates = list(
+        Product.objects.using(schema_editor.connection.alias)
+        .values('company_id', 'sku')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .order_by('company_id', 'sku')[:20]
+    )
+    if duplicates:
+        listed = ', '.join(f"compañía {row['company_id']}: {row['sku']} ({row['count']})" for row in duplicates)
+        raise RuntimeError(
+            f"No se puede crear {UNIQUE_SKU_INDEX}: hay SKU repetidos ({listed}). Renombre o fusione "
+            "esos productos (p. ej. UPDATE core_product SET sku = ... WHERE id = ...) y vuelva a migrar."
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0007_sales_rollups'),
+    ]
+
+    operations = [
+        # Antes de cualquier índice: sin transacción, los ya creados quedarían
+        # confirmados y el reintento fallaría con "relation already exists".
+        migrations.RunPython(check_duplicate_skus, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['company', 'status', 'created_at'], name='order_company_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['company', 'created_at'], name='order_company_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['company', 'category'], name='product_company_category_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='purchase',
+            index=models.Index(fields=['branch', 'date'], name='purchase_branch_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='sale',
+            index=models.Index(fields=['branch', 'created_at'], name='sale_branch_created_idx'),
+        ),
+        AddUniqueConstraintConcurrently(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('company', 'sku'), name=UNIQUE_SKU_INDEX),
+        ),
+    ]
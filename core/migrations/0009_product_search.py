@@ -0,0 +1,65 @@
+# Índices de búsqueda de productos según el motor (ver core/search.py).
+
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS product_search_document_idx ON core_product USING gin ("
+    "(to_tsvector('spanish'::regconfig, coalesce(name, '') || ' ' || coalesce(sku, '') || ' ' || "
+    "coalesce(category, '') || ' ' || coalesce(description, ''))))",
+    "CREATE INDEX IF NOT EXISTS product_name_trgm_idx ON core_product USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS product_sku_trgm_idx ON core_product USING gin (sku gin_trgm_ops)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS product_search_document_idx",
+    "DROP INDEX IF EXISTS product_name_trgm_idx",
+    "DROP INDEX IF EXISTS product_sku_trgm_idx",
+]
+
+# Tabla FTS5 de contenido externo sincronizada con core_product por triggers.
+# Nota: si una migración futura reconstruye core_product en SQLite, debe
+# recrear estos triggers.
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_product_fts USING fts5("
+    "name, sku, category, description, content='core_product', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS core_product_fts_ai AFTER INSERT ON core_product BEGIN "
+    "INSERT INTO core_product_fts(rowid, name, sku, category, description) "
+    "VALUES (new.id, new.name, new.sku, new.category, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS core_product_fts_ad AFTER DELETE ON core_product BEGIN "
+    "INSERT INTO core_product_fts(core_product_fts, rowid, name, sku, category, description) "
+    "VALUES ('delete', old.id, old.name, old.sku, old.category, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS core_product_fts_au AFTER UPDATE ON core_product BEGIN "
+    "INSERT INTO core_product_fts(core_product_fts, rowid, name, sku, category, description) "
+    "VALUES ('delete', old.id, old.name, old.sku, old.category, old.description); "
+    "INSERT INTO core_product_fts(rowid, name, sku, category, description) "
+    "VALUES (new.id, new.name, new.sku, new.category, new.description); END",
+    "INSERT INTO core_product_fts(core_product_fts) VALUES ('rebuild')",
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS core_product_fts_ai",
+    "DROP TRIGGER IF EXISTS core_product_fts_ad",
+    "DROP TRIGGER IF EXISTS core_product_fts_au",
+    "DROP TABLE IF EXISTS core_product_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_tenant_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
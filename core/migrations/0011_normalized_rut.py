@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:44
+
+import re
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+RUT_SEPARADORES = re.compile(r'[\.\-\s]')
+
+
+def normalizar_rut(rut_string):
+    # Copia congelada de core.validators.normalizar_rut al crear esta migración.
+    if not rut_string:
+        return ''
+    rut_clean = RUT_SEPARADORES.sub('', rut_string).upper()
+    return rut_clean[:-1].lstrip('0') + rut_clean[-1:]
+
+
+def backfill_rut_normalized(apps, schema_editor):
+    for model_name in ('Company', 'Supplier', 'User'):
+        model = apps.get_model('core', model_name)
+        pending = []
+        for obj in model.objects.exclude(rut__isnull=True).exclude(rut='').only('pk', 'rut').iterator(chunk_size=BATCH_SIZE):
+            obj.rut_normalized = normalizar_rut(obj.rut)
+            pending.append(obj)
+            if len(pending) >= BATCH_SIZE:
+                model.objects.bulk_update(pending, ['rut_normalized'])
+                pending = []
+        model.objects.bulk_update(pending, ['rut_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0010_low_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='rut_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='rut_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='rut_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['rut_normalized'], name='company_rut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['company', 'rut_normalized'], name='supplier_company_rut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['company', 'rut_normalized'], name='user_company_rut_idx'),
+        ),
+        migrations.RunPython(backfill_rut_normalized, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Columnas ``company`` nulas; las rellena 0013 y 0014 las hace obligatorias.
+
+    Sin índice propio: los índices por compañía se crean en 0014 con ``CONCURRENTLY``.
+    """
+
+    dependencies = [
+        ('core', '0011_normalized_rut'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.company'),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.company'),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.company'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:02
+
+from django.db import migrations, transaction
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 10000
+
+
+def backfill_company(apps, schema_editor):
+    """Copia la compañía de la sucursal por rangos de PK.
+
+    Cada rango se confirma por separado para no bloquear la tabla completa
+    ni generar una única transacción del tamaño de la tabla. Es reanudable:
+    solo toca filas que siguen sin compañía.
+    """
+
+    Branch = apps.get_model('core', 'Branch')
+    db = schema_editor.connection.alias
+    company = Subquery(Branch.objects.using(db).filter(pk=OuterRef('branch_id')).values('company_id')[:1])
+    for model_name in ('Sale', 'Purchase', 'Inventory'):
+        rows = apps.get_model('core', model_name).objects.using(db)
+        last_pk = rows.order_by('-pk').values_list('pk', flat=True).first() or 0
+        for start in range(0, last_pk, BATCH_SIZE):
+            with transaction.atomic(using=db):
+                rows.filter(pk__gt=start, pk__lte=start + BATCH_SIZE, company__isnull=True).update(company_id=company)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0012_tenant_company_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_company, migrations.RunPython.noop),
+    ]
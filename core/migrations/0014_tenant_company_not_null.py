@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.migration_operations import AddIndexConcurrently, AlterFieldNotNull
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0013_backfill_tenant_company'),
+    ]
+
+    operations = [
+        AlterFieldNotNull(
+            model_name='inventory',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, to='core.company'),
+        ),
+        AlterFieldNotNull(
+            model_name='purchase',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, to='core.company'),
+        ),
+        AlterFieldNotNull(
+            model_name='sale',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, to='core.company'),
+        ),
+        AddIndexConcurrently(
+            model_name='inventory',
+            index=models.Index(fields=['company'], name='inventory_company_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='inventory',
+            index=models.Index(condition=models.Q(('stock__lte', models.F('reorder_point'))), fields=['company', 'stock'], name='inventory_tenant_low_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='purchase',
+            index=models.Index(fields=['company', 'date'], name='purchase_company_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='sale',
+            index=models.Index(fields=['company', 'created_at'], name='sale_company_created_idx'),
+        ),
+    ]
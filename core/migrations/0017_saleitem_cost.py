@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:14
+
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 10000
+
+
+def snapshot_cost(apps, schema_editor):
+    """Copia el costo actual del producto en las líneas existentes, por rangos de PK.
+
+    Cada rango se confirma por separado para no bloquear la tabla completa.
+    """
+
+    SaleItem = apps.get_model('core', 'SaleItem')
+    Product = apps.get_model('core', 'Product')
+    db = schema_editor.connection.alias
+    items = SaleItem.objects.using(db)
+    last_pk = items.order_by('-pk').values_list('pk', flat=True).first() or 0
+    cost = Subquery(Product.objects.using(db).filter(pk=OuterRef('product_id')).values('cost')[:1])
+    for start in range(0, last_pk, BATCH_SIZE):
+        with transaction.atomic(using=db):
+            items.filter(pk__gt=start, pk__lte=start + BATCH_SIZE, cost__isnull=True).update(cost=cost)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0016_stock_transfer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saleitem',
+            name='cost',
+            field=models.DecimalField(decimal_places=0, editable=False, max_digits=10, null=True),
+        ),
+        migrations.RunPython(snapshot_cost, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='saleitem',
+            name='cost',
+            field=models.DecimalField(decimal_places=0, editable=False, max_digits=10),
+        ),
+    ]
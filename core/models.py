@@ -1,10 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 
-from .validators import validar_rut
+from .validators import normalizar_rut, validar_rut
 
 # Roles definidos
 ROLES = (
@@ -23,13 +24,65 @@ PLANES = (
 )
 
 
-class Company(models.Model):
+class TenantQuerySet(models.QuerySet):
+    """QuerySet con filtro por compañía sobre la columna ``company_id`` del propio modelo."""
+
+    def for_tenant(self, company):
+        company_id = company.pk if isinstance(company, Company) else company
+        return self.filter(company_id=company_id)
+
+
+TenantManager = models.Manager.from_queryset(TenantQuerySet)
+
+
+class BranchTenantMixin:
+    """Copia ``company_id`` desde la sucursal al guardar.
+
+    ``Sale``, ``Purchase`` e ``Inventory`` llevan la compañía desnormalizada
+    para filtrar por tenant sin unir con ``Branch``; ``Branch.save`` la
+    actualiza si la sucursal cambia de compañía. Quien use ``bulk_create`` o
+    SQL directo debe asignarla a mano.
+    """
+
+    def save(self, *args, **kwargs):
+        if self.branch_id is not None:
+            self.company_id = self.branch.company_id
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'branch' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'company'}
+        super().save(*args, **kwargs)
+
+
+class NormalizedRutMixin:
+    """Mantiene ``rut_normalized`` (sin puntos ni guion) a partir de ``rut`` en cada ``save``.
+
+    Las búsquedas exactas por RUT filtran por la columna normalizada, que está
+    indexada por compañía. Quien use ``bulk_create`` debe asignarla a mano.
+    """
+
+    def save(self, *args, **kwargs):
+        self.rut_normalized = normalizar_rut(self.rut)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'rut' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'rut_normalized'}
+        super().save(*args, **kwargs)
+
+
+class Company(NormalizedRutMixin, models.Model):
     """Representa al cliente/tenant (La Pyme)."""
 
     name = models.CharField(max_length=100)
     rut = models.CharField(max_length=12, validators=[validar_rut])
+    rut_normalized = models.CharField(max_length=10, blank=True, default='', editable=False)
     address = models.CharField(max_length=200, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Contador desnormalizado de sucursales; lo mantiene Branch.save / post_delete.
+    branch_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['rut_normalized'], name='company_rut_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -52,18 +105,48 @@ class Subscription(models.Model):
         return f"{self.company.name} - {self.plan_name}"
 
 
-class User(AbstractUser):
+class User(NormalizedRutMixin, AbstractUser):
     """Usuario personalizado."""
 
     rut = models.CharField(max_length=12, validators=[validar_rut], blank=True, null=True)
+    rut_normalized = models.CharField(max_length=10, blank=True, default='', editable=False)
     role = models.CharField(max_length=20, choices=ROLES, default='cliente_final')
     company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Sube cuando cambian los datos firmados en el JWT; invalida los tokens emitidos (ver core.authentication).
+    auth_version = models.PositiveIntegerField(default=0, editable=False)
+
+    # Campos cuyo cambio revoca los tokens emitidos.
+    AUTH_FIELDS = ('is_active', 'role', 'company_id', 'password')
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['company', 'rut_normalized'], name='user_company_rut_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_auth_state = {
+            name: instance.__dict__[name] for name in cls.AUTH_FIELDS if name in instance.__dict__
+        }
+        return instance
 
     def clean(self):
         if self.role in ['admin_cliente', 'gerente', 'vendedor'] and not self.company:
             raise ValidationError("Este rol requiere estar asociado a una compañía.")
 
+    def save(self, *args, **kwargs):
+        # Los cambios con QuerySet.update() no pasan por aquí: deben subir auth_version a mano.
+        loaded = getattr(self, '_loaded_auth_state', {})
+        if any(getattr(self, name) != value for name, value in loaded.items()):
+            self.auth_version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'auth_version'}
+        super().save(*args, **kwargs)
+        self._loaded_auth_state = {name: getattr(self, name) for name in self.AUTH_FIELDS}
+
 
 class Branch(models.Model):
     """Sucursales (validadas por el plan)."""
@@ -72,29 +155,54 @@ class Branch(models.Model):
     name = models.CharField(max_length=100)
     address = models.CharField(max_length=200)
 
-    def clean(self):
-        # Regla de negocio: Límites por plan
-        if not self.company_id:
-            return
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_company_id = instance.__dict__.get('company_id')
+        return instance
+
+    def reserve_slot(self):
+        """Ocupa un cupo de sucursal en la compañía según el límite del plan.
 
-        try:
-            sub = Subscription.objects.get(company=self.company)
-            current_branches = Branch.objects.filter(company=self.company).exclude(pk=self.pk).count()
+        El incremento es un ``UPDATE`` condicional, por lo que dos altas
+        concurrentes no pueden superar el límite.
+        """
 
-            from .utils import get_branch_limit
+        from .utils import load_entitlements
 
-            branch_limit = get_branch_limit(sub.plan_name)
-            if branch_limit is not None and current_branches >= branch_limit:
-                raise ValidationError(
-                    f"El Plan {sub.plan_name} permite máximo {branch_limit} sucursal(es)."
-                )
-        except Subscription.DoesNotExist:
-            # Si no hay suscripción registrada, no aplicamos límite (o podríamos bloquear)
-            pass
+        # Sin memo de instancia: el límite se lee de la caché invalidada por señales.
+        entitlements = load_entitlements(self.company_id)
+        counter = Company.objects.filter(pk=self.company_id)
+        if entitlements.branch_limit is not None:
+            counter = counter.filter(branch_count__lt=entitlements.branch_limit)
+        if not counter.update(branch_count=F('branch_count') + 1):
+            raise ValidationError(
+                f"El Plan {entitlements.plan_name} permite máximo {entitlements.branch_limit} sucursal(es)."
+            )
+
+    @staticmethod
+    def release_slot(company_id):
+        Company.objects.filter(pk=company_id, branch_count__gt=0).update(branch_count=F('branch_count') - 1)
 
     def save(self, *args, **kwargs):
+        # Regla de negocio: Límites por plan (solo si cambia la compañía).
+        previous_company_id = getattr(self, '_loaded_company_id', None)
+        company_changed = self._state.adding or self.company_id != previous_company_id
+        if not company_changed:
+            self.full_clean(exclude=['company'])
+            super().save(*args, **kwargs)
+            return
+
         self.full_clean()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            self.reserve_slot()
+            if previous_company_id is not None:
+                self.release_slot(previous_company_id)
+            super().save(*args, **kwargs)
+            if previous_company_id is not None:
+                for model in (Sale, Purchase, Inventory):
+                    model.objects.filter(branch=self).update(company_id=self.company_id)
+        self._loaded_company_id = self.company_id
 
     def __str__(self):
         return self.name
@@ -113,6 +221,16 @@ class Product(models.Model):
     cost = models.DecimalField(max_digits=10, decimal_places=0)
     category = models.CharField(max_length=100, blank=True)
 
+    objects = TenantManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'sku'], name='product_company_sku_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['company', 'category'], name='product_company_category_idx'),
+        ]
+
     def clean(self):
         if self.price < 0:
             raise ValidationError("El precio no puede ser negativo.")
@@ -123,39 +241,102 @@ class Product(models.Model):
         return f"{self.sku} - {self.name}"
 
 
-class Inventory(models.Model):
+class Inventory(BranchTenantMixin, models.Model):
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, editable=False, db_index=False)
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     stock = models.IntegerField(default=0)
     reorder_point = models.PositiveIntegerField(default=0)
 
+    objects = TenantManager()
+
     def clean(self):
         if self.stock < 0:
             raise ValidationError("El stock no puede ser negativo.")
 
     class Meta:
         unique_together = ('branch', 'product')
+        indexes = [
+            models.Index(fields=['company'], name='inventory_company_idx'),
+            # Índice parcial: solo filas bajo el punto de reposición.
+            models.Index(
+                fields=['branch', 'product'],
+                condition=models.Q(stock__lte=F('reorder_point')),
+                name='inventory_low_stock_idx',
+            ),
+            models.Index(
+                fields=['company', 'stock'],
+                condition=models.Q(stock__lte=F('reorder_point')),
+                name='inventory_tenant_low_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.branch.name} - {self.product.sku}: {self.stock}"
 
 
-class Supplier(models.Model):
+STOCK_ALERT_KINDS = (
+    ('low', 'Stock bajo'),
+    ('restored', 'Stock repuesto'),
+)
+
+
+class StockAlert(models.Model):
+    """Cruce del punto de reposición registrado al cambiar el stock."""
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=STOCK_ALERT_KINDS)
+    stock = models.IntegerField()
+    reorder_point = models.PositiveIntegerField()
+    acknowledged = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = TenantManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'created_at'], name='stock_alert_company_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.product_id} @ {self.branch_id}: {self.stock}"
+
+
+class Supplier(NormalizedRutMixin, models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
     name = models.CharField(max_length=150)
     rut = models.CharField(max_length=12, validators=[validar_rut])
+    rut_normalized = models.CharField(max_length=10, blank=True, default='', editable=False)
     contact = models.CharField(max_length=150, blank=True)
 
+    objects = TenantManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'rut_normalized'], name='supplier_company_rut_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 
-class Purchase(models.Model):
+class Purchase(BranchTenantMixin, models.Model):
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, editable=False, db_index=False)
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
     supplier = models.ForeignKey(Supplier, on_delete=models.PROTECT)
     total = models.DecimalField(max_digits=12, decimal_places=0)
     date = models.DateField(default=timezone.localdate)
 
+    objects = TenantManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['branch', 'date'], name='purchase_branch_date_idx'),
+            models.Index(fields=['company', 'date'], name='purchase_company_date_idx'),
+        ]
+
     def clean(self):
         if self.date and self.date > timezone.localdate():
             raise ValidationError("La fecha de compra no puede estar en el futuro.")
@@ -180,11 +361,59 @@ class PurchaseItem(models.Model):
         return f"{self.product.sku} x {self.quantity}"
 
 
-class Sale(models.Model):
+class StockTransfer(models.Model):
+    """Traspaso de stock entre dos sucursales de la misma compañía."""
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, editable=False)
+    source_branch = models.ForeignKey(Branch, related_name='transfers_out', on_delete=models.CASCADE)
+    destination_branch = models.ForeignKey(Branch, related_name='transfers_in', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.PROTECT, null=True, blank=True)
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = TenantManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'created_at'], name='transfer_company_created_idx'),
+        ]
+
+    def clean(self):
+        if self.source_branch_id == self.destination_branch_id:
+            raise ValidationError("La sucursal de origen y la de destino deben ser distintas.")
+
+    def __str__(self):
+        return f"Traspaso {self.id}: {self.source_branch_id} → {self.destination_branch_id}"
+
+
+class StockTransferItem(models.Model):
+    transfer = models.ForeignKey(StockTransfer, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.product.sku} x {self.quantity}"
+
+
+class Sale(BranchTenantMixin, models.Model):
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, editable=False, db_index=False)
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.PROTECT)
     total = models.DecimalField(max_digits=12, decimal_places=0)
     created_at = models.DateTimeField(default=timezone.now)
+    # Identificador generado por el POS para deduplicar sincronizaciones offline.
+    client_id = models.CharField(max_length=64, null=True, blank=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['branch', 'client_id'], name='sale_branch_client_id_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['branch', 'created_at'], name='sale_branch_created_idx'),
+            models.Index(fields=['company', 'created_at'], name='sale_company_created_idx'),
+        ]
 
     def clean(self):
         if self.created_at > timezone.now():
@@ -199,6 +428,8 @@ class SaleItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=0)
+    # Costo unitario al momento de la venta: los rollups y su reconstrucción lo usan.
+    cost = models.DecimalField(max_digits=10, decimal_places=0, editable=False)
 
     def clean(self):
         if self.quantity < 1:
@@ -206,6 +437,11 @@ class SaleItem(models.Model):
         if self.price < 0:
             raise ValidationError("El precio no puede ser negativo.")
 
+    def save(self, *args, **kwargs):
+        if self.cost is None:
+            self.cost = self.product.cost
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.product.sku} x {self.quantity}"
 
@@ -216,6 +452,13 @@ ORDER_STATES = (
     ('entregado', 'Entregado'),
 )
 
+# Estados destino permitidos desde cada estado de la orden.
+ORDER_TRANSITIONS = {
+    'pendiente': ('enviado',),
+    'enviado': ('entregado',),
+    'entregado': (),
+}
+
 
 class Order(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
@@ -225,6 +468,15 @@ class Order(models.Model):
     total = models.DecimalField(max_digits=12, decimal_places=0)
     created_at = models.DateTimeField(default=timezone.now)
 
+    objects = TenantManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'status', 'created_at'], name='order_company_status_idx'),
+            # El listado filtra solo por compañía y ordena por fecha.
+            models.Index(fields=['company', 'created_at'], name='order_company_created_idx'),
+        ]
+
     def clean(self):
         if self.created_at > timezone.now():
             raise ValidationError("La orden no puede tener fecha futura.")
@@ -247,3 +499,41 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product.sku} x {self.quantity}"
+
+
+class DailyBranchSales(models.Model):
+    """Acumulado diario de ventas por sucursal (alimenta los reportes)."""
+
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    date = models.DateField()
+    sales_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['branch', 'date'], name='daily_branch_sales_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.branch_id} {self.date}: {self.revenue}"
+
+
+class DailyProductSales(models.Model):
+    """Acumulado diario de ventas por sucursal y producto."""
+
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    date = models.DateField()
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['branch', 'date', 'product'], name='daily_product_sales_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.branch_id} {self.product_id} {self.date}: {self.units}"
@@ -0,0 +1,116 @@
+"""Parsers de streaming para endpoints de ingesta masiva.
+
+Ambos parsers devuelven un iterador de objetos en lugar de cargar el cuerpo
+completo en memoria: los registros se decodifican a medida que la vista los
+consume.
+"""
+
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _iter_text(stream, encoding):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        try:
+            text = decoder.decode(chunk or b'', final=not chunk)
+        except UnicodeDecodeError as exc:
+            raise ParseError(f'El cuerpo no está codificado en {encoding}: {exc.reason}.')
+        if text:
+            yield text
+        if not chunk:
+            return
+
+
+def iter_json_array(stream, encoding='utf-8'):
+    """Itera los elementos de un arreglo JSON leyendo el stream por bloques."""
+
+    decoder = json.JSONDecoder()
+    chunks = _iter_text(stream, encoding)
+    buffer = ''
+    position = 0
+    started = False
+
+    while True:
+        # Descarta espacios y separadores antes del siguiente elemento.
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position >= len(buffer):
+            chunk = next(chunks, None)
+            if chunk is None:
+                if started:
+                    raise ParseError('Arreglo JSON incompleto.')
+                return
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        if not started:
+            if buffer[position] != '[':
+                raise ParseError('Se esperaba un arreglo JSON.')
+            started = True
+            position += 1
+            continue
+        if buffer[position] == ']':
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise ParseError('JSON inválido en el arreglo de registros.')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+        buffer = buffer[end:]
+        position = 0
+
+
+def iter_ndjson(stream, encoding='utf-8'):
+    """Itera un documento NDJSON (un objeto JSON por línea)."""
+
+    pending = ''
+    for chunk in _iter_text(stream, encoding):
+        pending += chunk
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            if line.strip():
+                yield _loads_line(line)
+    if pending.strip():
+        yield _loads_line(pending)
+
+
+def _loads_line(line):
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        raise ParseError(f'Línea NDJSON inválida: {exc}')
+
+
+class StreamingJSONArrayParser(BaseParser):
+    """Parser para ``application/json`` cuyo cuerpo es un arreglo de registros."""
+
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        return iter_json_array(stream, encoding)
+
+
+class NDJSONParser(BaseParser):
+    """Parser para ``application/x-ndjson``."""
+
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        return iter_ndjson(stream, encoding)
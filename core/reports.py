@@ -0,0 +1,155 @@
+"""Reportes de ventas leídos desde los rollups diarios.
+
+Las consultas de este módulo nunca recorren ``SaleItem``: los rollups se
+mantienen incrementalmente en ``core.services`` y se pueden reconstruir con
+``python manage.py rebuild_sales_rollups``.
+"""
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+
+from .models import DailyBranchSales, DailyProductSales, Inventory, SaleItem
+from .utils import local_day_range
+
+REBUILD_BATCH_SIZE = 2000
+
+
+def _with_margin(queryset):
+    return queryset.annotate(
+        margin=ExpressionWrapper(F('revenue') - F('cost'), output_field=DecimalField(max_digits=14, decimal_places=0))
+    )
+
+
+def branch_daily_sales(company, date_from, date_to, branch_id=None):
+    """Filas diarias por sucursal: ventas, unidades, ingresos, costo y margen."""
+
+    queryset = DailyBranchSales.objects.filter(
+        branch__company=company, date__gte=date_from, date__lte=date_to
+    )
+    if branch_id:
+        queryset = queryset.filter(branch_id=branch_id)
+    return _with_margin(queryset).order_by('date', 'branch_id').values(
+        'date', 'branch_id', 'sales_count', 'units', 'revenue', 'cost', 'margin'
+    )
+
+
+def product_sales(company, date_from, date_to, branch_id=None, limit=50):
+    """Productos más vendidos del rango, con margen según el costo de cada venta."""
+
+    queryset = DailyProductSales.objects.filter(
+        branch__company=company, date__gte=date_from, date__lte=date_to
+    )
+    if branch_id:
+        queryset = queryset.filter(branch_id=branch_id)
+    totals = queryset.values('product_id', 'product__sku', 'product__name').annotate(
+        units=Sum('units'), revenue=Sum('revenue'), cost=Sum('cost')
+    )
+    return _with_margin(totals).order_by('-revenue', 'product_id')[:limit]
+
+
+def _low_stock(company, limit):
+    queryset = Inventory.objects.for_tenant(company).filter(stock__lte=F('reorder_point'))
+    rows = queryset.order_by('stock', 'id').values(
+        'branch__name', 'product__sku', 'product__name', 'stock', 'reorder_point'
+    )[:limit]
+    return queryset, rows
+
+
+def low_stock_summary(company, limit=10):
+    """Conteo y primeras filas bajo el punto de reposición (índice parcial)."""
+
+    queryset, rows = _low_stock(company, limit)
+    return {'count': queryset.count(), 'rows': list(rows)}
+
+
+async def alow_stock_summary(company, limit=10):
+    """Versión asíncrona de ``low_stock_summary`` (ORM async)."""
+
+    queryset, rows = _low_stock(company, limit)
+    return {'count': await queryset.acount(), 'rows': [row async for row in rows]}
+
+
+def rebuild_sales_rollups(date_from=None, date_to=None, company=None):
+    """Recalcula los rollups desde ``SaleItem`` para el rango indicado.
+
+    Retorna la cantidad de filas (sucursal, producto, día) generadas.
+    """
+
+    items = SaleItem.objects.all()
+    branch_rollups = DailyBranchSales.objects.all()
+    product_rollups = DailyProductSales.objects.all()
+    if company is not None:
+        items = items.filter(sale__company=company)
+        branch_rollups = branch_rollups.filter(branch__company=company)
+        product_rollups = product_rollups.filter(branch__company=company)
+    items = items.filter(**local_day_range('sale__created_at', date_from, date_to))
+    if date_from:
+        branch_rollups = branch_rollups.filter(date__gte=date_from)
+        product_rollups = product_rollups.filter(date__gte=date_from)
+    if date_to:
+        branch_rollups = branch_rollups.filter(date__lte=date_to)
+        product_rollups = product_rollups.filter(date__lte=date_to)
+
+    day = TruncDate('sale__created_at')
+    product_rows = (
+        items.annotate(day=day)
+        .values('sale__branch_id', 'product_id', 'day')
+        .annotate(
+            units=Sum('quantity'),
+            revenue=Sum(F('quantity') * F('price')),
+            cost=Sum(F('quantity') * F('cost')),
+        )
+        .order_by()
+    )
+
+    with transaction.atomic():
+        branch_rollups.delete()
+        product_rollups.delete()
+
+        branches = {}
+        batch = []
+        created = 0
+        for row in product_rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+            batch.append(DailyProductSales(
+                branch_id=row['sale__branch_id'],
+                product_id=row['product_id'],
+                date=row['day'],
+                units=row['units'],
+                revenue=row['revenue'],
+                cost=row['cost'],
+            ))
+            totals = branches.setdefault(
+                (row['sale__branch_id'], row['day']), {'units': 0, 'revenue': 0, 'cost': 0}
+            )
+            totals['units'] += row['units']
+            totals['revenue'] += row['revenue']
+            totals['cost'] += row['cost']
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                DailyProductSales.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        DailyProductSales.objects.bulk_create(batch)
+        created += len(batch)
+
+        sales_counts = {
+            (row['sale__branch_id'], row['day']): row['total']
+            for row in items.annotate(day=day)
+            .values('sale__branch_id', 'day')
+            .annotate(total=Count('sale_id', distinct=True))
+            .order_by()
+        }
+        DailyBranchSales.objects.bulk_create(
+            [
+                DailyBranchSales(
+                    branch_id=branch_id,
+                    date=date,
+                    sales_count=sales_counts.get((branch_id, date), 0),
+                    **totals,
+                )
+                for (branch_id, date), totals in branches.items()
+            ],
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+    return created
+
@@ -0,0 +1,114 @@
+"""Búsqueda de productos por texto con facetas por categoría.
+
+En PostgreSQL se usa búsqueda full-text (``tsvector`` en español con prefijos)
+más similitud por trigramas sobre nombre y SKU, apoyadas en los índices GIN de
+la migración ``0009_product_search``. En SQLite (desarrollo local) se usa la
+tabla FTS5 ``core_product_fts`` mantenida por triggers. Otros motores caen a
+``icontains``.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, Count, F, FloatField, Func, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+
+SEARCH_CONFIG = 'spanish'
+
+# Debe coincidir con la expresión del índice product_search_document_idx.
+DOCUMENT_SQL = (
+    "to_tsvector('spanish'::regconfig, "
+    "coalesce(\"core_product\".\"name\", '') || ' ' || coalesce(\"core_product\".\"sku\", '') || ' ' || "
+    "coalesce(\"core_product\".\"category\", '') || ' ' || coalesce(\"core_product\".\"description\", ''))"
+)
+FTS_TABLE = 'core_product_fts'
+
+_fts_available = {}
+
+
+class TrigramMatch(Func):
+    """``columna % término``: usa el índice ``gin_trgm_ops`` de la columna."""
+
+    arg_joiner = ' %% '
+    template = '%(expressions)s'
+    output_field = BooleanField()
+
+
+def tokenize(term):
+    return re.findall(r'\w+', term.lower())
+
+
+def search_products(queryset, term):
+    """Filtra ``queryset`` por ``term`` y lo anota con ``rank`` (mayor es mejor)."""
+
+    tokens = tokenize(term)
+    if not tokens:
+        # Sin tokens no hay coincidencias, pero el contrato incluye ``rank``.
+        return queryset.none().annotate(rank=Value(0.0, output_field=FloatField()))
+
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        return _search_postgres(queryset, term, tokens)
+    if connection.vendor == 'sqlite' and _has_fts(connection):
+        return _search_sqlite(queryset, term, tokens)
+    return _search_fallback(queryset, term, tokens)
+
+
+def _search_postgres(queryset, term, tokens):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField, TrigramSimilarity
+
+    query = SearchQuery(' & '.join(f'{token}:*' for token in tokens), search_type='raw', config=SEARCH_CONFIG)
+    return (
+        queryset.annotate(
+            document=RawSQL(DOCUMENT_SQL, [], output_field=SearchVectorField()),
+            text_rank=SearchRank(F('document'), query),
+            similarity=Greatest(TrigramSimilarity('name', term), TrigramSimilarity('sku', term)),
+        )
+        .filter(
+            Q(document=query)
+            | Q(TrigramMatch(F('name'), Value(term)))
+            | Q(TrigramMatch(F('sku'), Value(term)))
+            | Q(sku__istartswith=term)
+        )
+        .annotate(rank=F('text_rank') + F('similarity'))
+    )
+
+
+def _search_sqlite(queryset, term, tokens):
+    match = ' '.join(f'"{token}"*' for token in tokens)
+    matched = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+    # bm25() es negativo: más relevante cuanto menor, por eso se invierte el signo.
+    rank = RawSQL(
+        f'SELECT -bm25({FTS_TABLE}, 10.0, 10.0, 2.0, 1.0) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND rowid = "core_product"."id"',
+        [match],
+        output_field=FloatField(),
+    )
+    return queryset.filter(Q(pk__in=matched) | Q(sku__istartswith=term)).annotate(rank=rank)
+
+
+def _search_fallback(queryset, term, tokens):
+    condition = Q(sku__istartswith=term)
+    for token in tokens:
+        condition |= Q(name__icontains=token) | Q(description__icontains=token) | Q(category__icontains=token)
+    return queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+def _has_fts(connection):
+    if connection.alias not in _fts_available:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_available[connection.alias] = cursor.fetchone() is not None
+    return _fts_available[connection.alias]
+
+
+def category_facets(queryset):
+    """Conteo de productos por categoría sobre el conjunto ya filtrado."""
+
+    return list(
+        queryset.order_by()
+        .values('category')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'category')
+    )
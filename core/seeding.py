@@ -0,0 +1,332 @@
+"""Generación determinista de datos sintéticos por tenant.
+
+Usado por ``seed_data`` y los comandos de benchmark para poblar la base con
+volúmenes realistas. Todo se escribe por lotes con ``bulk_create`` (y ``COPY``
+para ventas, compras y órdenes en PostgreSQL) y los valores dependen solo de
+la semilla, del índice de la compañía y de la fecha base (último día de la
+historia generada), por lo que dos ejecuciones con la misma fecha base producen
+los mismos datos.
+"""
+
+import random
+from dataclasses import dataclass, replace
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import (
+    Branch,
+    Company,
+    Inventory,
+    Order,
+    OrderItem,
+    Product,
+    Purchase,
+    PurchaseItem,
+    Sale,
+    SaleItem,
+    Subscription,
+    Supplier,
+    User,
+)
+from .throttling import forget_unknown_users
+from .utils import get_branch_limit
+from .validators import calcular_dv, normalizar_rut
+
+BATCH_SIZE = 2000
+SEED_PASSWORD = 'seed1234'
+# Roles con un usuario por compañía (los vendedores se crean uno por sucursal).
+COMPANY_ROLES = ('admin_cliente', 'gerente', 'cliente_final')
+CATEGORIES = ['Abarrotes', 'Bebidas', 'Limpieza', 'Lácteos', 'Panadería', 'Ferretería', 'Librería', 'Mascotas']
+
+
+@dataclass
+class SeedSizes:
+    branches: int = 1
+    products: int = 200
+    suppliers: int = 5
+    purchases: int = 100
+    sales: int = 2000
+    orders: int = 500
+    items_per_document: int = 3
+    days: int = 365
+
+
+def format_rut(number):
+    """RUT válido con puntos y guion para el cuerpo ``number``."""
+
+    return f"{number:,}".replace(',', '.') + f"-{calcular_dv(number)}"
+
+
+def make_sku(index):
+    """SKU ``AAA-0000`` único para cada ``index`` (hasta 26³ · 10⁴)."""
+
+    prefix, number = divmod(index, 10_000)
+    letters = ''
+    for _ in range(3):
+        prefix, letter = divmod(prefix, 26)
+        letters = chr(ord('A') + letter) + letters
+    return f"{letters}-{number:04d}"
+
+
+def _batched(objects, size=BATCH_SIZE):
+    for start in range(0, len(objects), size):
+        yield objects[start:start + size]
+
+
+def _normalize_ruts(objects):
+    # bulk_create omite save(), que es quien mantiene rut_normalized.
+    for obj in objects:
+        obj.rut_normalized = normalizar_rut(obj.rut)
+    return objects
+
+
+def _create_users(users):
+    users = User.objects.bulk_create(_normalize_ruts(users))
+    # Sin señales post_save: los nombres pudieron quedar en la caché negativa del login.
+    forget_unknown_users(user.username for user in users)
+    return users
+
+
+def _document_items(rng, products, count):
+    return [
+        (product, rng.randint(1, 5))
+        for product in rng.sample(products, min(count, len(products)))
+    ]
+
+
+def seed_company(index, sizes=None, plan_name='Premium', seed=0, base_date=None):
+    """Crea una compañía completa (sucursales, catálogo, stock y movimientos).
+
+    La cantidad de sucursales se ajusta al límite del plan. Los movimientos
+    cubren los ``sizes.days`` días que terminan en ``base_date`` (por defecto
+    hoy) y la suscripción vence un año después de esa fecha. Con los mismos
+    ``seed``, ``index`` y ``base_date`` los datos generados son idénticos.
+    """
+
+    sizes = sizes or SeedSizes()
+    limit = get_branch_limit(plan_name)
+    if limit is not None and sizes.branches > limit:
+        sizes = replace(sizes, branches=limit)
+    rng = random.Random(f"{seed}-{index}")
+    today = base_date or timezone.localdate()
+    # Los instantes se restan desde el fin del día base.
+    now = timezone.make_aware(datetime.combine(today + timedelta(days=1), time.min))
+    password = make_password(SEED_PASSWORD)
+
+    with transaction.atomic():
+        company = Company.objects.create(
+            name=f"Pyme {index}",
+            rut=format_rut(10_000_000 + index),
+            address=f"Calle {index}",
+            branch_count=sizes.branches,
+        )
+        Subscription.objects.create(
+            company=company,
+            plan_name=plan_name,
+            start_date=today - timedelta(days=sizes.days),
+            end_date=today + timedelta(days=365),
+        )
+        # bulk_create omite los save(): el contador de sucursales y la compañía
+        # de ventas, compras e inventario se asignan explícitamente.
+        branches = Branch.objects.bulk_create([
+            Branch(company=company, name=f"Sucursal {number}", address=f"Av. {number}")
+            for number in range(1, sizes.branches + 1)
+        ])
+        users = _create_users([
+            User(
+                username=f"vendedor{index}_{number + 1}",
+                password=password,
+                role='vendedor',
+                company=company,
+                rut=format_rut(20_000_000 + index * 1000 + number),
+            )
+            for number, branch in enumerate(branches)
+        ])
+        seed_role_users(company, index, password)
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    company=company,
+                    sku=make_sku(number),
+                    name=f"Producto {number}",
+                    description=f"Descripción del producto {number}",
+                    price=Decimal(rng.randint(5, 500) * 100),
+                    cost=Decimal(rng.randint(2, 300) * 100),
+                    category=rng.choice(CATEGORIES),
+                )
+                for number in range(sizes.products)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        Inventory.objects.bulk_create(
+            [
+                Inventory(
+                    company=company,
+                    branch=branch,
+                    product=product,
+                    stock=rng.randint(0, 500),
+                    reorder_point=rng.randint(0, 30),
+                )
+                for branch in branches
+                for product in products
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        suppliers = Supplier.objects.bulk_create(_normalize_ruts([
+            Supplier(company=company, name=f"Proveedor {number}", rut=format_rut(30_000_000 + index * 100 + number))
+            for number in range(sizes.suppliers)
+        ]))
+
+        _seed_sales(rng, sizes, branches, users, products, now)
+        _seed_purchases(rng, sizes, branches, suppliers, products, today)
+        _seed_orders(rng, sizes, company, products, now)
+    return company
+
+
+def seed_role_users(company, index, password=None):
+    """Usuarios ``{rol}{index}`` de la compañía para cada rol de ``COMPANY_ROLES``."""
+
+    password = password or make_password(SEED_PASSWORD)
+    return _create_users([
+        User(
+            username=f"{role}{index}",
+            password=password,
+            role=role,
+            company=company,
+            rut=format_rut(40_000_000 + index * 10 + number),
+        )
+        for number, role in enumerate(COMPANY_ROLES)
+    ])
+
+
+def seed_super_admin(username='superadmin'):
+    """Super administrador de la plataforma (idempotente)."""
+
+    user, _created = User.objects.get_or_create(
+        username=username,
+        defaults={'role': 'super_admin', 'password': make_password(SEED_PASSWORD), 'is_staff': True},
+    )
+    return user
+
+
+def _seed_sales(rng, sizes, branches, users, products, now):
+    sellers = dict(zip((branch.pk for branch in branches), users))
+
+    def build():
+        branch = rng.choice(branches)
+        items = _document_items(rng, products, sizes.items_per_document)
+        sale = Sale(
+            company_id=branch.company_id,
+            branch=branch,
+            user=sellers[branch.pk],
+            total=sum(product.price * quantity for product, quantity in items),
+            created_at=now - timedelta(seconds=rng.randint(1, sizes.days * 86_400)),
+        )
+        return sale, [
+            SaleItem(product=product, quantity=quantity, price=product.price, cost=product.cost)
+            for product, quantity in items
+        ]
+
+    _seed_documents(sizes.sales, build, Sale, SaleItem, 'sale')
+
+
+def _seed_purchases(rng, sizes, branches, suppliers, products, today):
+    if not suppliers:
+        return
+
+    def build():
+        items = _document_items(rng, products, sizes.items_per_document * 3)
+        branch = rng.choice(branches)
+        purchase = Purchase(
+            company_id=branch.company_id,
+            branch=branch,
+            supplier=rng.choice(suppliers),
+            total=sum(product.cost * quantity for product, quantity in items),
+            date=today - timedelta(days=rng.randint(0, sizes.days)),
+        )
+        return purchase, [
+            PurchaseItem(product=product, quantity=quantity * 10, price=product.cost) for product, quantity in items
+        ]
+
+    _seed_documents(sizes.purchases, build, Purchase, PurchaseItem, 'purchase')
+
+
+def _seed_orders(rng, sizes, company, products, now):
+    states = ['pendiente', 'enviado', 'entregado']
+    numbers = iter(range(sizes.orders))
+
+    def build():
+        number = next(numbers)
+        items = _document_items(rng, products, sizes.items_per_document)
+        order = Order(
+            company=company,
+            customer_name=f"Cliente {number}",
+            customer_email=f"cliente{number}@example.com",
+            status=rng.choice(states),
+            total=sum(product.price * quantity for product, quantity in items),
+            created_at=now - timedelta(seconds=rng.randint(1, sizes.days * 86_400)),
+        )
+        return order, [OrderItem(product=product, quantity=quantity, price=product.price) for product, quantity in items]
+
+    _seed_documents(sizes.orders, build, Order, OrderItem, 'order')
+
+
+def _seed_documents(count, build, model, item_model, fk_name):
+    """Genera ``count`` documentos con ``build()`` y los escribe por lotes."""
+
+    use_copy = _can_copy()
+    remaining = count
+    while remaining > 0:
+        size = min(remaining, BATCH_SIZE)
+        remaining -= size
+        documents, item_lists = zip(*(build() for _ in range(size)))
+        if use_copy:
+            # COPY no retorna ids: se reservan de la secuencia antes de escribir.
+            for document, pk in zip(documents, _reserve_ids(model, size)):
+                document.pk = pk
+            _copy(model, documents, with_pk=True)
+        else:
+            model.objects.bulk_create(documents)
+        items = []
+        for document, document_items in zip(documents, item_lists):
+            for item in document_items:
+                setattr(item, f'{fk_name}_id', document.pk)
+                items.append(item)
+        if use_copy:
+            _copy(item_model, items)
+        else:
+            item_model.objects.bulk_create(items, batch_size=BATCH_SIZE)
+
+
+def _can_copy():
+    """``COPY FROM STDIN`` disponible (PostgreSQL con psycopg 3)."""
+
+    if connection.vendor != 'postgresql':
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    return is_psycopg3
+
+
+def _reserve_ids(model, count):
+    pk = model._meta.pk
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+            [model._meta.db_table, pk.column, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _copy(model, objects, with_pk=False):
+    qn = connection.ops.quote_name
+    fields = [field for field in model._meta.concrete_fields if with_pk or not field.primary_key]
+    sql = f'COPY {qn(model._meta.db_table)} ({", ".join(qn(field.column) for field in fields)}) FROM STDIN'
+    with connection.cursor() as cursor:
+        with cursor.cursor.copy(sql) as copy:
+            for obj in objects:
+                copy.write_row([field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields])
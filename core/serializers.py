@@ -1,6 +1,12 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
 from rest_framework import serializers
 
 from .models import (
+    ORDER_STATES,
+    ORDER_TRANSITIONS,
     Branch,
     Company,
     Inventory,
@@ -11,10 +17,48 @@ from .models import (
     PurchaseItem,
     Sale,
     SaleItem,
+    StockAlert,
+    StockTransfer,
+    StockTransferItem,
     Subscription,
     Supplier,
     User,
 )
+from .services import checkout_sale, receive_purchase, transfer_stock
+
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Relación por PK que usa objetos precargados en ``context[cache_key]``.
+
+    Los endpoints masivos cargan todos los objetos de un lote con una sola
+    consulta; si el contexto no trae caché se consulta la base como siempre,
+    limitada a la compañía del usuario de la request.
+    """
+
+    def __init__(self, cache_key, **kwargs):
+        self.cache_key = cache_key
+        super().__init__(**kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        company_id = getattr(getattr(self.context.get('request'), 'user', None), 'company_id', None)
+        if company_id is not None:
+            queryset = queryset.filter(company_id=company_id)
+        return queryset
+
+    def to_internal_value(self, data):
+        cache = self.context.get(self.cache_key)
+        if cache is None:
+            return super().to_internal_value(data)
+
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = cache.get(pk)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -89,35 +133,70 @@ class InventorySerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class StockAlertSerializer(serializers.ModelSerializer):
+    product_sku = serializers.CharField(source='product.sku', read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = StockAlert
+        fields = [
+            'id', 'branch', 'product', 'product_sku', 'product_name', 'kind', 'stock',
+            'reorder_point', 'acknowledged', 'created_at',
+        ]
+        read_only_fields = fields
+
+
 class SaleItemSerializer(serializers.ModelSerializer):
+    product = CachedPrimaryKeyRelatedField('product_cache', queryset=Product.objects.all())
+
     class Meta:
         model = SaleItem
         fields = ['product', 'quantity', 'price']
 
 
 class SaleSerializer(serializers.ModelSerializer):
+    branch = CachedPrimaryKeyRelatedField('branch_cache', queryset=Branch.objects.all())
     items = SaleItemSerializer(many=True)
 
     class Meta:
         model = Sale
-        fields = ['id', 'branch', 'user', 'total', 'created_at', 'items']
-        read_only_fields = ['user']
+        fields = ['id', 'branch', 'user', 'total', 'created_at', 'client_id', 'items']
+        read_only_fields = ['user', 'total']
+        extra_kwargs = {'client_id': {'required': False}}
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError('La venta debe incluir al menos un producto.')
+        return value
 
     def create(self, validated_data):
+        # El total se recalcula en el servidor a partir de las líneas.
         items_data = validated_data.pop('items')
-        sale = Sale.objects.create(**validated_data)
-        for item_data in items_data:
-            SaleItem.objects.create(sale=sale, **item_data)
-        return sale
+        try:
+            return checkout_sale(validated_data, items_data)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({'items': exc.messages})
+
+
+class BulkSaleSerializer(SaleSerializer):
+    """Validación de ventas en lote: la deduplicación por ``client_id`` la hace
+    ``core.sync`` con una consulta por lote en vez de una por registro."""
+
+    class Meta(SaleSerializer.Meta):
+        validators = []
 
 
 class PurchaseItemSerializer(serializers.ModelSerializer):
+    product = CachedPrimaryKeyRelatedField('product_cache', queryset=Product.objects.all())
+
     class Meta:
         model = PurchaseItem
         fields = ['product', 'quantity', 'price']
 
 
 class PurchaseSerializer(serializers.ModelSerializer):
+    branch = CachedPrimaryKeyRelatedField('branch_cache', queryset=Branch.objects.all())
+    supplier = CachedPrimaryKeyRelatedField('supplier_cache', queryset=Supplier.objects.all())
     items = PurchaseItemSerializer(many=True)
 
     class Meta:
@@ -126,10 +205,51 @@ class PurchaseSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        purchase = Purchase.objects.create(**validated_data)
-        for item_data in items_data:
-            PurchaseItem.objects.create(purchase=purchase, **item_data)
-        return purchase
+        try:
+            return receive_purchase(validated_data, items_data)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({'items': exc.messages})
+
+
+class StockTransferItemSerializer(serializers.ModelSerializer):
+    product = CachedPrimaryKeyRelatedField('product_cache', queryset=Product.objects.all())
+
+    class Meta:
+        model = StockTransferItem
+        fields = ['product', 'quantity']
+        extra_kwargs = {'quantity': {'min_value': 1}}
+
+
+class StockTransferSerializer(serializers.ModelSerializer):
+    """Traspaso entre sucursales; las líneas repetidas se suman por producto."""
+
+    MAX_ITEMS = 10000
+
+    source_branch = CachedPrimaryKeyRelatedField('branch_cache', queryset=Branch.objects.all())
+    destination_branch = CachedPrimaryKeyRelatedField('branch_cache', queryset=Branch.objects.all())
+    items = StockTransferItemSerializer(many=True, max_length=MAX_ITEMS)
+
+    class Meta:
+        model = StockTransfer
+        fields = ['id', 'source_branch', 'destination_branch', 'user', 'note', 'created_at', 'items']
+        read_only_fields = ['user', 'created_at']
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError('El traspaso debe incluir al menos un producto.')
+        return value
+
+    def validate(self, attrs):
+        if attrs['source_branch'].pk == attrs['destination_branch'].pk:
+            raise serializers.ValidationError('La sucursal de origen y la de destino deben ser distintas.')
+        return attrs
+
+    def create(self, validated_data):
+        items_data = validated_data.pop('items')
+        try:
+            return transfer_stock(items_data=items_data, **validated_data)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({'items': exc.messages})
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -145,9 +265,73 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['id', 'company', 'customer_name', 'customer_email', 'status', 'total', 'created_at', 'items']
 
+    def validate_status(self, value):
+        if self.instance is not None and value != self.instance.status:
+            if value not in ORDER_TRANSITIONS[self.instance.status]:
+                raise serializers.ValidationError(f"Transición {self.instance.status} → {value} no permitida.")
+        return value
+
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         order = Order.objects.create(**validated_data)
         for item_data in items_data:
             OrderItem.objects.create(order=order, **item_data)
         return order
+
+
+class OrderBulkStatusSerializer(serializers.Serializer):
+    """Entrada de ``orders/bulk-status``: ids explícitos o un filtro por estado y fecha."""
+
+    MAX_ORDERS = 5000
+
+    status = serializers.ChoiceField(choices=ORDER_STATES)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=MAX_ORDERS)
+    from_status = serializers.ChoiceField(choices=ORDER_STATES, required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('ids') and 'from_status' not in attrs:
+            raise serializers.ValidationError("Indique 'ids' o un filtro con 'from_status'.")
+        return attrs
+
+
+class BranchFilterSerializer(serializers.Serializer):
+    """Filtro ``?branch=`` de la query string (id de sucursal opcional)."""
+
+    branch = serializers.IntegerField(required=False, min_value=1)
+
+
+class ReportParamsSerializer(BranchFilterSerializer):
+    """Query string de los reportes; sin fechas cubre los últimos ``default_range_days`` días."""
+
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        today = timezone.localdate()
+        attrs.setdefault('date_to', today)
+        attrs.setdefault('date_from', today - timedelta(days=self.context.get('default_range_days', 30)))
+        if attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError('date_from debe ser anterior o igual a date_to.')
+        return attrs
+
+
+class BranchDailySalesSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    branch_id = serializers.IntegerField()
+    sales_count = serializers.IntegerField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=0)
+    cost = serializers.DecimalField(max_digits=14, decimal_places=0)
+    margin = serializers.DecimalField(max_digits=14, decimal_places=0)
+
+
+class ProductSalesSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    sku = serializers.CharField(source='product__sku')
+    name = serializers.CharField(source='product__name')
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=0)
+    cost = serializers.DecimalField(max_digits=14, decimal_places=0)
+    margin = serializers.DecimalField(max_digits=14, decimal_places=0)
@@ -0,0 +1,511 @@
+"""Operaciones de escritura compartidas (ventas, compras y stock).
+
+Las funciones de este módulo encapsulan las escrituras masivas sobre
+``Inventory`` para que serializers y vistas usen siempre el mismo camino
+transaccional.
+"""
+
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import (
+    ORDER_TRANSITIONS,
+    Branch,
+    DailyBranchSales,
+    DailyProductSales,
+    Inventory,
+    Order,
+    Product,
+    Purchase,
+    PurchaseItem,
+    Sale,
+    SaleItem,
+    StockAlert,
+    StockTransfer,
+    StockTransferItem,
+)
+
+
+def aggregate_quantities(items_data):
+    """Suma las cantidades por producto (``{product_id: cantidad}``)."""
+
+    quantities = defaultdict(int)
+    for item in items_data:
+        product = item['product']
+        product_id = getattr(product, 'pk', product)
+        quantities[product_id] += item['quantity']
+    return dict(quantities)
+
+
+def ensure_company_products(company_id, items_data):
+    """Rechaza las líneas cuyo producto no pertenece a ``company_id``."""
+
+    foreign, pending = set(), set()
+    for item in items_data:
+        product = item['product']
+        if isinstance(product, Product):
+            if product.company_id != company_id:
+                foreign.add(product.pk)
+        else:
+            pending.add(product)
+    if pending:
+        foreign.update(
+            Product.objects.filter(pk__in=pending).exclude(company_id=company_id).values_list('pk', flat=True)
+        )
+    if foreign:
+        raise ValidationError(
+            f"Los productos {', '.join(map(str, sorted(foreign)))} no pertenecen a la compañía de la sucursal."
+        )
+
+
+def compute_total(items_data):
+    """Total de un documento calculado a partir de sus líneas."""
+
+    return sum((item['price'] * item['quantity'] for item in items_data), 0)
+
+
+# Líneas por sentencia en los traspasos masivos: acota el largo de los ``OR``
+# y ``CASE`` generados (SQLite limita la profundidad de las expresiones).
+STOCK_BATCH_SIZE = 200
+
+
+def lock_inventory(branch_ids, product_ids):
+    """Bloquea las filas de inventario en orden ``(branch_id, product_id)``.
+
+    Ventas y traspasos toman los bloqueos siempre en ese orden global, así dos
+    transacciones concurrentes no pueden esperarse en ciclo. Retorna
+    ``{(branch_id, product_id): stock}``. Sin ``SELECT ... FOR UPDATE``
+    (SQLite) no consulta nada: la base ya serializa las escrituras.
+    """
+
+    if not connection.features.has_select_for_update:
+        return None
+    product_ids = sorted(product_ids)
+    locked = {}
+    for branch_id in sorted(branch_ids):
+        for start in range(0, len(product_ids), STOCK_BATCH_SIZE * 5):
+            rows = (
+                Inventory.objects.select_for_update()
+                .filter(branch_id=branch_id, product_id__in=product_ids[start:start + STOCK_BATCH_SIZE * 5])
+                .order_by('product_id')
+                .values_list('product_id', 'stock')
+            )
+            locked.update(((branch_id, product_id), stock) for product_id, stock in rows)
+    return locked
+
+
+def decrement_stock(branch_id, quantities):
+    """Descuenta stock de la sucursal con un único ``UPDATE`` condicional.
+
+    Solo se actualizan las filas con stock suficiente; si alguna línea no
+    cumple (o no existe inventario para el producto) se lanza
+    ``ValidationError`` y la transacción que envuelve la llamada se revierte.
+    """
+
+    if not quantities:
+        return
+
+    lock_inventory([branch_id], quantities)
+    _apply_decrement(branch_id, quantities)
+
+
+def _apply_decrement(branch_id, quantities):
+    # Un término por cantidad distinta: los traspasos suelen repetir cantidades.
+    by_quantity = defaultdict(list)
+    for product_id, quantity in quantities.items():
+        by_quantity[quantity].append(product_id)
+    condition = Q()
+    whens = []
+    for quantity, product_ids in sorted(by_quantity.items()):
+        condition |= Q(product_id__in=product_ids, stock__gte=quantity)
+        whens.append(When(product_id__in=product_ids, then=Value(quantity)))
+
+    updated = (
+        Inventory.objects.filter(branch_id=branch_id)
+        .filter(condition)
+        .update(stock=F('stock') - Case(*whens, default=Value(0), output_field=IntegerField()))
+    )
+    if updated != len(quantities):
+        raise ValidationError("Stock insuficiente en la sucursal para uno o más productos.")
+
+    record_stock_alerts(branch_id, {product_id: -quantity for product_id, quantity in quantities.items()})
+
+
+# Filas por sentencia de ``upsert_increment``: acota los parámetros por
+# consulta (PostgreSQL admite 65535 y SQLite 32766).
+UPSERT_BATCH_SIZE = 500
+
+
+def upsert_increment(model, unique_fields, increment_fields, rows):
+    """Inserta o suma valores en ``model`` con ``INSERT ... ON CONFLICT`` por lotes.
+
+    ``rows`` son diccionarios con los campos de ``unique_fields`` y
+    ``increment_fields``; ante conflicto sobre ``unique_fields`` las columnas de
+    ``increment_fields`` se suman a los valores existentes. Los campos
+    omitidos toman su valor por defecto al insertar. Se emite una sentencia
+    cada ``UPSERT_BATCH_SIZE`` filas. Requiere una restricción única sobre
+    ``unique_fields`` (PostgreSQL y SQLite >= 3.24) y que ``rows`` no repita
+    una misma clave.
+    """
+
+    if not rows:
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    conflict = ', '.join(qn(model._meta.get_field(name).column) for name in unique_fields)
+    updates = ', '.join(
+        f'{column} = {table}.{column} + EXCLUDED.{column}'
+        for column in (qn(model._meta.get_field(name).column) for name in increment_fields)
+    )
+    placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    columns = ', '.join(qn(field.column) for field in fields)
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            params = []
+            for row in batch:
+                for field in fields:
+                    value = row[field.name] if field.name in row else field.get_default()
+                    params.append(field.get_db_prep_save(value, connection=connection))
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([placeholders] * len(batch))} '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET {updates}',
+                params,
+            )
+
+
+def increment_stock(branch_id, quantities, company_id=None):
+    """Suma stock a la sucursal creando las filas de inventario faltantes."""
+
+    if company_id is None:
+        company_id = Branch.objects.values_list('company_id', flat=True).get(pk=branch_id)
+    existing = set(
+        Inventory.objects.filter(branch_id=branch_id, product_id__in=list(quantities))
+        .values_list('product_id', flat=True)
+    )
+    upsert_increment(
+        Inventory,
+        unique_fields=('branch', 'product'),
+        increment_fields=('stock',),
+        rows=[
+            {'company': company_id, 'branch': branch_id, 'product': product_id, 'stock': quantity}
+            for product_id, quantity in sorted(quantities.items())
+        ],
+    )
+    record_stock_alerts(branch_id, quantities, created=set(quantities) - existing)
+
+
+def record_stock_alerts(branch_id, deltas, created=()):
+    """Registra los cruces del punto de reposición causados por ``deltas``.
+
+    Se ejecuta después de aplicar ``{product_id: delta}``: lee solo las filas
+    afectadas (por la clave ``(branch, product)``) y compara en memoria el
+    stock anterior y el actual contra ``reorder_point``. Las filas de
+    ``created`` no tenían estado anterior: como en ``record_inventory_change``,
+    solo alertan si nacen bajo el punto de reposición.
+    """
+
+    if not deltas:
+        return
+
+    rows = [
+        (product_id, stock, reorder_point, company_id)
+        for product_id, stock, reorder_point, company_id in Inventory.objects.filter(
+            branch_id=branch_id, product_id__in=list(deltas)
+        ).values_list('product_id', 'stock', 'reorder_point', 'company_id')
+        # stock anterior = stock - delta
+        if (stock <= reorder_point) != (product_id not in created and stock - deltas[product_id] <= reorder_point)
+    ]
+    StockAlert.objects.bulk_create([
+        StockAlert(
+            company_id=company_id,
+            branch_id=branch_id,
+            product_id=product_id,
+            kind='low' if stock <= reorder_point else 'restored',
+            stock=stock,
+            reorder_point=reorder_point,
+        )
+        for product_id, stock, reorder_point, company_id in rows
+    ])
+
+
+def record_inventory_change(inventory, previous_stock, previous_reorder_point):
+    """Alerta por cambios manuales de stock o de punto de reposición."""
+
+    was_low = previous_stock is not None and previous_stock <= previous_reorder_point
+    is_low = inventory.stock <= inventory.reorder_point
+    if (previous_stock is None and not is_low) or was_low == is_low:
+        return
+    StockAlert.objects.create(
+        company_id=inventory.company_id,
+        branch_id=inventory.branch_id,
+        product_id=inventory.product_id,
+        kind='low' if is_low else 'restored',
+        stock=inventory.stock,
+        reorder_point=inventory.reorder_point,
+    )
+
+
+def record_sale_rollups(sale, items, sign=1):
+    """Acumula (o con ``sign=-1`` descuenta) una venta en los rollups diarios.
+
+    ``items`` son las ``SaleItem`` de la venta; el costo es el que quedó
+    registrado en cada línea (``SaleItem.cost``).
+    """
+
+    record_sales_rollups([(sale, items)], sign)
+
+
+def record_sales_rollups(sales, sign=1):
+    """Como ``record_sale_rollups`` para varios pares ``(venta, líneas)``.
+
+    Las filas se agregan en memoria por ``(sucursal, día)`` y ``(sucursal,
+    día, producto)``: un lote de ventas cuesta dos upserts.
+    """
+
+    per_branch = {}
+    per_product = {}
+    for sale, items in sales:
+        date = timezone.localdate(sale.created_at)
+        branch_row = per_branch.setdefault(
+            (sale.branch_id, date),
+            {'branch': sale.branch_id, 'date': date, 'sales_count': 0, 'units': 0, 'revenue': 0, 'cost': 0},
+        )
+        branch_row['sales_count'] += sign
+        for item in items:
+            row = per_product.setdefault(
+                (sale.branch_id, date, item.product_id),
+                {'branch': sale.branch_id, 'product': item.product_id, 'date': date, 'units': 0, 'revenue': 0, 'cost': 0},
+            )
+            for target in (row, branch_row):
+                target['units'] += sign * item.quantity
+                target['revenue'] += sign * item.quantity * item.price
+                target['cost'] += sign * item.quantity * item.cost
+
+    upsert_increment(
+        DailyBranchSales,
+        unique_fields=('branch', 'date'),
+        increment_fields=('sales_count', 'units', 'revenue', 'cost'),
+        rows=[per_branch[key] for key in sorted(per_branch)],
+    )
+    upsert_increment(
+        DailyProductSales,
+        unique_fields=('branch', 'date', 'product'),
+        increment_fields=('units', 'revenue', 'cost'),
+        rows=[per_product[key] for key in sorted(per_product)],
+    )
+
+
+@transaction.atomic
+def checkout_sale(sale_data, items_data):
+    """Registra una venta completa: stock, cabecera, líneas y rollups en una transacción."""
+
+    decrement_stock(sale_data['branch'].pk, aggregate_quantities(items_data))
+
+    sale = Sale.objects.create(total=compute_total(items_data), **sale_data)
+    items = SaleItem.objects.bulk_create(
+        [SaleItem(sale=sale, cost=item_data['product'].cost, **item_data) for item_data in items_data]
+    )
+    record_sale_rollups(sale, items)
+    return sale
+
+
+def checkout_sales(entries):
+    """Registra un lote de ventas ya validadas con escrituras por conjunto.
+
+    ``entries`` son pares ``(sale_data, items_data)`` como los de
+    ``checkout_sale``. El inventario de todo el lote se bloquea y se lee una
+    vez; las ventas se aceptan en orden mientras alcance el stock y el resto
+    se rechaza. Luego se aplica un ``UPDATE`` condicional por sucursal y se
+    insertan cabeceras, líneas y rollups con ``bulk_create`` y upserts.
+
+    Debe llamarse dentro de una transacción. Retorna ``(ventas, rechazos)``:
+    ``{índice: Sale}`` de las aceptadas y la lista de índices sin stock. Si el
+    ``UPDATE`` encuentra menos stock que la lectura (otra transacción sin
+    bloqueo de filas, p. ej. en SQLite) lanza ``ValidationError``.
+    """
+
+    quantities = [aggregate_quantities(items_data) for _sale_data, items_data in entries]
+    branch_ids = {sale_data['branch'].pk for sale_data, _items_data in entries}
+    product_ids = set().union(*quantities)
+    stock = lock_inventory(branch_ids, product_ids)
+    if stock is None:
+        stock = {
+            (branch_id, product_id): value
+            for branch_id, product_id, value in Inventory.objects.filter(
+                branch_id__in=branch_ids, product_id__in=product_ids
+            ).values_list('branch_id', 'product_id', 'stock')
+        }
+
+    accepted, rejected = [], []
+    totals = defaultdict(lambda: defaultdict(int))
+    for index, ((sale_data, _items_data), wanted) in enumerate(zip(entries, quantities)):
+        branch_id = sale_data['branch'].pk
+        if any(stock.get((branch_id, product_id), 0) < quantity for product_id, quantity in wanted.items()):
+            rejected.append(index)
+            continue
+        for product_id, quantity in wanted.items():
+            stock[(branch_id, product_id)] -= quantity
+            totals[branch_id][product_id] += quantity
+        accepted.append(index)
+
+    for branch_id in sorted(totals):
+        for batch in _batches(totals[branch_id]):
+            _apply_decrement(branch_id, batch)
+
+    sales = Sale.objects.bulk_create([
+        Sale(company_id=entries[index][0]['branch'].company_id, total=compute_total(entries[index][1]), **entries[index][0])
+        for index in accepted
+    ])
+    items = SaleItem.objects.bulk_create(
+        [
+            SaleItem(sale=sale, cost=item_data['product'].cost, **item_data)
+            for sale, index in zip(sales, accepted)
+            for item_data in entries[index][1]
+        ],
+        batch_size=STOCK_BATCH_SIZE * 5,
+    )
+    items_by_sale = defaultdict(list)
+    for item in items:
+        items_by_sale[item.sale_id].append(item)
+    record_sales_rollups([(sale, items_by_sale[sale.pk]) for sale in sales])
+    return dict(zip(accepted, sales)), rejected
+
+
+@transaction.atomic
+def delete_sale(sale):
+    """Elimina una venta: devuelve su stock a la sucursal y la descuenta de los rollups."""
+
+    items = list(sale.items.all())
+    increment_stock(
+        sale.branch_id,
+        aggregate_quantities([{'product': item.product_id, 'quantity': item.quantity} for item in items]),
+        sale.company_id,
+    )
+    record_sale_rollups(sale, items, sign=-1)
+    sale.delete()
+
+
+@transaction.atomic
+def receive_purchase(purchase_data, items_data):
+    """Registra una compra y suma sus cantidades al inventario de la sucursal.
+
+    La sucursal, el proveedor y los productos deben ser de la misma compañía.
+    """
+
+    company_id = purchase_data['branch'].company_id
+    if purchase_data['supplier'].company_id != company_id:
+        raise ValidationError("El proveedor no pertenece a la compañía de la sucursal.")
+    ensure_company_products(company_id, items_data)
+
+    purchase = Purchase.objects.create(**purchase_data)
+    PurchaseItem.objects.bulk_create(
+        [PurchaseItem(purchase=purchase, **item_data) for item_data in items_data]
+    )
+    increment_stock(purchase.branch_id, aggregate_quantities(items_data), purchase.company_id)
+    return purchase
+
+
+def transition_orders(company, order_ids, target):
+    """Mueve las órdenes ``order_ids`` de ``company`` al estado ``target``.
+
+    Las filas se bloquean y se aplica un ``UPDATE`` condicional por estado de
+    origen permitido. Retorna ``{'moved': [ids], 'rejected': [{id, status, reason}]}``.
+    """
+
+    requested = list(dict.fromkeys(order_ids))
+    by_status = defaultdict(list)
+    with transaction.atomic():
+        current = dict(
+            Order.objects.select_for_update()
+            .filter(company=company, pk__in=requested)
+            .order_by('pk')
+            .values_list('pk', 'status')
+        )
+        for order_id, status in current.items():
+            by_status[status].append(order_id)
+
+        moved = []
+        rejected = []
+        for status, ids in by_status.items():
+            if target in ORDER_TRANSITIONS.get(status, ()):
+                Order.objects.filter(pk__in=ids, status=status).update(status=target)
+                moved.extend(ids)
+            else:
+                reason = (
+                    "La orden ya está en ese estado." if status == target
+                    else f"Transición {status} → {target} no permitida."
+                )
+                rejected.extend({'id': order_id, 'status': status, 'reason': reason} for order_id in ids)
+
+    rejected.extend(
+        {'id': order_id, 'status': None, 'reason': "La orden no existe."}
+        for order_id in requested
+        if order_id not in current
+    )
+    return {'moved': sorted(moved), 'rejected': sorted(rejected, key=lambda row: row['id'])}
+
+
+def _batches(quantities):
+    items = sorted(quantities.items())
+    for start in range(0, len(items), STOCK_BATCH_SIZE):
+        yield dict(items[start:start + STOCK_BATCH_SIZE])
+
+
+def transfer_stock(source_branch, destination_branch, items_data, user=None, note=''):
+    """Mueve stock entre dos sucursales de la misma compañía en una transacción.
+
+    Las filas de ambas sucursales se bloquean en orden ``(branch_id,
+    product_id)``; el origen se descuenta con ``UPDATE`` condicionales y el
+    destino se suma con ``upsert_increment``, ambos por lotes de
+    ``STOCK_BATCH_SIZE`` líneas. Si falta stock de cualquier producto no se
+    mueve nada.
+    """
+
+    if source_branch.pk == destination_branch.pk:
+        raise ValidationError("La sucursal de origen y la de destino deben ser distintas.")
+    if source_branch.company_id != destination_branch.company_id:
+        raise ValidationError("Solo se puede traspasar stock entre sucursales de la misma compañía.")
+    quantities = aggregate_quantities(items_data)
+    if not quantities:
+        raise ValidationError("El traspaso debe incluir al menos un producto.")
+    ensure_company_products(source_branch.company_id, items_data)
+
+    with transaction.atomic():
+        locked = lock_inventory([source_branch.pk, destination_branch.pk], quantities)
+        if locked is not None:
+            missing = [
+                product_id for product_id, quantity in sorted(quantities.items())
+                if locked.get((source_branch.pk, product_id), 0) < quantity
+            ]
+            if missing:
+                raise ValidationError(
+                    f"Stock insuficiente en la sucursal de origen para los productos: {', '.join(map(str, missing))}."
+                )
+
+        for batch in _batches(quantities):
+            _apply_decrement(source_branch.pk, batch)
+            increment_stock(destination_branch.pk, batch, source_branch.company_id)
+
+        transfer = StockTransfer.objects.create(
+            company_id=source_branch.company_id,
+            source_branch=source_branch,
+            destination_branch=destination_branch,
+            user=user,
+            note=note,
+        )
+        StockTransferItem.objects.bulk_create(
+            [
+                StockTransferItem(transfer=transfer, product_id=product_id, quantity=quantity)
+                for product_id, quantity in sorted(quantities.items())
+            ],
+            batch_size=STOCK_BATCH_SIZE * 5,
+        )
+    return transfer
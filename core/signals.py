@@ -0,0 +1,44 @@
+"""Receivers que mantienen coherentes las cachés derivadas de los modelos."""
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_auth_versions
+from .catalog import bump_catalog_version
+from .models import Branch, Product, Subscription, User
+from .throttling import forget_unknown_user
+from .utils import invalidate_entitlements
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def subscription_changed(sender, instance, **kwargs):
+    invalidate_entitlements(instance.company_id)
+    # El plan va firmado en el JWT: los tokens de la compañía deben renovarse.
+    users = User.objects.filter(company_id=instance.company_id)
+    user_ids = list(users.values_list('pk', flat=True))
+    if user_ids:
+        users.update(auth_version=F('auth_version') + 1)
+        transaction.on_commit(lambda: invalidate_auth_versions(user_ids))
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    user_id = instance.pk  # delete() lo deja en None antes del commit.
+    transaction.on_commit(lambda: invalidate_auth_versions([user_id]))
+    # El nombre pudo estar en la caché negativa del login.
+    forget_unknown_user(instance.username)
+
+
+@receiver(post_delete, sender=Branch)
+def branch_deleted(sender, instance, **kwargs):
+    # Usa la compañía con la que se cargó la fila, no una asignación sin guardar.
+    Branch.release_slot(getattr(instance, '_loaded_company_id', instance.company_id))
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, instance, **kwargs):
+    # Tras el commit: antes, otra request podría cachear la página vieja con la versión nueva.
+    company_id = instance.company_id
+    transaction.on_commit(lambda: bump_catalog_version(company_id))
@@ -0,0 +1,138 @@
+"""Sincronización masiva de ventas registradas offline por los POS."""
+
+from itertools import islice
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ParseError
+
+from .models import Branch, Product, Sale
+from .serializers import BulkSaleSerializer
+from .services import checkout_sale, checkout_sales
+from .utils import item_product_ids, related_ids, valid_pks
+
+BULK_SYNC_CHUNK_SIZE = 200
+
+
+def _sync_chunk(records, user, offset):
+    company = user.company
+    dicts = [record for record in records if isinstance(record, dict)]
+
+    # Una consulta por lote para sucursales, productos y ventas ya sincronizadas.
+    context = {
+        'branch_cache': Branch.objects.filter(company=company).in_bulk(
+            valid_pks(Branch, related_ids(dicts, 'branch'))
+        ),
+        'product_cache': Product.objects.filter(company=company).in_bulk(
+            valid_pks(Product, item_product_ids(dicts))
+        ),
+    }
+    client_ids = {str(record['client_id']) for record in dicts if record.get('client_id')}
+    existing = {
+        (branch_id, client_id): sale_id
+        for sale_id, branch_id, client_id in Sale.objects.for_tenant(company).filter(
+            client_id__in=client_ids
+        ).values_list('id', 'branch_id', 'client_id')
+    }
+
+    results = []
+    pending = []
+    first_by_key = {}
+    repeated = []
+    for index, record in enumerate(records, start=offset):
+        result = {'index': index, 'client_id': None}
+        results.append(result)
+
+        if not isinstance(record, dict):
+            result.update(status='error', errors={'non_field_errors': ['Se esperaba un objeto.']})
+            continue
+        result['client_id'] = record.get('client_id')
+        if not record.get('client_id'):
+            result.update(status='error', errors={'client_id': ['Este campo es requerido.']})
+            continue
+
+        serializer = BulkSaleSerializer(data=record, context=context)
+        if not serializer.is_valid():
+            result.update(status='error', errors=serializer.errors)
+            continue
+
+        validated_data = serializer.validated_data
+        items_data = validated_data.pop('items')
+        key = (validated_data['branch'].pk, validated_data['client_id'])
+        if key in existing:
+            result.update(status='duplicate', id=existing[key])
+            continue
+        if key in first_by_key:
+            # El POS reenvió la venta dentro del mismo lote.
+            repeated.append((result, first_by_key[key]))
+            continue
+        first_by_key[key] = result
+        pending.append((result, {**validated_data, 'user': user}, items_data))
+
+    if pending:
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    sales, rejected = checkout_sales([(sale_data, items_data) for _result, sale_data, items_data in pending])
+            except (DjangoValidationError, IntegrityError):
+                # Otra transacción tocó el mismo stock o insertó la misma
+                # venta: se reintenta venta por venta para aislar el conflicto.
+                _checkout_one_by_one(pending)
+            else:
+                for position in rejected:
+                    pending[position][0].update(
+                        status='error', errors={'items': ["Stock insuficiente en la sucursal para uno o más productos."]}
+                    )
+                for position, sale in sales.items():
+                    pending[position][0].update(status='created', id=sale.pk)
+
+    for result, first in repeated:
+        if first['status'] == 'created':
+            result.update(status='duplicate', id=first['id'])
+        else:
+            result.update(status=first['status'], errors=first['errors'])
+    return results
+
+
+def _checkout_one_by_one(pending):
+    for result, sale_data, items_data in pending:
+        try:
+            with transaction.atomic():
+                sale = checkout_sale(sale_data, items_data)
+        except DjangoValidationError as exc:
+            result.update(status='error', errors={'items': exc.messages})
+        except IntegrityError:
+            # Otra sincronización concurrente insertó la misma venta.
+            result.update(status='duplicate', id=None)
+        else:
+            result.update(status='created', id=sale.pk)
+
+
+def sync_sales(records, user, chunk_size=BULK_SYNC_CHUNK_SIZE):
+    """Registra ventas en lotes, una transacción por lote.
+
+    Cada lote descuenta el stock e inserta sus ventas con escrituras por
+    conjunto (``checkout_sales``); una venta inválida o sin stock se informa
+    sin revertir al resto. Si el lote choca con otra transacción se reintenta
+    venta por venta, cada una en su savepoint.
+
+    Retorna ``(resultados, error)``: un resultado por registro con ``status``
+    ``created``, ``duplicate`` o ``error``, y el ``ParseError`` que cortó el
+    cuerpo a mitad de camino (``None`` si se leyó completo). Los registros
+    leídos antes del error se procesan igual.
+    """
+
+    results = []
+    iterator = iter(records)
+    while True:
+        chunk = []
+        error = None
+        try:
+            for record in islice(iterator, chunk_size):
+                chunk.append(record)
+        except ParseError as exc:
+            error = exc
+        if chunk:
+            results.extend(_sync_chunk(chunk, user, offset=len(results)))
+        if error is not None or len(chunk) < chunk_size:
+            return results, error
@@ -1,3 +1,1408 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import json
+import sys
+import time
+import types
+import zipfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import dashboard, metrics
+from .async_views import InventoryListView, LowStockView, MeView, ProductListView
+from .authentication import PLAN_EXPIRY_CLAIM, TenantRefreshToken, user_claims
+from .catalog import catalog_last_modified, catalog_version_key
+from .exports import sales_rows
+from .models import (
+    Branch,
+    Company,
+    DailyBranchSales,
+    DailyProductSales,
+    Inventory,
+    Order,
+    OrderItem,
+    Product,
+    Purchase,
+    PurchaseItem,
+    Sale,
+    SaleItem,
+    StockAlert,
+    StockTransfer,
+    Subscription,
+    Supplier,
+    User,
+)
+from .reports import rebuild_sales_rollups
+from .seeding import SeedSizes, _can_copy, seed_company
+from .services import increment_stock, receive_purchase, record_sale_rollups
+from .throttling import LoginRejected, _unknown_user_key, check_login, login_failed
+from .utils import NO_ENTITLEMENTS, get_entitlements, load_entitlements
+from .validators import MENSAJE_DV_RUT, MENSAJE_FORMATO_RUT, validar_ruts
+
+
+class QueryBudgetTests(TestCase):
+    """Fija la cantidad de consultas por endpoint: no debe crecer con las filas."""
+
+    ROWS = 10
+    ITEMS_PER_ROW = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Pyme', rut='11.111.111-1')
+        Subscription.objects.create(
+            company=cls.company,
+            plan_name='Premium',
+            start_date=datetime.date(2024, 1, 1),
+            end_date=datetime.date(2099, 1, 1),
+        )
+        cls.branch = Branch.objects.create(company=cls.company, name='Centro', address='Calle 1')
+        cls.user = User.objects.create_user(
+            username='gerente', password='clave1234', role='gerente', company=cls.company
+        )
+        supplier = Supplier.objects.create(company=cls.company, name='Proveedor', rut='11.111.111-1')
+        products = [
+            Product.objects.create(
+                company=cls.company, sku=f'AAA-{i:04d}', name=f'Producto {i}', price=100, cost=60
+            )
+            for i in range(cls.ROWS)
+        ]
+        for product in products:
+            Inventory.objects.create(branch=cls.branch, product=product, stock=10)
+
+        for _ in range(cls.ROWS):
+            sale = Sale.objects.create(branch=cls.branch, user=cls.user, total=300)
+            purchase = Purchase.objects.create(branch=cls.branch, supplier=supplier, total=300)
+            order = Order.objects.create(
+                company=cls.company, customer_name='Cliente', customer_email='c@example.com', total=300
+            )
+            for product in products[:cls.ITEMS_PER_ROW]:
+                SaleItem.objects.create(sale=sale, product=product, quantity=1, price=100)
+                PurchaseItem.objects.create(purchase=purchase, product=product, quantity=1, price=100)
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=100)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_list_budget(self, url, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), self.ROWS)
+        return response
+
+    def test_sales_list(self):
+        response = self.assert_list_budget('/api/sales/', 2)
+        self.assertEqual(len(response.data['results'][0]['items']), self.ITEMS_PER_ROW)
+
+    def test_purchases_list(self):
+        self.assert_list_budget('/api/purchases/', 2)
+
+    def test_orders_list(self):
+        self.assert_list_budget('/api/orders/', 2)
+
+    def test_inventory_list(self):
+        response = self.assert_list_budget('/api/inventory/', 1)
+        self.assertTrue(response.data['results'][0]['product_name'])
+
+    def test_products_list(self):
+        self.assert_list_budget('/api/products/', 1)
+
+    def test_nested_items_are_complete(self):
+        expected = [
+            {'product': product_id, 'quantity': 1, 'price': '100'}
+            for product_id in Product.objects.order_by('sku').values_list('pk', flat=True)[:self.ITEMS_PER_ROW]
+        ]
+        for url in ('/api/sales/', '/api/purchases/', '/api/orders/'):
+            for row in self.client.get(url).data['results']:
+                self.assertEqual(sorted(row['items'], key=lambda item: item['product']), expected, url)
+        names = dict(Product.objects.values_list('pk', 'name'))
+        for row in self.client.get('/api/inventory/').data['results']:
+            self.assertEqual(row['product_name'], names[row['product']])
+
+    def test_me(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/me/')
+        self.assertEqual(response.data['plan'], 'Premium')
+
+    def test_jwt_skips_user_lookup(self):
+        client = APIClient()
+        response = client.post('/api/token/', {'username': 'gerente', 'password': 'clave1234'}, format='json')
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        client.get('/api/inventory/')  # Deja la versión del token en caché.
+        with self.assertNumQueries(1):
+            response = client.get('/api/inventory/')
+        self.assertEqual(response.status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(client.get('/api/inventory/').status_code, 401)
+
+    def test_dashboard_snapshot_cached(self):
+        cache.clear()
+        client = Client()
+        client.force_login(self.user)
+        response = client.get('/dashboard/gerente/')
+        self.assertEqual(response.context['kpis']['today_sales']['sales_count'], 0)
+        # Sesión y usuario; la foto de KPIs y el plan salen de la caché.
+        with self.assertNumQueries(2):
+            response = client.get('/dashboard/gerente/')
+        self.assertContains(response, 'Órdenes pendientes')
+
+    def test_login_rejects_unknown_user_without_queries(self):
+        cache.clear()
+        client = APIClient()
+        credentials = {'username': 'nadie', 'password': 'clave1234'}
+        self.assertEqual(client.post('/api/token/', credentials, format='json').status_code, 401)
+        with self.assertNumQueries(0):
+            response = client.post('/api/token/', credentials, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_stock_transfer_create(self):
+        destination = Branch.objects.create(company=self.company, name='Norte', address='Calle 2')
+        items = [
+            {'product': product_id, 'quantity': 2}
+            for product_id in self.branch.inventory_set.values_list('product_id', flat=True)
+        ]
+        payload = {'source_branch': self.branch.pk, 'destination_branch': destination.pk, 'items': items}
+        # Sucursales, productos, savepoints, descuento, alertas, destino, alertas,
+        # cabecera, líneas y la relectura de líneas: no depende de cuántas sean.
+        with self.assertNumQueries(12):
+            response = self.client.post('/api/stock-transfers/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['items']), self.ROWS)
+        self.assertEqual(destination.inventory_set.filter(stock=2).count(), self.ROWS)
+
+        payload['items'] = [{'product': items[0]['product'], 'quantity': 100}]
+        response = self.client.post('/api/stock-transfers/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+def create_tenant(name, rut, username, plan='Premium', role='gerente'):
+    """Compañía con suscripción, una sucursal y un usuario del rol indicado."""
+
+    company = Company.objects.create(name=name, rut=rut)
+    Subscription.objects.create(
+        company=company, plan_name=plan, start_date=datetime.date(2024, 1, 1), end_date=datetime.date(2099, 1, 1)
+    )
+    branch = Branch.objects.create(company=company, name='Centro', address='Calle 1')
+    user = User.objects.create_user(username=username, password='clave1234', role=role, company=company)
+    return company, branch, user
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.branch, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente')
+        moment = timezone.now() - datetime.timedelta(hours=1)
+        # Cuatro ventas empatadas en created_at: el desempate es por id.
+        cls.sales = [
+            Sale.objects.create(
+                branch=cls.branch, user=cls.user, total=100,
+                created_at=moment if number < 4 else moment + datetime.timedelta(minutes=number),
+            )
+            for number in range(7)
+        ]
+        cls.expected = [sale.pk for sale in sorted(cls.sales, key=lambda sale: (sale.created_at, sale.pk), reverse=True)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_ties_are_walked_once_in_order(self):
+        self.assertEqual(self.walk('/api/sales/?page_size=2'), self.expected)
+
+    def test_cursor_is_stable_across_inserts(self):
+        first = self.client.get('/api/sales/', {'page_size': 3}).data
+        Sale.objects.create(branch=self.branch, user=self.user, total=100)
+        rest = self.walk(first['next'])
+        self.assertEqual([row['id'] for row in first['results']] + rest, self.expected)
+
+        previous = self.client.get(self.client.get(first['next']).data['previous']).data
+        self.assertEqual([row['id'] for row in previous['results']], self.expected[:3])
+
+    def test_count_is_opt_in(self):
+        self.assertNotIn('count', self.client.get('/api/sales/').data)
+        self.assertEqual(self.client.get('/api/sales/', {'count': 'exact', 'page_size': 2}).data['count'], 7)
+        # Fuera de PostgreSQL la estimación cae en COUNT(*).
+        self.assertEqual(self.client.get('/api/sales/', {'count': 'estimate'}).data['count'], 7)
+        self.assertEqual(len(self.client.get('/api/sales/', {'page_size': 1000}).data['results']), 7)
+
+
+class EntitlementsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.branch, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente', plan='Basico')
+
+    def setUp(self):
+        cache.clear()
+
+    def change_subscription(self, **fields):
+        subscription = Subscription.objects.get(company=self.company)
+        for name, value in fields.items():
+            setattr(subscription, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription.save()
+
+    def reports_status(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.select_related('company').get(pk=self.user.pk))
+        return client.get('/api/reports/sales/').status_code
+
+    def test_snapshot_is_cached_and_invalidated_on_change(self):
+        entitlements = load_entitlements(self.company.pk)
+        self.assertEqual((entitlements.plan_name, entitlements.branch_limit), ('Basico', 1))
+        self.assertEqual(entitlements.features, frozenset())
+        with self.assertNumQueries(0):
+            load_entitlements(self.company.pk)
+
+        self.change_subscription(plan_name='Premium')
+        entitlements = load_entitlements(self.company.pk)
+        self.assertEqual(entitlements.features, {'reports_standard', 'reports_advanced'})
+        self.assertIsNone(entitlements.branch_limit)
+
+    def test_inactive_or_missing_subscription_grants_nothing(self):
+        self.change_subscription(plan_name='Premium', active=False)
+        self.assertIsNone(load_entitlements(self.company.pk).effective_plan)
+        self.assertEqual(load_entitlements(self.company.pk).features, frozenset())
+
+        other = Company.objects.create(name='Sin plan', rut='22.222.222-2')
+        self.assertEqual(load_entitlements(other.pk), NO_ENTITLEMENTS)
+        with self.assertNumQueries(0):
+            self.assertEqual(load_entitlements(other.pk), NO_ENTITLEMENTS)
+
+    def test_plan_features_gate_reports(self):
+        self.assertEqual(self.reports_status(), 403)
+        self.change_subscription(plan_name='Estandar')
+        self.assertEqual(self.reports_status(), 200)
+
+    def test_company_memo_lasts_for_the_instance(self):
+        company = Company.objects.get(pk=self.company.pk)
+        self.assertEqual(get_entitlements(company).plan_name, 'Basico')
+        self.change_subscription(plan_name='Premium')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_entitlements(company).plan_name, 'Basico')
+        self.assertEqual(get_entitlements(Company.objects.get(pk=self.company.pk)).plan_name, 'Premium')
+
+
+class BranchLimitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.branch, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente', plan='Basico')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_branch(self, name):
+        payload = {'company': self.company.pk, 'name': name, 'address': 'Calle 9'}
+        return self.client.post('/api/branches/', payload, format='json')
+
+    def branch_count(self):
+        return Company.objects.values_list('branch_count', flat=True).get(pk=self.company.pk)
+
+    def test_limit_is_enforced_and_released(self):
+        self.assertEqual(self.branch_count(), 1)
+        response = self.create_branch('Norte')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('máximo 1', str(response.data))
+        self.assertEqual(self.branch_count(), 1)
+
+        self.assertEqual(self.client.delete(f'/api/branches/{self.branch.pk}/').status_code, 204)
+        self.assertEqual(self.branch_count(), 0)
+        self.assertEqual(self.create_branch('Norte').status_code, 201)
+        self.assertEqual(self.branch_count(), 1)
+
+    def test_upgrade_raises_the_limit(self):
+        subscription = Subscription.objects.get(company=self.company)
+        subscription.plan_name = 'Estandar'
+        subscription.save()
+        self.assertEqual([self.create_branch(name).status_code for name in ('A', 'B', 'C')], [201, 201, 400])
+        self.assertEqual(Branch.objects.filter(company=self.company).count(), 3)
+        self.assertEqual(self.branch_count(), 3)
+
+    def test_renaming_does_not_take_a_slot(self):
+        response = self.client.patch(f'/api/branches/{self.branch.pk}/', {'name': 'Centro 2'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.branch_count(), 1)
+
+
+class PurchaseTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.branch, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente')
+        cls.supplier = Supplier.objects.create(company=cls.company, name='Proveedor', rut='11.111.111-1')
+        cls.product = Product.objects.create(company=cls.company, sku='AAA-0001', name='Harina', price=100, cost=60)
+        cls.other_company, cls.other_branch, _ = create_tenant('Otra', '22.222.222-2', 'otro')
+        cls.other_supplier = Supplier.objects.create(company=cls.other_company, name='Ajeno', rut='22.222.222-2')
+        cls.other_product = Product.objects.create(
+            company=cls.other_company, sku='BBB-0001', name='Azúcar', price=100, cost=60
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, **overrides):
+        payload = {
+            'branch': self.branch.pk,
+            'supplier': self.supplier.pk,
+            'total': 600,
+            'items': [{'product': self.product.pk, 'quantity': 4, 'price': 60}],
+            **overrides,
+        }
+        return self.client.post('/api/purchases/', payload, format='json')
+
+    def test_receive_upserts_inventory(self):
+        self.assertEqual(self.post().status_code, 201)
+        items = [
+            {'product': self.product.pk, 'quantity': 4, 'price': 60},
+            {'product': self.product.pk, 'quantity': 1, 'price': 60},
+        ]
+        self.assertEqual(self.post(items=items).status_code, 201)
+        inventory = Inventory.objects.get(branch=self.branch, product=self.product)
+        self.assertEqual(inventory.stock, 9)
+        self.assertEqual(inventory.company_id, self.company.pk)
+
+    def test_receive_upserts_in_batches(self):
+        products = [self.product] + [
+            Product.objects.create(company=self.company, sku=f'AAA-{i:04d}', name=f'Producto {i}', price=100, cost=60)
+            for i in range(2, 6)
+        ]
+        Inventory.objects.create(branch=self.branch, product=self.product, stock=1)
+        items = [{'product': product.pk, 'quantity': 3, 'price': 60} for product in products]
+        with mock.patch('core.services.UPSERT_BATCH_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.post(items=items).status_code, 201)
+        upserts = [query for query in queries if query['sql'].startswith('INSERT INTO "core_inventory"')]
+        self.assertEqual(len(upserts), 3)
+        self.assertEqual(
+            dict(Inventory.objects.filter(branch=self.branch).values_list('product_id', 'stock')),
+            {product.pk: 4 if product == self.product else 3 for product in products},
+        )
+
+    def test_rejects_other_company_references(self):
+        for overrides, field in (
+            ({'branch': self.other_branch.pk}, 'branch'),
+            ({'supplier': self.other_supplier.pk}, 'supplier'),
+            ({'items': [{'product': self.other_product.pk, 'quantity': 1, 'price': 60}]}, 'items'),
+        ):
+            response = self.post(**overrides)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(field, response.data)
+        self.assertFalse(Purchase.objects.exists())
+        self.assertFalse(Inventory.objects.filter(branch=self.other_branch).exists())
+
+    def test_service_rejects_foreign_product(self):
+        purchase_data = {'branch': self.branch, 'supplier': self.supplier, 'total': 60}
+        with self.assertRaises(ValidationError):
+            receive_purchase(purchase_data, [{'product': self.other_product, 'quantity': 1, 'price': 60}])
+        with self.assertRaises(ValidationError):
+            receive_purchase({**purchase_data, 'supplier': self.other_supplier}, [])
+        self.assertFalse(Inventory.objects.exists())
+
+
+class SaleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.branch, cls.user = create_tenant('Pyme', '11.111.111-1', 'vendedor', role='vendedor')
+        cls.products = [
+            Product.objects.create(company=cls.company, sku=f'AAA-{i:04d}', name=f'Producto {i}', price=100, cost=60)
+            for i in range(2)
+        ]
+        for product in cls.products:
+            Inventory.objects.create(branch=cls.branch, product=product, stock=5)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, *lines):
+        items = [{'product': product.pk, 'quantity': quantity, 'price': 100} for product, quantity in lines]
+        return self.client.post('/api/sales/', {'branch': self.branch.pk, 'items': items}, format='json')
+
+    def stock(self):
+        return dict(Inventory.objects.filter(branch=self.branch).values_list('product_id', 'stock'))
+
+    def test_delete_restores_stock_and_rollups(self):
+        first, second = self.products
+        response = self.checkout((first, 2), (second, 1))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stock(), {first.pk: 3, second.pk: 4})
+
+        self.assertEqual(self.client.delete(f"/api/sales/{response.data['id']}/").status_code, 204)
+        self.assertEqual(self.stock(), {first.pk: 5, second.pk: 5})
+        daily = DailyBranchSales.objects.get(branch=self.branch)
+        self.assertEqual((daily.sales_count, daily.units, daily.revenue, daily.cost), (0, 0, 0, 0))
+        self.assertFalse(DailyProductSales.objects.exclude(units=0).exists())
+
+    def test_checkout_decrements_stock_and_recomputes_total(self):
+        first, second = self.products
+        response = self.checkout((first, 2), (second, 1))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total'], '300')
+        self.assertEqual(response.data['user'], self.user.pk)
+        self.assertEqual(self.stock(), {first.pk: 3, second.pk: 4})
+        daily = DailyBranchSales.objects.get(branch=self.branch)
+        self.assertEqual((daily.sales_count, daily.units, daily.revenue, daily.cost), (1, 3, 300, 180))
+
+    def test_oversell_rolls_back_the_whole_sale(self):
+        first, second = self.products
+        response = self.checkout((first, 1), (second, 6))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+        self.assertEqual(self.stock(), {first.pk: 5, second.pk: 5})
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(DailyBranchSales.objects.exists())
+
+    def test_duplicate_lines_are_summed_against_stock(self):
+        first, _ = self.products
+        self.assertEqual(self.checkout((first, 3), (first, 3)).status_code, 400)
+        self.assertEqual(self.stock()[first.pk], 5)
+
+        response = self.checkout((first, 2), (first, 3))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['items']), 2)
+        self.assertEqual(self.stock()[first.pk], 0)
+        self.assertEqual(DailyProductSales.objects.get(product=first).units, 5)
+
+    def test_rollups_keep_the_cost_at_sale_time(self):
+        first, second = self.products
+        sale_id = self.checkout((first, 2)).data['id']
+        self.checkout((second, 1))
+        Product.objects.filter(pk=first.pk).update(cost=90)
+        self.assertEqual(SaleItem.objects.get(sale_id=sale_id).cost, 60)
+
+        rebuild_sales_rollups(company=self.company)
+        self.assertEqual(DailyBranchSales.objects.get(branch=self.branch).cost, 180)
+        self.client.delete(f'/api/sales/{sale_id}/')
+        daily = DailyBranchSales.objects.get(branch=self.branch)
+        self.assertEqual((daily.sales_count, daily.cost), (1, 60))
+
+    def test_sales_cannot_be_edited(self):
+        sale_id = self.checkout((self.products[0], 1)).data['id']
+        other = Branch.objects.create(company=self.company, name='Norte', address='Calle 2')
+        for method in (self.client.patch, self.client.put):
+            response = method(f'/api/sales/{sale_id}/', {'branch': other.pk}, format='json')
+            self.assertEqual(response.status_code, 405)
+        self.assertEqual(Sale.objects.get().branch_id, self.branch.pk)
+
+
+class SyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.branch, cls.user = create_tenant('Pyme', '11.111.111-1', 'vendedor', role='vendedor')
+        cls.products = [
+            Product.objects.create(company=cls.company, sku=f'SYN-{i:04d}', name=f'Producto {i}', price=100, cost=60)
+            for i in range(2)
+        ]
+        for product in cls.products:
+            Inventory.objects.create(branch=cls.branch, product=product, stock=5)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def record(self, client_id, product, quantity):
+        return {
+            'client_id': client_id,
+            'branch': self.branch.pk,
+            'items': [{'product': product.pk, 'quantity': quantity, 'price': 100}],
+        }
+
+    def post(self, body, content_type='application/json'):
+        return self.client.post('/api/sales/bulk/', body, content_type=content_type)
+
+    def test_duplicates_in_the_database_and_in_the_same_batch(self):
+        first, _ = self.products
+        created = self.post(json.dumps([self.record('pos-1', first, 1)])).data['results'][0]
+        records = [self.record('pos-1', first, 1), self.record('pos-2', first, 1), self.record('pos-2', first, 1)]
+        response = self.post(json.dumps(records))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['duplicate']), (1, 2))
+        results = response.data['results']
+        self.assertEqual(results[0]['id'], created['id'])
+        self.assertEqual(results[2], {**results[1], 'index': 2, 'status': 'duplicate'})
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertEqual(Inventory.objects.get(product=first).stock, 3)
+
+    def test_ndjson_body(self):
+        first, second = self.products
+        body = '\n'.join(json.dumps(record) for record in (self.record('a', first, 2), self.record('b', second, 1)))
+        response = self.post(body + '\n', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 2)
+        daily = DailyBranchSales.objects.get(branch=self.branch)
+        self.assertEqual((daily.sales_count, daily.units, daily.revenue, daily.cost), (2, 3, 300, 180))
+
+    def test_records_without_stock_do_not_revert_the_batch(self):
+        first, second = self.products
+        records = [self.record('a', first, 4), self.record('b', first, 2), self.record('c', second, 5)]
+        response = self.post(json.dumps(records))
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'error', 'created'])
+        self.assertIn('items', response.data['results'][1]['errors'])
+        stock = dict(Inventory.objects.values_list('product_id', 'stock'))
+        self.assertEqual(stock, {first.pk: 1, second.pk: 0})
+        self.assertEqual(SaleItem.objects.filter(sale__client_id='a').get().cost, 60)
+
+    def test_parse_error_keeps_the_records_already_read(self):
+        first, _ = self.products
+        body = json.dumps(self.record('a', first, 1)) + '\n{"client_id": "b", \n'
+        response = self.post(body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('NDJSON', str(response.data['detail']))
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['results'][0]['status'], 'created')
+        self.assertTrue(Sale.objects.filter(client_id='a').exists())
+
+    def test_invalid_encoding_is_a_parse_error(self):
+        response = self.post(b'[{"client_id": "\xff"}]')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['results'], [])
+
+    def test_conflicting_batch_falls_back_to_one_sale_at_a_time(self):
+        first, _ = self.products
+        records = [self.record('a', first, 3), self.record('b', first, 3)]
+        with mock.patch('core.sync.checkout_sales', side_effect=ValidationError('carrera')):
+            response = self.post(json.dumps(records))
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'error'])
+        self.assertEqual(Inventory.objects.get(product=first).stock, 2)
+
+    def test_batch_queries_do_not_grow_with_records(self):
+        first, second = self.products
+        Inventory.objects.update(stock=1000)
+        records = [self.record(f'r{i}', (first, second)[i % 2], 1) for i in range(40)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post(json.dumps(records))
+        self.assertEqual(response.data['created'], 40)
+        self.assertLess(len(ctx.captured_queries), 20)
+        self.assertEqual(Inventory.objects.get(product=first).stock, 980)
+
+
+class SeedingTests(TestCase):
+    sizes = SeedSizes(products=12, suppliers=2, purchases=6, sales=25, orders=8, days=30)
+    base_date = datetime.date(2026, 3, 31)
+
+    def signature(self, company):
+        return {
+            'products': list(Product.objects.for_tenant(company).order_by('sku').values_list('sku', 'price', 'cost')),
+            'sales': list(
+                Sale.objects.for_tenant(company).order_by('created_at', 'total').values_list('created_at', 'total')
+            ),
+            'items': SaleItem.objects.filter(sale__company=company).count(),
+            'orders': list(Order.objects.for_tenant(company).order_by('customer_name').values_list('status', 'total')),
+        }
+
+    def test_same_seed_and_base_date_give_the_same_data(self):
+        signatures = []
+        for _ in range(2):
+            try:
+                with transaction.atomic():
+                    signatures.append(self.signature(seed_company(1, self.sizes, base_date=self.base_date)))
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(signatures[0], signatures[1])
+        self.assertEqual(len(signatures[0]['sales']), 25)
+
+    def test_history_ends_on_the_base_date(self):
+        company = seed_company(1, self.sizes, base_date=self.base_date)
+        dates = {timezone.localdate(created_at) for created_at in Sale.objects.values_list('created_at', flat=True)}
+        self.assertLessEqual(max(dates), self.base_date)
+        self.assertGreaterEqual(min(dates), self.base_date - datetime.timedelta(days=30))
+        self.assertEqual(company.subscription.end_date, self.base_date + datetime.timedelta(days=365))
+
+    @skipUnless(_can_copy(), "COPY requiere PostgreSQL con psycopg 3.")
+    def test_copy_path_reserves_ids_and_links_items(self):
+        company = seed_company(1, self.sizes, base_date=self.base_date)
+        sales = Sale.objects.for_tenant(company)
+        self.assertEqual(sales.count(), 25)
+        self.assertEqual(SaleItem.objects.filter(sale__in=sales).count(), SaleItem.objects.count())
+        self.assertFalse(Sale.objects.filter(items__isnull=True).exists())
+        branch = company.branch_set.first()
+        later = Sale.objects.create(branch=branch, user=company.user_set.first(), total=0)
+        self.assertGreater(later.pk, max(sales.values_list('pk', flat=True)))
+
+
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, _, _ = create_tenant('Pyme', '11.111.111-1', 'gerente')
+
+    def setUp(self):
+        cache.clear()
+        self.key = dashboard.snapshot_cache_key(self.company.pk)
+
+    def store_stale(self):
+        stale = {'computed_at': time.time() - 3600, 'blocks': {}}
+        cache.set(self.key, stale)
+        return stale
+
+    @override_settings(DASHBOARD_REFRESH_WORKERS=0)
+    def test_stale_snapshot_is_served_and_refreshed_behind_the_lock(self):
+        stale = self.store_stale()
+        self.assertEqual(dashboard.get_snapshot(self.company.pk), stale)
+        fresh = cache.get(self.key)
+        self.assertGreater(fresh['computed_at'], stale['computed_at'])
+        self.assertEqual(fresh['blocks']['pending_orders']['count'], 0)
+        self.assertIsNone(cache.get(dashboard._lock_key(self.company.pk)))
+
+    @override_settings(DASHBOARD_REFRESH_WORKERS=2)
+    def test_one_background_refresh_per_company(self):
+        self.store_stale()
+        executor = mock.Mock()
+        with mock.patch.object(dashboard, '_refresh_executor', return_value=executor):
+            dashboard.get_snapshot(self.company.pk)
+            dashboard.get_snapshot(self.company.pk)
+        executor.submit.assert_called_once()
+
+        # La tarea encolada recalcula y libera el candado (aquí en el hilo del
+        # test, cuya conexión está dentro de la transacción del TestCase).
+        with mock.patch.object(dashboard, 'close_old_connections') as close:
+            executor.submit.call_args.args[0]()
+        self.assertEqual(close.call_count, 2)
+        self.assertLess(time.time() - cache.get(self.key)['computed_at'], 60)
+        self.assertIsNone(cache.get(dashboard._lock_key(self.company.pk)))
+
+    @override_settings(DASHBOARD_REFRESH_WORKERS=0)
+    def test_failed_refresh_releases_the_lock(self):
+        stale = self.store_stale()
+        failing = mock.patch.object(dashboard, 'compute_snapshot', side_effect=RuntimeError)
+        with failing, self.assertLogs('core.dashboard'):
+            self.assertEqual(dashboard.get_snapshot(self.company.pk), stale)
+        self.assertIsNone(cache.get(dashboard._lock_key(self.company.pk)))
+
+
+class LowStockAlertTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.branch, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente')
+        cls.product = Product.objects.create(company=cls.company, sku='LOW-001', name='Leche', price=100, cost=60)
+        cls.other = Product.objects.create(company=cls.company, sku='LOW-002', name='Pan', price=100, cost=60)
+        cls.inventory = Inventory.objects.create(branch=cls.branch, product=cls.product, stock=10, reorder_point=5)
+        Inventory.objects.create(branch=cls.branch, product=cls.other, stock=50, reorder_point=5)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sell(self, quantity):
+        items = [{'product': self.product.pk, 'quantity': quantity, 'price': 100}]
+        response = self.client.post('/api/sales/', {'branch': self.branch.pk, 'items': items}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_crossings_are_recorded_once(self):
+        self.sell(4)
+        self.assertFalse(StockAlert.objects.exists())
+        self.sell(2)
+        self.sell(1)
+        alert = StockAlert.objects.get()
+        self.assertEqual((alert.kind, alert.stock, alert.reorder_point, alert.company_id), ('low', 4, 5, self.company.pk))
+
+        response = self.client.patch(f'/api/inventory/{self.inventory.pk}/', {'stock': 20}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(StockAlert.objects.order_by('id').values_list('kind', flat=True)), ['low', 'restored'])
+
+    def test_new_inventory_rows_have_no_previous_state(self):
+        fresh = Product.objects.create(company=self.company, sku='LOW-003', name='Queso', price=100, cost=60)
+        # Una fila nueva no estaba "baja": no hay reposición que avisar.
+        increment_stock(self.branch.pk, {fresh.pk: 2}, company_id=self.company.pk)
+        self.assertFalse(StockAlert.objects.exists())
+
+        Inventory.objects.filter(pk=self.inventory.pk).update(stock=3)
+        increment_stock(self.branch.pk, {self.product.pk: 10, fresh.pk: 1}, company_id=self.company.pk)
+        self.assertEqual(list(StockAlert.objects.values_list('product_id', 'kind')), [(self.product.pk, 'restored')])
+
+    def test_low_stock_list_and_alert_feed(self):
+        self.sell(6)
+        rows = self.client.get('/api/inventory/low-stock/').data['results']
+        self.assertEqual([row['product'] for row in rows], [self.product.pk])
+
+        pending = self.client.get('/api/stock-alerts/', {'pending': 'true'}).data['results']
+        self.assertEqual([(row['product_sku'], row['kind']) for row in pending], [('LOW-001', 'low')])
+        response = self.client.post(f"/api/stock-alerts/{pending[0]['id']}/acknowledge/")
+        self.assertTrue(response.data['acknowledged'])
+        self.assertEqual(self.client.get('/api/stock-alerts/', {'pending': 'true'}).data['results'], [])
+        self.assertEqual(len(self.client.get('/api/stock-alerts/').data['results']), 1)
+
+    def test_feed_is_tenant_scoped(self):
+        self.sell(6)
+        _, _, outsider = create_tenant('Otra', '22.222.222-2', 'otro')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get('/api/stock-alerts/').data['results'], [])
+        self.assertEqual(self.client.get('/api/inventory/low-stock/').data['results'], [])
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.branch, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente')
+        cls.product = Product.objects.create(company=cls.company, sku='EXP-001', name='Té, verde', price=100, cost=60)
+        Inventory.objects.create(branch=cls.branch, product=cls.product, stock=7, reorder_point=2)
+        sale = Sale.objects.create(branch=cls.branch, user=cls.user, total=300, client_id='pos-1')
+        SaleItem.objects.create(sale=sale, product=cls.product, quantity=3, price=100)
+        cls.old = Sale.objects.create(
+            branch=cls.branch, user=cls.user, total=100, created_at=timezone.now() - datetime.timedelta(days=40)
+        )
+        SaleItem.objects.create(sale=cls.old, product=cls.product, quantity=1, price=100)
+
+        other_company, other_branch, other_user = create_tenant('Otra', '22.222.222-2', 'otro')
+        other_product = Product.objects.create(company=other_company, sku='AJE-001', name='Ajeno', price=1, cost=1)
+        foreign = Sale.objects.create(branch=other_branch, user=other_user, total=1)
+        SaleItem.objects.create(sale=foreign, product=other_product, quantity=1, price=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_sales_csv_is_tenant_scoped_and_filtered(self):
+        since = timezone.localdate() - datetime.timedelta(days=7)
+        response, body = self.download('/api/sales/export/', date_from=since)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('ventas.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(body.decode('utf-8').splitlines()))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(
+            (rows[0]['client_id'], rows[0]['product'], rows[0]['quantity'], rows[0]['line_total']),
+            ('pos-1', 'Té, verde', '3', '300'),
+        )
+        _, body = self.download('/api/sales/export/')
+        self.assertEqual(len(body.decode('utf-8').splitlines()), 3)
+
+    def test_date_filters_cover_whole_local_days(self):
+        with timezone.override('America/Santiago'):
+            day = timezone.localdate(self.old.created_at)
+            _, rows = sales_rows(self.company, day, day)
+            self.assertEqual([row[0] for row in rows], [self.old.pk])
+            _, rows = sales_rows(self.company, day + datetime.timedelta(days=1), day + datetime.timedelta(days=1))
+            self.assertEqual(list(rows), [])
+
+    def test_ndjson_and_gzip_outputs(self):
+        response, body = self.download('/api/inventory/export/', output='ndjson', branch=self.branch.pk)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(
+            [json.loads(line) for line in body.decode('utf-8').splitlines()],
+            [{'branch_id': self.branch.pk, 'branch': 'Centro', 'sku': 'EXP-001', 'product': 'Té, verde',
+              'stock': 7, 'reorder_point': 2}],
+        )
+        response, body = self.download('/api/sales/export/', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(gzip.decompress(body).decode('utf-8').startswith('sale_id,created_at'))
+
+    def test_invalid_options_and_roles(self):
+        self.assertEqual(self.client.get('/api/sales/export/', {'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/purchases/export/', {'date_from': 'ayer'}).status_code, 400)
+        _, _, seller = create_tenant('Tercera', '33.333.333-3', 'vendedor', role='vendedor')
+        self.client.force_authenticate(seller)
+        self.assertEqual(self.client.get('/api/sales/export/').status_code, 403)
+
+
+class RutLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, _, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente')
+        cls.colleague = User.objects.create_user(
+            username='colega', password='clave1234', role='vendedor', company=cls.company, rut='5.126.663-3'
+        )
+        other_company, _, _ = create_tenant('Otra', '22.222.222-2', 'otro')
+        cls.stranger = User.objects.create_user(
+            username='ajeno', password='clave1234', role='vendedor', company=other_company, rut='12.345.678-5'
+        )
+        cls.root = User.objects.create_user(username='root', password='clave1234', role='super_admin')
+
+    def lookup(self, user, rut):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get('/api/users/rut/', {'rut': rut})
+
+    def test_lookup_is_scoped_to_the_company(self):
+        response = self.lookup(self.user, '5126663-3')
+        self.assertEqual([row['username'] for row in response.data], ['colega'])
+        self.assertEqual(self.lookup(self.user, '12.345.678-5').data, [])
+        self.assertEqual([row['username'] for row in self.lookup(self.root, '123456785').data], ['ajeno'])
+        self.assertEqual(self.lookup(self.user, '12.345.678-9').status_code, 400)
+
+    def test_batch_validation(self):
+        self.assertEqual(
+            validar_ruts(['11.111.111-1', '', '12.345.678-9', 'abc', '11111111-1']),
+            [None, None, MENSAJE_DV_RUT, MENSAJE_FORMATO_RUT, None],
+        )
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.branch, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente')
+        cls.products = [
+            Product.objects.create(company=cls.company, sku=f'ASY-{i:03d}', name=f'Producto {i}', price=100, cost=1)
+            for i in range(5)
+        ]
+        Inventory.objects.create(branch=cls.branch, product=cls.products[0], stock=1, reorder_point=3)
+        other_company, _, cls.seller = create_tenant('Otra', '22.222.222-2', 'vendedor', role='vendedor')
+        Product.objects.create(company=other_company, sku='AJE-001', name='Ajeno', price=1, cost=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, view, user=None, **params):
+        headers = {}
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {TenantRefreshToken.for_user(user).access_token}'
+        request = RequestFactory().get('/api/async/', params, **headers)
+        # Sesión y request.auser como en la cadena de middleware real.
+        SessionMiddleware(HttpResponse).process_request(request)
+        AuthenticationMiddleware(HttpResponse).process_request(request)
+        response = async_to_sync(view.as_view())(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_products_are_keyset_paginated_per_tenant(self):
+        status, page = self.get(ProductListView, self.user, page_size=3)
+        self.assertEqual(status, 200)
+        self.assertEqual([row['sku'] for row in page['results']], ['ASY-000', 'ASY-001', 'ASY-002'])
+        _, rest = self.get(ProductListView, self.user, page_size=3, after=page['next_after'])
+        self.assertEqual([row['sku'] for row in rest['results']], ['ASY-003', 'ASY-004'])
+        self.assertIsNone(rest['next_after'])
+
+        _, public = self.get(ProductListView, company=self.company.pk)
+        self.assertEqual(len(public['results']), 5)
+
+    def test_permissions_and_low_stock(self):
+        self.assertEqual(self.get(InventoryListView)[0], 401)
+        self.assertEqual(self.get(LowStockView, self.seller)[0], 403)
+        status, summary = self.get(LowStockView, self.user)
+        self.assertEqual((status, summary['count']), (200, 1))
+        self.assertEqual(summary['rows'][0]['product__sku'], 'ASY-000')
+
+        status, me = self.get(MeView, self.user)
+        self.assertEqual((status, me['username'], me['plan']), (200, 'gerente', 'Premium'))
+
+    def test_query_params_are_validated(self):
+        status, page = self.get(ProductListView, self.user, page_size=0)
+        self.assertEqual((status, len(page['results'])), (200, 1))
+        status, page = self.get(ProductListView, self.user, page_size=-3)
+        self.assertEqual((status, len(page['results'])), (200, 1))
+        status, body = self.get(InventoryListView, self.user, branch='abc')
+        self.assertEqual(status, 400)
+        self.assertIn('branch', body)
+        status, page = self.get(InventoryListView, self.user, branch=self.branch.pk)
+        self.assertEqual((status, len(page['results'])), (200, 1))
+
+    def test_stateless_token_skips_the_user_query(self):
+        self.get(InventoryListView, self.user)
+        # Con la versión en caché, la única consulta es la del inventario.
+        with self.assertNumQueries(1):
+            status, _ = self.get(InventoryListView, self.user)
+        self.assertEqual(status, 200)
+
+
+class OrderTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, _, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente')
+        cls.orders = {
+            status: [
+                Order.objects.create(
+                    company=cls.company, customer_name='Cliente', customer_email='c@example.com', total=100,
+                    status=status,
+                )
+                for _ in range(2)
+            ]
+            for status in ('pendiente', 'enviado', 'entregado')
+        }
+        other_company, _, _ = create_tenant('Otra', '22.222.222-2', 'otro')
+        cls.foreign = Order.objects.create(
+            company=other_company, customer_name='Otro', customer_email='o@example.com', total=1
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, **payload):
+        return self.client.post('/api/orders/bulk-status/', payload, format='json')
+
+    def statuses(self):
+        return dict(Order.objects.values_list('pk', 'status'))
+
+    def test_explicit_ids_follow_the_state_machine(self):
+        pending = [order.pk for order in self.orders['pendiente']]
+        shipped = self.orders['enviado'][0].pk
+        delivered = self.orders['entregado'][0].pk
+        response = self.bulk(status='enviado', ids=[*pending, shipped, delivered, self.foreign.pk, pending[0]])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data['moved']), pending)
+        reasons = {row['id']: row['reason'] for row in response.data['rejected']}
+        self.assertEqual(reasons[shipped], "La orden ya está en ese estado.")
+        self.assertEqual(reasons[delivered], "Transición entregado → enviado no permitida.")
+        self.assertEqual(reasons[self.foreign.pk], "La orden no existe.")
+        self.assertEqual(response.data['rejected_count'], 3)
+        statuses = self.statuses()
+        self.assertEqual([statuses[pk] for pk in pending], ['enviado', 'enviado'])
+        self.assertEqual((statuses[delivered], statuses[self.foreign.pk]), ('entregado', 'pendiente'))
+
+    def test_filter_by_current_status(self):
+        response = self.bulk(status='entregado', from_status='enviado')
+        self.assertEqual(response.data['moved_count'], 2)
+        self.assertEqual(Order.objects.filter(company=self.company, status='entregado').count(), 4)
+        self.assertEqual(self.bulk(status='entregado').status_code, 400)
+
+    def test_single_order_updates_respect_transitions(self):
+        order = self.orders['entregado'][0]
+        response = self.client.patch(f'/api/orders/{order.pk}/', {'status': 'pendiente'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        order = self.orders['pendiente'][0]
+        response = self.client.patch(f'/api/orders/{order.pk}/', {'status': 'enviado'}, format='json')
+        self.assertEqual((response.status_code, response.data['status']), (200, 'enviado'))
+
+
+class StockTransferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.source, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente')
+        cls.destination = Branch.objects.create(company=cls.company, name='Norte', address='Calle 2')
+        cls.products = [
+            Product.objects.create(company=cls.company, sku=f'TRA-{i:03d}', name=f'Producto {i}', price=100, cost=1)
+            for i in range(2)
+        ]
+        for product in cls.products:
+            Inventory.objects.create(branch=cls.source, product=product, stock=10)
+        Inventory.objects.create(branch=cls.destination, product=cls.products[0], stock=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def transfer(self, *lines, destination=None):
+        payload = {
+            'source_branch': self.source.pk,
+            'destination_branch': (destination or self.destination).pk,
+            'items': [{'product': product.pk, 'quantity': quantity} for product, quantity in lines],
+        }
+        return self.client.post('/api/stock-transfers/', payload, format='json')
+
+    def stock(self, branch):
+        return dict(Inventory.objects.filter(branch=branch).values_list('product_id', 'stock'))
+
+    def test_moves_stock_and_creates_missing_rows(self):
+        first, second = self.products
+        response = self.transfer((first, 4), (second, 3), (first, 1))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stock(self.source), {first.pk: 5, second.pk: 7})
+        self.assertEqual(self.stock(self.destination), {first.pk: 6, second.pk: 3})
+        self.assertEqual(Inventory.objects.get(branch=self.destination, product=second).company_id, self.company.pk)
+        self.assertEqual(response.data['user'], self.user.pk)
+
+    def test_shortage_moves_nothing(self):
+        first, second = self.products
+        response = self.transfer((first, 2), (second, 11))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stock(self.source), {first.pk: 10, second.pk: 10})
+        self.assertEqual(self.stock(self.destination), {first.pk: 1})
+        self.assertFalse(StockTransfer.objects.exists())
+
+    def test_rejects_same_or_foreign_branch(self):
+        self.assertEqual(self.transfer((self.products[0], 1), destination=self.source).status_code, 400)
+        _, foreign_branch, _ = create_tenant('Otra', '22.222.222-2', 'otro')
+        self.assertEqual(self.transfer((self.products[0], 1), destination=foreign_branch).status_code, 400)
+        self.assertEqual(self.stock(self.source)[self.products[0].pk], 10)
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, _, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente')
+        other_company, _, _ = create_tenant('Otra', '22.222.222-2', 'otro')
+        catalog = [
+            ('HAR-001', 'Harina integral', 'Almacén', 1200, ''),
+            ('HAR-002', 'Harina sin polvos', 'Almacén', 900, ''),
+            ('QUE-001', 'Queque de vainilla', 'Panadería', 2500, 'Hecho con harina de trigo'),
+            ('ACE-001', 'Aceite de oliva', 'Almacén', 5000, ''),
+        ]
+        for sku, name, category, price, description in catalog:
+            Product.objects.create(
+                company=cls.company, sku=sku, name=name, category=category, price=price, cost=1,
+                description=description,
+            )
+        Product.objects.create(company=other_company, sku='HAR-999', name='Harina ajena', price=100, cost=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, **params):
+        return self.client.get('/api/products/search/', params)
+
+    def test_ranks_name_matches_first_and_counts_facets(self):
+        response = self.search(q='harina')
+        self.assertEqual(response.status_code, 200)
+        skus = [product['sku'] for product in response.data['results']]
+        self.assertEqual(sorted(skus[:2]), ['HAR-001', 'HAR-002'])
+        self.assertEqual(skus[2:], ['QUE-001'])
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            response.data['facets']['category'],
+            [{'category': 'Almacén', 'count': 2}, {'category': 'Panadería', 'count': 1}],
+        )
+
+    def test_category_and_price_filters(self):
+        response = self.search(q='harina', category='Panadería')
+        self.assertEqual([product['sku'] for product in response.data['results']], ['QUE-001'])
+        self.assertEqual(response.data['count'], 1)
+        # Las facetas siguen mostrando todas las categorías para poder cambiar.
+        self.assertEqual(len(response.data['facets']['category']), 2)
+
+        response = self.search(q='harina', min_price=1000, max_price=2000)
+        self.assertEqual([product['sku'] for product in response.data['results']], ['HAR-001'])
+        self.assertEqual(self.search(q='harina', min_price='barato').status_code, 400)
+
+    def test_sku_prefix_and_tenant_scope(self):
+        response = self.search(q='ACE-0')
+        self.assertEqual([product['sku'] for product in response.data['results']], ['ACE-001'])
+        self.assertEqual(self.search(q='ajena').data['count'], 0)
+
+    def test_term_without_tokens_returns_empty_result(self):
+        response = self.search(q='"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['count'], response.data['results']), (0, []))
+        self.assertEqual(self.search(q='  ').status_code, 400)
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, _, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente')
+        cls.product = Product.objects.create(company=cls.company, sku='CAT-001', name='Café', price=100, cost=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def edit_product(self):
+        version = cache.get(catalog_version_key(self.company.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Café molido'
+            self.product.save()
+            # La versión sube recién con el commit.
+            self.assertEqual(cache.get(catalog_version_key(self.company.pk)), version)
+
+    def test_etag_revalidation_and_invalidation(self):
+        first = self.client.get('/api/products/')
+        self.assertEqual(first.status_code, 200)
+        cached = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], first['ETag'])
+
+        self.edit_product()
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.data['results'][0]['name'], 'Café molido')
+
+    def test_last_modified_only_for_finished_seconds(self):
+        cache.set(catalog_version_key(self.company.pk), time.time_ns() - 10 * 1_000_000_000)
+        first = self.client.get('/api/products/')
+        since = first['Last-Modified']
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=since).status_code, 304)
+
+        self.edit_product()
+        response = self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['name'], 'Café molido')
+
+    def test_same_second_version_has_no_last_modified(self):
+        version = 1_700_000_000_500_000_000
+        self.assertIsNone(catalog_last_modified(version, now=1_700_000_000.9))
+        self.assertEqual(catalog_last_modified(version, now=1_700_000_001.0), 1_700_000_000)
+
+
+class ProductImportTests(TestCase):
+    HEADER = 'sku,name,price,cost,category\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, _, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente')
+        Product.objects.create(company=cls.company, sku='AAA-0001', name='Antiguo', price=100, cost=50)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content, encoding='utf-8', query=''):
+        upload = SimpleUploadedFile('catalogo.csv', content.encode(encoding), content_type='text/csv')
+        return self.client.post(f'/api/products/import/{query}', {'file': upload}, format='multipart')
+
+    def test_imports_valid_rows_and_reports_errors_by_line(self):
+        response = self.upload(
+            self.HEADER
+            + 'AAA-0001,Actualizado,"$ 1.990",900,Almacén\n'
+            + 'AAA-0002,Nuevo,500,300,\n'
+            + '\n'
+            + 'malo,Sin SKU,500,300,\n'
+            + 'AAA-0002,Repetido,-1,300,\n'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['skipped']), (1, 1, 2))
+        self.assertEqual([error['line'] for error in response.data['errors']], [5, 6])
+        self.assertIn('Formato SKU inválido. Use AAA-0000', response.data['errors'][0]['errors'])
+        self.assertEqual(len(response.data['errors'][1]['errors']), 2)
+        updated = Product.objects.get(company=self.company, sku='AAA-0001')
+        self.assertEqual((updated.name, updated.price, updated.category), ('Actualizado', 1990, 'Almacén'))
+
+    def test_dry_run_and_no_update_modes(self):
+        response = self.upload(self.HEADER + 'AAA-0002,Nuevo,500,300,\n', query='?dry_run=1')
+        self.assertEqual((response.data['created'], response.data['dry_run']), (1, True))
+        self.assertFalse(Product.objects.filter(sku='AAA-0002').exists())
+
+        response = self.upload(self.HEADER + 'AAA-0001,Otro,500,300,\n', query='?update=false')
+        self.assertEqual(response.data['errors'][0]['errors'], ['El SKU ya existe en el catálogo.'])
+        self.assertEqual(Product.objects.get(sku='AAA-0001').name, 'Antiguo')
+
+    def test_reads_windows_1252_files(self):
+        response = self.upload(self.HEADER + 'AAA-0003,Piñón,500,300,Panadería\n', encoding='cp1252')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Product.objects.get(sku='AAA-0003').name, 'Piñón')
+
+    def test_invalid_files_are_reported_as_400(self):
+        self.assertIn('file', self.upload('sku,name\n').data)
+        response = self.upload(self.HEADER + 'AAA-0004,"' + 'x' * (csv.field_size_limit() + 1) + '",1,1,\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('CSV inválido', response.data['file'][0])
+        upload = SimpleUploadedFile('catalogo.csv', self.HEADER.encode() + b'AAA-0005,\x81,1,1,\n')
+        response = self.client.post('/api/products/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Product.objects.filter(sku__in=['AAA-0004', 'AAA-0005']).exists())
+
+    def test_corrupt_xlsx_is_reported_as_400(self):
+        # openpyxl puede no estar instalado: se simula su error ante un archivo que no es ZIP.
+        exceptions = types.ModuleType('openpyxl.utils.exceptions')
+        exceptions.InvalidFileException = type('InvalidFileException', (Exception,), {})
+        openpyxl = types.ModuleType('openpyxl')
+        openpyxl.load_workbook = mock.Mock(side_effect=zipfile.BadZipFile('File is not a zip file'))
+        modules = {
+            'openpyxl': openpyxl,
+            'openpyxl.utils': types.ModuleType('openpyxl.utils'),
+            'openpyxl.utils.exceptions': exceptions,
+        }
+        with mock.patch.dict(sys.modules, modules):
+            upload = SimpleUploadedFile('catalogo.xlsx', b'no es un libro')
+            response = self.client.post('/api/products/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('XLSX válido', response.data['file'][0])
+
+
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def attempt(self, username, ip):
+        check_login(RequestFactory().post('/api/token/', REMOTE_ADDR=ip), username, 'token')
+
+    def test_branch_behind_nat_is_limited_per_user(self):
+        for number in range(100):
+            self.attempt(f'vendedor{number}', '10.0.0.1')
+
+        for _ in range(10):
+            self.attempt('cajero', '10.0.0.1')
+        with self.assertRaises(LoginRejected) as rejected:
+            self.attempt('cajero', '10.0.0.1')
+        self.assertEqual(rejected.exception.reason, 'username')
+        self.attempt('vendedor0', '10.0.0.1')
+
+    def test_ip_ceiling(self):
+        with override_settings(LOGIN_THROTTLE_RATES={'username': (10, 300), 'ip': (5, 60)}):
+            for number in range(5):
+                self.attempt(f'barrido{number}', '10.0.0.2')
+            with self.assertRaises(LoginRejected) as rejected:
+                self.attempt('barrido5', '10.0.0.2')
+        self.assertEqual(rejected.exception.reason, 'ip')
+
+    def test_seeded_users_leave_the_unknown_user_cache(self):
+        login_failed('vendedor1_1')
+        login_failed('gerente1')
+        self.assertTrue(cache.get(_unknown_user_key('gerente1')))
+        seed_company(1, SeedSizes(products=2, suppliers=0, purchases=0, sales=0, orders=0))
+        self.assertIsNone(cache.get(_unknown_user_key('vendedor1_1')))
+        self.assertIsNone(cache.get(_unknown_user_key('gerente1')))
+        self.attempt('gerente1', '10.0.0.3')
+
+
+class AuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.branch, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente')
+
+    def setUp(self):
+        cache.clear()
+
+    def obtain(self):
+        response = APIClient().post('/api/token/', {'username': 'gerente', 'password': 'clave1234'}, format='json')
+        return response.data
+
+    def async_get(self, view, access):
+        request = RequestFactory().get('/api/async/users/me/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        return async_to_sync(view.as_view())(request)
+
+    def test_access_token_carries_the_request_user(self):
+        access = AccessToken(self.obtain()['access'])
+        self.assertEqual(
+            (access['role'], access['company_id'], access['plan'], access['ver']),
+            ('gerente', self.company.pk, 'Premium', User.objects.get(pk=self.user.pk).auth_version),
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response = client.get('/api/reports/sales/')
+        self.assertEqual(response.status_code, 200)
+        other_company, _, _ = create_tenant('Otra', '22.222.222-2', 'otro')
+        Product.objects.create(company=other_company, sku='AJE-001', name='Ajeno', price=1, cost=1)
+        self.assertEqual(client.get('/api/products/').data['results'], [])
+
+    def test_async_views_honour_token_revocation(self):
+        tokens = self.obtain()
+        self.assertEqual(self.async_get(MeView, tokens['access']).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('otra-clave')
+            self.user.save()
+        self.assertEqual(self.async_get(MeView, tokens['access']).status_code, 401)
+        response = APIClient().post('/api/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_reissues_claims_after_role_change(self):
+        tokens = self.obtain()
+        client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role = 'vendedor'
+            self.user.save()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(client.get('/api/inventory/').status_code, 401)
+
+        response = client.post('/api/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'vendedor')
+
+    def test_plan_claim_is_capped_by_subscription_end(self):
+        subscription = self.company.subscription
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription.end_date = timezone.localdate()
+            subscription.save()
+        claims = user_claims(User.objects.get(pk=self.user.pk))
+        midnight = datetime.datetime.combine(subscription.end_date + datetime.timedelta(days=1), datetime.time.min)
+        self.assertEqual(claims['plan'], 'Premium')
+        self.assertEqual(claims[PLAN_EXPIRY_CLAIM], int(timezone.make_aware(midnight).timestamp()))
+
+        refresh = TenantRefreshToken.for_user(self.user)
+        refresh[PLAN_EXPIRY_CLAIM] = int(time.time()) + 30
+        self.assertEqual(refresh.access_token['exp'], refresh[PLAN_EXPIRY_CLAIM])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription.end_date = timezone.localdate() - datetime.timedelta(days=1)
+            subscription.save()
+        self.assertIsNone(load_entitlements(self.company.pk).effective_plan)
+        self.assertIsNone(AccessToken(self.obtain()['access'])['plan'])
+
+
+class ReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.branch, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente', plan='Estandar')
+        product = Product.objects.create(company=cls.company, sku='AAA-0001', name='Harina', price=100, cost=60)
+        Inventory.objects.create(branch=cls.branch, product=product, stock=10)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_sales_report_filters_by_branch_and_range(self):
+        product = Product.objects.get()
+        sale = Sale.objects.create(branch=self.branch, user=self.user, total=300)
+        record_sale_rollups(sale, [SaleItem.objects.create(sale=sale, product=product, quantity=3, price=100)])
+
+        response = self.client.get('/api/reports/sales/', {'branch': self.branch.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['units'], row['revenue'], row['margin']) for row in response.data], [(3, '300', '120')]
+        )
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        self.assertEqual(self.client.get('/api/reports/sales/', {'date_to': yesterday}).data, [])
+        # El ranking de productos exige Premium.
+        self.assertEqual(self.client.get('/api/reports/products/').status_code, 403)
+
+    def test_invalid_params_are_rejected(self):
+        for params in ({'branch': 'abc'}, {'date_from': '2024-13-01'}, {'date_from': '2024-02-01', 'date_to': '2024-01-01'}):
+            response = self.client.get('/api/reports/sales/', params)
+            self.assertEqual(response.status_code, 400, params)
+        self.assertIn('branch', self.client.get('/api/inventory/', {'branch': 'abc'}).data)
+        self.assertEqual(self.client.get('/api/stock-alerts/', {'branch': 'x'}).status_code, 400)
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.branch, cls.user = create_tenant('Pyme', '11.111.111-1', 'gerente')
+
+    def test_endpoint_requires_token_outside_debug(self):
+        self.assertEqual(Client().get('/metrics').status_code, 403)
+        with self.settings(METRICS_TOKEN='secreto'):
+            self.assertEqual(Client().get('/metrics').status_code, 401)
+            response = Client().get('/metrics', HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '# TYPE temucosoft_http_request_duration_seconds histogram')
+
+    def test_records_serializer_time_per_route(self):
+        labels = {'route': 'inventory-list', 'action': 'list'}
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.get('/api/inventory/')
+        samples = {
+            name: value for name, sample_labels, value in metrics.SERIALIZER_DURATION.samples()
+            if sample_labels == labels
+        }
+        self.assertGreaterEqual(samples['temucosoft_serializer_duration_seconds_count'], 1)
+        self.assertGreater(samples['temucosoft_serializer_duration_seconds_sum'], 0)
+
+    def test_middleware_supports_async_chain(self):
+        async def get_response(request):
+            await Inventory.objects.acount()
+            return HttpResponse('ok')
+
+        middleware = metrics.MetricsMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/sin-ruta'))
+        self.assertEqual(response.status_code, 200)
+        queries = {
+            name: value for name, sample_labels, value in metrics.DB_QUERIES.samples()
+            if name.endswith('_sum') and sample_labels == {'route': 'unmatched', 'action': ''}
+        }
+        self.assertGreaterEqual(queries['temucosoft_db_queries_per_request_sum'], 1)
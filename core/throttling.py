@@ -0,0 +1,181 @@
+"""Control de carga del login antes de verificar la contraseña.
+
+Cada intento de login cuesta un hash PBKDF2 completo, así que los rechazos
+deben ocurrir antes de llamar a ``authenticate``. ``check_login`` aplica una
+ventana deslizante por usuario y por IP (``LOGIN_THROTTLE_RATES``) y descarta
+sin hashear los usuarios que ya se sabe que no existen. El límite fino es por
+usuario; el de IP es solo un techo alto, porque una sucursal completa suele
+salir a internet por la misma IP (NAT) y un cambio de turno la haría chocar.
+
+El limitador vive en memoria del proceso (registro exacto de marcas de
+tiempo). Con ``LOGIN_THROTTLE_SHARED`` se usa la caché de Django, compartida
+entre procesos, con el contador de ventana deslizante aproximado (ventana
+actual más la anterior ponderada).
+
+La caché negativa de usuarios inexistentes hace más rápido el rechazo de esos
+nombres. Eso permite distinguir por tiempo de respuesta si un usuario existe;
+es el costo aceptado para no gastar CPU en ataques de *credential stuffing*.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from .metrics import Counter
+
+# Máximo de claves del limitador en memoria; se descartan las menos usadas.
+MAX_LOCAL_KEYS = 100_000
+
+LOGIN_REJECTED = Counter(
+    'temucosoft_login_rejected_total',
+    'Intentos de login rechazados antes de verificar la contraseña.',
+    ('endpoint', 'reason'),
+)
+
+
+class SlidingWindowLimiter:
+    """Permite ``limit`` intentos por clave dentro de los últimos ``window`` segundos."""
+
+    def __init__(self, name, limit, window, shared=False):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.shared = shared
+        self._hits = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, now=None):
+        """Registra un intento; retorna ``0`` si se permite o los segundos de espera."""
+
+        now = time.time() if now is None else now
+        if self.shared:
+            return self._hit_shared(key, now)
+        return self._hit_local(key, now)
+
+    def _hit_local(self, key, now):
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+                if len(self._hits) > MAX_LOCAL_KEYS:
+                    self._hits.popitem(last=False)
+            else:
+                self._hits.move_to_end(key)
+            while hits and hits[0] <= now - self.window:
+                hits.popleft()
+            if len(hits) >= self.limit:
+                return hits[0] + self.window - now
+            hits.append(now)
+            return 0
+
+    def _hit_shared(self, key, now):
+        current = int(now // self.window)
+        elapsed = now / self.window - current
+        digest = hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+        current_key = f'login_throttle:{self.name}:{digest}:{current}'
+        previous = cache.get(f'login_throttle:{self.name}:{digest}:{current - 1}', 0)
+        count = cache.get(current_key, 0)
+        if previous * (1 - elapsed) + count >= self.limit:
+            return (1 - elapsed) * self.window
+        # La clave vive dos ventanas: la siguiente la usa como "anterior".
+        if not cache.add(current_key, 1, self.window * 2):
+            try:
+                cache.incr(current_key)
+            except ValueError:
+                cache.set(current_key, 1, self.window * 2)
+        return 0
+
+    def reset(self, key):
+        if self.shared:
+            digest = hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+            current = int(time.time() // self.window)
+            cache.delete_many([f'login_throttle:{self.name}:{digest}:{index}' for index in (current - 1, current)])
+        else:
+            with self._lock:
+                self._hits.pop(key, None)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(scope):
+    """Limitador de ``scope`` según la configuración vigente (``None`` si no aplica)."""
+
+    rate = settings.LOGIN_THROTTLE_RATES.get(scope)
+    if not rate:
+        return None
+    config = (*rate, settings.LOGIN_THROTTLE_SHARED)
+    with _limiters_lock:
+        limiter = _limiters.get(scope)
+        if limiter is None or (limiter.limit, limiter.window, limiter.shared) != config:
+            limiter = _limiters[scope] = SlidingWindowLimiter(scope, *config)
+    return limiter
+
+
+def client_ip(request):
+    """IP del cliente con la misma regla que los throttles de DRF (``NUM_PROXIES``)."""
+
+    return BaseThrottle().get_ident(request)
+
+
+def _unknown_user_key(username):
+    return 'login_unknown:' + hashlib.md5(username.encode(), usedforsecurity=False).hexdigest()
+
+
+class LoginRejected(Exception):
+    def __init__(self, reason, wait=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.wait = wait
+
+
+def check_login(request, username, endpoint):
+    """Rechaza el intento (``LoginRejected``) antes de verificar la contraseña.
+
+    ``reason`` es ``username`` o ``ip`` si se superó la ventana (con ``wait``
+    en segundos) y ``unknown_user`` si el usuario no existe según la caché.
+    """
+
+    username = username or ''
+    keys = {'username': username.lower(), 'ip': client_ip(request)}
+    for scope, key in keys.items():
+        limiter = get_limiter(scope)
+        wait = limiter.hit(key) if limiter and key else 0
+        if wait:
+            LOGIN_REJECTED.inc(endpoint=endpoint, reason=scope)
+            raise LoginRejected(scope, wait)
+
+    if username and cache.get(_unknown_user_key(username)):
+        LOGIN_REJECTED.inc(endpoint=endpoint, reason='unknown_user')
+        raise LoginRejected('unknown_user')
+
+
+def login_failed(username):
+    """Tras un intento fallido recuerda si el usuario no existe."""
+
+    from .models import User
+
+    if username and settings.LOGIN_UNKNOWN_USER_TIMEOUT and not User.objects.filter(username=username).exists():
+        cache.set(_unknown_user_key(username), True, settings.LOGIN_UNKNOWN_USER_TIMEOUT)
+
+
+def login_succeeded(username):
+    limiter = get_limiter('username')
+    if limiter and username:
+        limiter.reset(username.lower())
+
+
+def forget_unknown_user(username):
+    cache.delete(_unknown_user_key(username))
+
+
+def forget_unknown_users(usernames):
+    """``forget_unknown_user`` para altas masivas (``bulk_create`` no emite señales)."""
+
+    cache.delete_many([_unknown_user_key(username) for username in usernames])
@@ -1,8 +1,14 @@
 """Utilidades comunes para manejo de planes y helpers de vistas."""
 
-from typing import Optional, Union
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import FrozenSet, Optional, Union
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 
 PLAN_ORDER = ["Basico", "Estandar", "Premium"]
@@ -26,18 +32,6 @@ def plan_satisfies(plan_name: Optional[str], required: str) -> bool:
         return False
 
 
-def get_company_plan(company) -> Optional[str]:
-    """Obtiene el nombre del plan de la compañía si existe."""
-
-    if not company:
-        return None
-
-    subscription = getattr(company, "subscription", None)
-    if subscription and subscription.active:
-        return subscription.plan_name
-    return None
-
-
 def get_branch_limit(plan_name: Optional[str]) -> Optional[int]:
     """Retorna el límite de sucursales según el plan (``None`` significa ilimitado)."""
 
@@ -45,6 +39,115 @@ def get_branch_limit(plan_name: Optional[str]) -> Optional[int]:
     return limits.get(plan_name)
 
 
+@dataclass(frozen=True)
+class Entitlements:
+    """Foto de lo que permite la suscripción de una compañía."""
+
+    plan_name: Optional[str] = None
+    active: bool = False
+    features: FrozenSet[str] = frozenset()
+    branch_limit: Optional[int] = None
+    end_date: Optional[date] = None
+
+    @classmethod
+    def from_plan(
+        cls, plan_name: Optional[str], active: bool = True, end_date: Optional[date] = None
+    ) -> "Entitlements":
+        # Una suscripción vencida deja de estar vigente aunque siga marcada activa.
+        active = active and (end_date is None or end_date >= timezone.localdate())
+        features = frozenset(
+            feature
+            for feature, required in PLAN_FEATURES.items()
+            if active and plan_satisfies(plan_name, required)
+        )
+        return cls(
+            plan_name=plan_name,
+            active=active,
+            features=features,
+            branch_limit=get_branch_limit(plan_name),
+            end_date=end_date,
+        )
+
+    @property
+    def effective_plan(self) -> Optional[str]:
+        """Plan vigente: ``None`` si no hay suscripción o está inactiva."""
+
+        return self.plan_name if self.active else None
+
+
+NO_ENTITLEMENTS = Entitlements()
+
+
+def entitlements_cache_key(company_id) -> str:
+    return f"entitlements:{company_id}"
+
+
+def load_entitlements(company_id) -> Entitlements:
+    """Entitlements desde la caché compartida (o la base si no están)."""
+
+    key = entitlements_cache_key(company_id)
+    row = cache.get(key)
+    if row is None:
+        from .models import Subscription
+
+        # Se guarda una tupla vacía para recordar también la ausencia de plan.
+        row = (
+            Subscription.objects.filter(company_id=company_id)
+            .values_list("plan_name", "active", "end_date")
+            .first()
+            or ()
+        )
+        cache.set(key, tuple(row), settings.ENTITLEMENTS_CACHE_TIMEOUT)
+
+    return Entitlements.from_plan(*row) if row else NO_ENTITLEMENTS
+
+
+async def aload_entitlements(company_id) -> Entitlements:
+    """Versión asíncrona de ``load_entitlements`` (misma clave de caché)."""
+
+    key = entitlements_cache_key(company_id)
+    row = await cache.aget(key)
+    if row is None:
+        from .models import Subscription
+
+        row = (
+            await Subscription.objects.filter(company_id=company_id)
+            .values_list("plan_name", "active", "end_date")
+            .afirst()
+            or ()
+        )
+        await cache.aset(key, tuple(row), settings.ENTITLEMENTS_CACHE_TIMEOUT)
+
+    return Entitlements.from_plan(*row) if row else NO_ENTITLEMENTS
+
+
+def get_entitlements(company) -> Entitlements:
+    """Entitlements de la compañía, memoizados en la instancia y en caché.
+
+    La instancia de ``company`` vive lo que dura la request, por lo que el
+    atributo ``_entitlements`` actúa como memo por request; entre requests se
+    usa el framework de caché de Django (invalidado por ``core.signals``).
+    """
+
+    if not company or not company.pk:
+        return NO_ENTITLEMENTS
+
+    memo = getattr(company, "_entitlements", None)
+    if memo is None:
+        memo = company._entitlements = load_entitlements(company.pk)
+    return memo
+
+
+def invalidate_entitlements(company_id) -> None:
+    cache.delete(entitlements_cache_key(company_id))
+
+
+def get_company_plan(company) -> Optional[str]:
+    """Obtiene el nombre del plan de la compañía si existe."""
+
+    return get_entitlements(company).effective_plan
+
+
 def has_plan_feature(subject: Union[object, None], feature: str) -> bool:
     """Evalúa si el usuario o compañía tiene acceso a la ``feature`` por plan."""
 
@@ -56,13 +159,7 @@ def has_plan_feature(subject: Union[object, None], feature: str) -> bool:
     else:
         company = subject
 
-    plan_name = get_company_plan(company)
-    required = PLAN_FEATURES.get(feature)
-
-    if not required:
-        return False
-
-    return plan_satisfies(plan_name, required)
+    return feature in get_entitlements(company).features
 
 
 def build_menu_flags(role: str, plan_name: Optional[str]):
@@ -75,3 +172,52 @@ def build_menu_flags(role: str, plan_name: Optional[str]):
         "role": role,
         "plan": plan_name or "Sin Plan",
     }
+
+
+def related_ids(records, field):
+    """Valores de ``field`` en los registros crudos de una request (solo ``int``/``str``)."""
+
+    ids = set()
+    for record in records:
+        value = record.get(field)
+        if isinstance(value, (int, str)):
+            ids.add(value)
+    return ids
+
+
+def item_product_ids(records):
+    """Productos referenciados en las líneas ``items`` de los registros crudos."""
+
+    ids = set()
+    for record in records:
+        items = record.get('items')
+        if isinstance(items, list):
+            ids |= related_ids([item for item in items if isinstance(item, dict)], 'product')
+    return ids
+
+
+def local_day_range(field: str, date_from: Optional[date] = None, date_to: Optional[date] = None) -> dict:
+    """Filtros de ``field`` (``DateTimeField``) para los días locales ``date_from``..``date_to``.
+
+    Compara contra medianoches con zona horaria en vez de ``field__date``, que
+    castea la columna y deja sin uso sus índices.
+    """
+
+    lookups = {}
+    if date_from:
+        lookups[f'{field}__gte'] = timezone.make_aware(datetime.combine(date_from, time.min))
+    if date_to:
+        lookups[f'{field}__lt'] = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+    return lookups
+
+
+def valid_pks(model, values):
+    """Convierte ``values`` al tipo de la PK de ``model`` descartando los inválidos."""
+
+    pks = set()
+    for value in values:
+        try:
+            pks.add(model._meta.pk.to_python(value))
+        except ValidationError:
+            continue
+    return pks
@@ -1,37 +1,73 @@
 import re
 from django.core.exceptions import ValidationError
 
+RUT_FORMATO = re.compile(r'^(\d{1,3}(?:\.?\d{3}){2}-?[\dkK])$')
+RUT_SEPARADORES = re.compile(r'[\.\-\s]')
+PASSWORD_FORMATO = re.compile(r'^(?=.*[A-Za-z])(?=.*\d)[A-Za-z\d@$!%*#?&]{8,}$')
 
-def validar_rut(rut_string):
-    """Valida formato y dígito verificador de un RUT chileno."""
-    if not rut_string:
-        return
-
-    patron_formato = r'^(\d{1,3}(?:\.?\d{3}){2}-?[\dkK])$'
-    if not re.match(patron_formato, rut_string):
-        raise ValidationError("El formato del RUT no es válido (Ej: 12.345.678-K).")
+MENSAJE_FORMATO_RUT = "El formato del RUT no es válido (Ej: 12.345.678-K)."
+MENSAJE_DV_RUT = "RUT inválido. El dígito verificador no corresponde."
 
-    rut_clean = re.sub(r'[\.-]', '', rut_string).upper()
-    cuerpo = rut_clean[:-1]
-    dv = rut_clean[-1]
 
+def calcular_dv(cuerpo):
+    """Calcula el dígito verificador (módulo 11) para el cuerpo numérico de un RUT."""
     suma = 0
     multiplo = 2
-    for c in reversed(cuerpo):
+    for c in reversed(str(cuerpo)):
         suma += int(c) * multiplo
         multiplo += 1
         if multiplo == 8:
             multiplo = 2
 
     res = 11 - (suma % 11)
-    dvr = '0' if res == 11 else 'K' if res == 10 else str(res)
+    return '0' if res == 11 else 'K' if res == 10 else str(res)
+
+
+def normalizar_rut(rut_string):
+    """Forma canónica del RUT: cuerpo sin ceros a la izquierda más DV en mayúscula (``12345678K``)."""
+    if not rut_string:
+        return ''
+    rut_clean = RUT_SEPARADORES.sub('', rut_string).upper()
+    return rut_clean[:-1].lstrip('0') + rut_clean[-1:]
+
+
+def validar_rut(rut_string):
+    """Valida formato y dígito verificador de un RUT chileno."""
+    if not rut_string:
+        return
+
+    if not RUT_FORMATO.match(rut_string):
+        raise ValidationError(MENSAJE_FORMATO_RUT)
+
+    rut_clean = normalizar_rut(rut_string)
+    if calcular_dv(rut_clean[:-1]) != rut_clean[-1]:
+        raise ValidationError(MENSAJE_DV_RUT)
+
+
+def validar_ruts(ruts):
+    """Valida un lote de RUT; retorna una lista alineada con el mensaje de error o ``None``.
 
-    if dvr != dv:
-        raise ValidationError("RUT inválido. El dígito verificador no corresponde.")
+    Los dígitos verificadores se calculan una sola vez por cuerpo distinto,
+    lo que conviene en importaciones con RUT repetidos.
+    """
+    dvs = {}
+    errores = []
+    for rut_string in ruts:
+        if not rut_string:
+            errores.append(None)
+            continue
+        if not RUT_FORMATO.match(rut_string):
+            errores.append(MENSAJE_FORMATO_RUT)
+            continue
+        rut_clean = normalizar_rut(rut_string)
+        cuerpo = rut_clean[:-1]
+        if cuerpo not in dvs:
+            dvs[cuerpo] = calcular_dv(cuerpo)
+        errores.append(None if dvs[cuerpo] == rut_clean[-1] else MENSAJE_DV_RUT)
+    return errores
 
 
 def validar_password_compleja(password):
     """Regex: Al menos 8 caracteres, 1 número, 1 letra."""
-    patron = r'^(?=.*[A-Za-z])(?=.*\d)[A-Za-z\d@$!%*#?&]{8,}$'
-    if not re.match(patron, password):
+    if not PASSWORD_FORMATO.match(password):
         raise ValidationError("La contraseña debe tener al menos 8 caracteres, incluyendo letras y números.")
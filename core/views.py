@@ -1,53 +1,116 @@
-from rest_framework import permissions, viewsets
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Prefetch
+from rest_framework import mixins, permissions, serializers, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from .catalog import GLOBAL_SCOPE, CatalogConditionalMixin
+from .exports import export_params, inventory_rows, purchases_rows, sales_rows, streaming_export
+from .imports import import_products, read_rows
+from .metrics import SerializerTimingMixin
+from .parsers import NDJSONParser, StreamingJSONArrayParser
 
 from .models import (
     Branch,
     Company,
     Inventory,
     Order,
+    OrderItem,
     Product,
     Purchase,
+    PurchaseItem,
     Sale,
+    SaleItem,
+    StockAlert,
+    StockTransfer,
+    StockTransferItem,
     Subscription,
     Supplier,
     User,
 )
-from .permissions import IsAdminClienteOrGerente, IsSuperAdmin
+from .permissions import IsAdminClienteOrGerente, IsSuperAdmin, PlanFeaturePermission
+from .reports import branch_daily_sales, product_sales
+from .search import category_facets, search_products
+from .throttling import LoginRejected, check_login, login_failed, login_succeeded
 from .serializers import (
+    BranchDailySalesSerializer,
+    BranchFilterSerializer,
     BranchSerializer,
     CompanySerializer,
     InventorySerializer,
+    OrderBulkStatusSerializer,
     OrderSerializer,
+    ProductSalesSerializer,
     ProductSerializer,
     PurchaseSerializer,
+    ReportParamsSerializer,
     SaleSerializer,
+    StockAlertSerializer,
+    StockTransferSerializer,
     SubscriptionSerializer,
     SupplierSerializer,
     UserMeSerializer,
     UserSerializer,
 )
+from .services import delete_sale, record_inventory_change, transition_orders
+from .sync import sync_sales
+from .utils import item_product_ids, local_day_range, related_ids, valid_pks
+from .validators import normalizar_rut, validar_rut
+
+# Columnas que necesitan los serializers de líneas (además de la FK al documento).
+ITEM_FIELDS = ('id', 'product', 'quantity', 'price')
+
+
+def branch_filter(request):
+    """Sucursal de ``?branch=`` validada (``None`` si no se indicó)."""
+
+    params = BranchFilterSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    return params.validated_data.get('branch')
+
+
+class RutLookupMixin:
+    """Acción ``rut/?rut=`` con búsqueda exacta sobre la columna indexada ``rut_normalized``."""
+
+    @action(detail=False, methods=['get'], url_path='rut')
+    def rut_lookup(self, request):
+        rut = request.query_params.get('rut', '').strip()
+        if not rut:
+            raise serializers.ValidationError({'rut': 'Indique el RUT a buscar.'})
+        try:
+            validar_rut(rut)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({'rut': exc.messages})
+        queryset = self.get_queryset().filter(rut_normalized=normalizar_rut(rut))
+        return Response(self.serialize(queryset, many=True))
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(RutLookupMixin, SerializerTimingMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        if self.request.user.role == 'admin_cliente':
-            return User.objects.filter(company=self.request.user.company)
+        user = self.request.user
+        # La búsqueda por RUT queda dentro de la compañía (y usa user_company_rut_idx)
+        # para todo rol salvo super_admin.
+        if user.role == 'admin_cliente' or (self.action == 'rut_lookup' and user.role != 'super_admin'):
+            return User.objects.filter(company_id=user.company_id)
         return super().get_queryset()
 
     @action(detail=False, methods=['get'])
     def me(self, request):
-        serializer = UserMeSerializer(request.user)
+        user = User.objects.select_related('company__subscription').get(pk=request.user.pk)
+        serializer = UserMeSerializer(user)
         return Response(serializer.data)
 
 
-class CompanyViewSet(viewsets.ModelViewSet):
+class CompanyViewSet(RutLookupMixin, SerializerTimingMixin, viewsets.ModelViewSet):
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
     permission_classes = [IsAuthenticated, IsSuperAdmin]
@@ -64,7 +127,7 @@ class CompanyViewSet(viewsets.ModelViewSet):
         return Response(SubscriptionSerializer(subscription).data)
 
 
-class SubscriptionViewSet(viewsets.ModelViewSet):
+class SubscriptionViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     serializer_class = SubscriptionSerializer
     permission_classes = [IsAuthenticated, IsSuperAdmin]
 
@@ -85,7 +148,7 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
         return Response(output.data)
 
 
-class BranchViewSet(viewsets.ModelViewSet):
+class BranchViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     serializer_class = BranchSerializer
     permission_classes = [IsAuthenticated, IsAdminClienteOrGerente]
 
@@ -93,80 +156,395 @@ class BranchViewSet(viewsets.ModelViewSet):
         return Branch.objects.filter(company=self.request.user.company)
 
     def perform_create(self, serializer):
-        serializer.save(company=self.request.user.company)
+        try:
+            serializer.save(company=self.request.user.company)
+        except DjangoValidationError as exc:
+            # Límite de sucursales del plan.
+            raise serializers.ValidationError(exc.messages)
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CatalogConditionalMixin, SerializerTimingMixin, viewsets.ModelViewSet):
     serializer_class = ProductSerializer
+    permission_classes = [IsAuthenticated]
 
     def get_permissions(self):
         if self.request.method in permissions.SAFE_METHODS:
             return [AllowAny()]
-        return [IsAuthenticated()]
+        return super().get_permissions()
+
+    def get_catalog_scope(self):
+        """Compañía cuyo catálogo se sirve (``?company=`` para el catálogo público)."""
+
+        if self.request.user.is_authenticated and self.request.user.company_id:
+            return self.request.user.company_id
+        company_id = self.request.query_params.get('company')
+        if company_id and company_id.isdigit():
+            return int(company_id)
+        return GLOBAL_SCOPE
 
     def get_queryset(self):
-        if self.request.user.is_authenticated and self.request.user.company:
-            return Product.objects.filter(company=self.request.user.company)
-        return Product.objects.all()
+        scope = self.get_catalog_scope()
+        if scope == GLOBAL_SCOPE:
+            return Product.objects.all()
+        return Product.objects.for_tenant(scope)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Búsqueda rankeada (``q``) con facetas por categoría y filtros de precio."""
+
+        return self.catalog_response(self._search, request)
+
+    def _search(self, request):
+        params = request.query_params
+        term = params.get('q', '').strip()
+        if not term:
+            raise serializers.ValidationError({'q': 'Indique el texto a buscar.'})
+
+        queryset = search_products(self.get_queryset(), term)
+        for param, lookup in (('min_price', 'price__gte'), ('max_price', 'price__lte')):
+            if params.get(param):
+                try:
+                    queryset = queryset.filter(**{lookup: int(params[param])})
+                except ValueError:
+                    raise serializers.ValidationError({param: 'Debe ser un número entero.'})
+
+        # Las facetas ignoran el filtro de categoría para poder cambiarlo.
+        facets = category_facets(queryset)
+        category = params.get('category')
+        if category:
+            queryset = queryset.filter(category=category)
+            facets_in_scope = [facet for facet in facets if facet['category'] == category]
+        else:
+            facets_in_scope = facets
+
+        try:
+            limit = min(max(int(params.get('limit', 20)), 1), 100)
+        except ValueError:
+            limit = 20
+        results = queryset.order_by('-rank', 'id')[:limit]
+        return Response({
+            'count': sum(facet['count'] for facet in facets_in_scope),
+            'results': self.serialize(results, many=True),
+            'facets': {'category': facets},
+        })
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        parser_classes=[MultiPartParser],
+        permission_classes=[IsAuthenticated, IsAdminClienteOrGerente],
+    )
+    def import_catalog(self, request):
+        """Carga masiva desde CSV/XLSX (campo ``file``); ``?dry_run=1`` solo valida."""
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise serializers.ValidationError({'file': 'Adjunte un archivo CSV o XLSX.'})
+        params = request.query_params
+        try:
+            summary = import_products(
+                request.user.company,
+                read_rows(upload.file, upload.name),
+                update_existing=params.get('update', 'true') != 'false',
+                dry_run=params.get('dry_run') in ('1', 'true'),
+            )
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({'file': exc.messages})
+        return Response(summary)
 
     def perform_create(self, serializer):
         serializer.save(company=self.request.user.company)
 
 
-class SupplierViewSet(viewsets.ModelViewSet):
+class SupplierViewSet(RutLookupMixin, SerializerTimingMixin, viewsets.ModelViewSet):
     serializer_class = SupplierSerializer
     permission_classes = [IsAuthenticated, IsAdminClienteOrGerente]
 
     def get_queryset(self):
-        return Supplier.objects.filter(company=self.request.user.company)
+        return Supplier.objects.for_tenant(self.request.user.company)
 
     def perform_create(self, serializer):
         serializer.save(company=self.request.user.company)
 
 
-class InventoryViewSet(viewsets.ModelViewSet):
+class InventoryViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     serializer_class = InventorySerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        queryset = Inventory.objects.filter(branch__company=self.request.user.company)
-        branch_id = self.request.query_params.get('branch')
+        queryset = Inventory.objects.for_tenant(self.request.user.company).select_related('product')
+        branch_id = branch_filter(self.request)
         if branch_id:
             queryset = queryset.filter(branch_id=branch_id)
         return queryset
 
+    def perform_create(self, serializer):
+        inventory = serializer.save()
+        record_inventory_change(inventory, None, None)
+
+    def perform_update(self, serializer):
+        previous_stock = serializer.instance.stock
+        previous_reorder_point = serializer.instance.reorder_point
+        inventory = serializer.save()
+        record_inventory_change(inventory, previous_stock, previous_reorder_point)
+
+    @action(detail=False, methods=['get'], url_path='low-stock', permission_classes=[IsAuthenticated, IsAdminClienteOrGerente])
+    def low_stock(self, request):
+        """Filas con ``stock <= reorder_point`` (índice parcial ``inventory_low_stock_idx``)."""
+
+        queryset = self.get_queryset().filter(stock__lte=F('reorder_point'))
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.serialize(page, many=True))
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdminClienteOrGerente])
+    def export(self, request):
+        """Stock por sucursal y producto en CSV/NDJSON (``?output=``, ``?gzip=1``, ``?branch=``)."""
+
+        options = export_params(request)
+        columns, rows = inventory_rows(request.user.company, branch_filter(request))
+        return streaming_export('inventario', columns, rows, options['output'], options['compress'])
+
+
+class SaleViewSet(
+    SerializerTimingMixin,
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Ventas: se registran y anulan por ``core.services``, no se editan."""
 
-class SaleViewSet(viewsets.ModelViewSet):
     serializer_class = SaleSerializer
     permission_classes = [IsAuthenticated]
+    pagination_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
-        return Sale.objects.filter(branch__company=self.request.user.company)
+        return Sale.objects.for_tenant(self.request.user.company).prefetch_related(
+            Prefetch('items', queryset=SaleItem.objects.only('sale', *ITEM_FIELDS))
+        )
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        delete_sale(instance)
+
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[StreamingJSONArrayParser, NDJSONParser])
+    def bulk(self, request):
+        """Sincroniza ventas offline (arreglo JSON o NDJSON) deduplicando por ``client_id``.
+
+        Si el cuerpo se corta o trae JSON inválido responde 400 con los
+        resultados de los registros ya procesados y el error en ``detail``.
+        """
+
+        results, error = sync_sales(request.data, request.user)
+        summary = {name: 0 for name in ('created', 'duplicate', 'error')}
+        for result in results:
+            summary[result['status']] += 1
+        body = {**summary, 'results': results}
+        if error is not None:
+            body['detail'] = error.detail
+            return Response(body, status=status.HTTP_400_BAD_REQUEST)
+        return Response(body)
 
-class PurchaseViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdminClienteOrGerente])
+    def export(self, request):
+        """Una fila por ítem vendido; filtra por ``date_from``/``date_to``."""
+
+        options = export_params(request)
+        columns, rows = sales_rows(request.user.company, options['date_from'], options['date_to'])
+        return streaming_export('ventas', columns, rows, options['output'], options['compress'])
+
+
+class PurchaseViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     serializer_class = PurchaseSerializer
     permission_classes = [IsAuthenticated, IsAdminClienteOrGerente]
+    pagination_ordering = ('-date', '-id')
 
     def get_queryset(self):
-        return Purchase.objects.filter(branch__company=self.request.user.company)
+        return Purchase.objects.for_tenant(self.request.user.company).prefetch_related(
+            Prefetch('items', queryset=PurchaseItem.objects.only('purchase', *ITEM_FIELDS))
+        )
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'create' and isinstance(self.request.data, dict):
+            # Sucursal, proveedor y productos solo de la compañía del usuario.
+            data = self.request.data
+            company = self.request.user.company
+            context['branch_cache'] = Branch.objects.filter(company=company).in_bulk(
+                valid_pks(Branch, related_ids([data], 'branch'))
+            )
+            context['supplier_cache'] = Supplier.objects.filter(company=company).in_bulk(
+                valid_pks(Supplier, related_ids([data], 'supplier'))
+            )
+            context['product_cache'] = Product.objects.filter(company=company).in_bulk(
+                valid_pks(Product, item_product_ids([data]))
+            )
+        return context
 
-class OrderViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Una fila por ítem comprado; filtra por ``date_from``/``date_to``."""
+
+        options = export_params(request)
+        columns, rows = purchases_rows(request.user.company, options['date_from'], options['date_to'])
+        return streaming_export('compras', columns, rows, options['output'], options['compress'])
+
+
+class OrderViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_ordering = ('-created_at', '-id')
 
     def get_permissions(self):
         if self.request.method in permissions.SAFE_METHODS:
             return [AllowAny()]
-        return [IsAuthenticated()]
+        return super().get_permissions()
 
     def get_queryset(self):
         if self.request.user.is_authenticated and self.request.user.company:
-            return Order.objects.filter(company=self.request.user.company)
+            return Order.objects.for_tenant(self.request.user.company).prefetch_related(
+                Prefetch('items', queryset=OrderItem.objects.only('order', *ITEM_FIELDS))
+            )
         return Order.objects.none()
 
     def perform_create(self, serializer):
         serializer.save(company=self.request.user.company)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='bulk-status',
+        permission_classes=[IsAuthenticated, IsAdminClienteOrGerente],
+    )
+    def bulk_status(self, request):
+        """Cambia el estado de muchas órdenes respetando ``ORDER_TRANSITIONS``."""
+
+        serializer = OrderBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        order_ids = data.get('ids')
+        if not order_ids:
+            queryset = Order.objects.for_tenant(request.user.company).filter(
+                status=data['from_status'], **local_day_range('created_at', data.get('date_from'), data.get('date_to'))
+            )
+            order_ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:OrderBulkStatusSerializer.MAX_ORDERS])
+
+        result = transition_orders(request.user.company, order_ids, data['status'])
+        return Response({'moved_count': len(result['moved']), 'rejected_count': len(result['rejected']), **result})
+
+
+class StockTransferViewSet(
+    SerializerTimingMixin,
+    mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet,
+):
+    """Traspasos de stock entre sucursales; no se editan ni eliminan."""
+
+    serializer_class = StockTransferSerializer
+    permission_classes = [IsAuthenticated, IsAdminClienteOrGerente]
+    pagination_ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        return StockTransfer.objects.for_tenant(self.request.user.company).prefetch_related(
+            Prefetch('items', queryset=StockTransferItem.objects.only('transfer', 'id', 'product', 'quantity'))
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'create' and isinstance(self.request.data, dict):
+            # Sucursales y productos de la compañía en una consulta cada uno,
+            # no una por línea del traspaso.
+            data = self.request.data
+            company = self.request.user.company
+            context['branch_cache'] = Branch.objects.filter(company=company).in_bulk(
+                valid_pks(Branch, related_ids([data], 'source_branch') | related_ids([data], 'destination_branch'))
+            )
+            context['product_cache'] = Product.objects.filter(company=company).in_bulk(
+                valid_pks(Product, item_product_ids([data]))
+            )
+        return context
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class StockAlertViewSet(SerializerTimingMixin, viewsets.ReadOnlyModelViewSet):
+    """Feed de cruces del punto de reposición para gerentes."""
+
+    serializer_class = StockAlertSerializer
+    permission_classes = [IsAuthenticated, IsAdminClienteOrGerente]
+    pagination_ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        queryset = StockAlert.objects.for_tenant(self.request.user.company).select_related('product')
+        params = self.request.query_params
+        branch_id = branch_filter(self.request)
+        if branch_id:
+            queryset = queryset.filter(branch_id=branch_id)
+        if params.get('pending') == 'true':
+            queryset = queryset.filter(acknowledged=False)
+        return queryset
+
+    @action(detail=True, methods=['post'])
+    def acknowledge(self, request, pk=None):
+        alert = self.get_object()
+        alert.acknowledged = True
+        alert.save(update_fields=['acknowledged'])
+        return Response(self.serialize(alert))
+
+
+class ReportViewSet(viewsets.ViewSet):
+    """Reportes de ventas servidos desde los rollups diarios."""
+
+    permission_classes = [IsAuthenticated, IsAdminClienteOrGerente, PlanFeaturePermission]
+    required_plan_feature = 'reports_standard'
+    default_range_days = 30
+
+    def _params(self, request):
+        params = ReportParamsSerializer(
+            data=request.query_params, context={'default_range_days': self.default_range_days}
+        )
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        return data['date_from'], data['date_to'], data.get('branch')
+
+    @action(detail=False, methods=['get'])
+    def sales(self, request):
+        """Ventas diarias por sucursal (plan Estándar o superior)."""
+
+        rows = branch_daily_sales(request.user.company, *self._params(request))
+        return Response(BranchDailySalesSerializer(rows, many=True).data)
+
+    @action(detail=False, methods=['get'], required_plan_feature='reports_advanced')
+    def products(self, request):
+        """Ranking de productos con margen por costo (plan Premium)."""
+
+        rows = product_sales(request.user.company, *self._params(request))
+        return Response(ProductSalesSerializer(rows, many=True).data)
+
+
+class LoginTokenObtainPairView(TokenObtainPairView):
+    """``/api/token/`` con el control de carga de ``core.throttling`` antes del hash."""
+
+    def post(self, request, *args, **kwargs):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        username = username if isinstance(username, str) else None
+        try:
+            check_login(request, username, endpoint='jwt')
+        except LoginRejected as rejected:
+            if rejected.reason == 'unknown_user':
+                raise AuthenticationFailed(
+                    TokenObtainPairSerializer.default_error_messages['no_active_account'], 'no_active_account'
+                )
+            raise Throttled(wait=rejected.wait)
+        try:
+            response = super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            login_failed(username)
+            raise
+        login_succeeded(username)
+        return response
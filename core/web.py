@@ -1,5 +1,8 @@
 """Vistas web (templates) para login y dashboards con redirección por rol."""
 
+from math import ceil
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.shortcuts import redirect, render
@@ -8,9 +11,11 @@ from django.utils import timezone
 from django.views import View
 from django.views.generic import TemplateView
 
+from .dashboard import dashboard_kpis
 from .models import PLANES, Company, Subscription
 from .permissions import RoleRequiredMixin
-from .utils import build_menu_flags, get_company_plan
+from .throttling import LoginRejected, check_login, login_failed, login_succeeded
+from .utils import build_menu_flags, get_company_plan, load_entitlements
 
 
 ROLE_DASHBOARD_URLS = {
@@ -32,10 +37,23 @@ class RoleLoginView(View):
         username = request.POST.get("username")
         password = request.POST.get("password")
 
+        try:
+            check_login(request, username, endpoint="web")
+        except LoginRejected as rejected:
+            if rejected.reason == "unknown_user":
+                messages.error(request, "Credenciales inválidas")
+                return render(request, self.template_name, status=401)
+            messages.error(request, f"Demasiados intentos. Intente nuevamente en {ceil(rejected.wait)} segundos.")
+            response = render(request, self.template_name, status=429)
+            response["Retry-After"] = str(ceil(rejected.wait))
+            return response
+
         user = authenticate(request, username=username, password=password)
         if not user:
+            login_failed(username)
             messages.error(request, "Credenciales inválidas")
             return render(request, self.template_name, status=401)
+        login_succeeded(username)
 
         if not user.is_active:
             messages.error(request, "Usuario inactivo")
@@ -57,14 +75,20 @@ class BaseDashboardView(RoleRequiredMixin, TemplateView):
     template_name = "dashboard.html"
     role_label = ""
     allowed_roles = []
+    low_stock_roles = ["admin_cliente", "gerente"]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        plan_name = get_company_plan(self.request.user.company) if self.request.user.is_authenticated else None
+        # Por company_id: los entitlements salen de la caché sin cargar la compañía.
+        company_id = self.request.user.company_id
+        plan_name = load_entitlements(company_id).effective_plan if company_id else None
         context.update({
             "role_label": self.role_label,
             "plan_name": plan_name or "Sin Plan",
             "menu_flags": build_menu_flags(self.request.user.role, plan_name),
+            # Foto compartida por compañía (ver core.dashboard); el template cachea el fragmento.
+            "kpis": dashboard_kpis(self.request.user.company_id, self.request.user.role),
+            "kpi_fragment_timeout": settings.DASHBOARD_STALE_SECONDS,
         })
         return context
 
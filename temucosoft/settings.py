@@ -45,13 +45,18 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication', 
+        'core.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Cursor estable (keyset); cada ViewSet define ``pagination_ordering``.
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 MIDDLEWARE = [
+    # Primero, para medir la request completa (ver core.metrics).
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -96,6 +101,94 @@ DATABASES = {
 }
 
 
+# Cache
+# Memoria local por proceso salvo que se indique ``REDIS_URL`` (caché compartida).
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'temucosoft',
+        }
+    }
+
+# Segundos que se reutiliza la foto de plan/features de una compañía. Con caché
+# local cada proceso puede ver un cambio de plan con este retraso máximo.
+ENTITLEMENTS_CACHE_TIMEOUT = int(os.environ.get('ENTITLEMENTS_CACHE_TIMEOUT', '60'))
+
+# El JWT de acceso lleva rol, compañía y plan firmados (ver core.authentication);
+# la revocación compara su versión con la guardada en caché por estos segundos.
+# Con caché local es el retraso máximo con que otro proceso ve una desactivación.
+AUTH_VERSION_CACHE_TIMEOUT = int(os.environ.get('AUTH_VERSION_CACHE_TIMEOUT', '30'))
+
+SIMPLE_JWT = {
+    # Firma un hash de la contraseña: cambiarla revoca también los refresh tokens.
+    'CHECK_REVOKE_TOKEN': True,
+    'TOKEN_OBTAIN_SERIALIZER': 'core.authentication.TenantTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'core.authentication.TenantTokenRefreshSerializer',
+}
+
+# Vida de la versión del catálogo (ETag de productos). Con caché local acota
+# cuánto puede tardar otro proceso en ver un cambio; con Redis puede subirse.
+CATALOG_VERSION_TIMEOUT = int(os.environ.get('CATALOG_VERSION_TIMEOUT', '60'))
+# Segundos que se guardan las páginas de catálogo ya serializadas (0 desactiva).
+CATALOG_PAGE_CACHE_TIMEOUT = int(os.environ.get('CATALOG_PAGE_CACHE_TIMEOUT', '0'))
+
+# Control de carga del login (ver core.throttling): intentos permitidos por
+# ventana deslizante (intentos, segundos) antes de verificar la contraseña.
+# Un diccionario vacío lo desactiva. Con LOGIN_THROTTLE_SHARED las ventanas se
+# guardan en la caché (compartida con REDIS_URL) en vez de en cada proceso.
+# El límite por IP es un techo contra barridos de usuarios: las sucursales
+# detrás de NAT comparten IP, así que el control fino es por usuario.
+LOGIN_THROTTLE_RATES = {
+    'username': (10, 300),
+    'ip': (int(os.environ.get('LOGIN_THROTTLE_IP_LIMIT', '600')), 60),
+}
+LOGIN_THROTTLE_SHARED = os.environ.get('LOGIN_THROTTLE_SHARED', '') == '1'
+# Segundos que se recuerda un usuario inexistente para rechazarlo sin hashear (0 desactiva).
+LOGIN_UNKNOWN_USER_TIMEOUT = int(os.environ.get('LOGIN_UNKNOWN_USER_TIMEOUT', '300'))
+
+# Foto de KPIs de los dashboards (ver core.dashboard): se sirve sin recalcular
+# durante FRESH; hasta STALE se sirve la anterior mientras se recalcula en
+# segundo plano. LOCK_WAIT es lo que espera una request sin foto a que otro
+# proceso termine de calcularla. REFRESH_WORKERS acota los hilos por proceso
+# que recalculan fotos vencidas; con 0 se recalculan en la misma request.
+DASHBOARD_FRESH_SECONDS = int(os.environ.get('DASHBOARD_FRESH_SECONDS', '60'))
+DASHBOARD_STALE_SECONDS = int(os.environ.get('DASHBOARD_STALE_SECONDS', '900'))
+DASHBOARD_LOCK_TIMEOUT = 30
+DASHBOARD_LOCK_WAIT = 2.0
+DASHBOARD_REFRESH_WORKERS = int(os.environ.get('DASHBOARD_REFRESH_WORKERS', '2'))
+
+# Vistas de lectura async publicadas bajo /api/async/ (ver core.async_views),
+# p. ej. "products,inventory,me,dashboard,low-stock". Solo tienen sentido con ASGI.
+ASYNC_READ_ROUTES = [name for name in os.environ.get('ASYNC_READ_ROUTES', '').split(',') if name]
+
+# Métricas Prometheus en /metrics; se exige "Authorization: Bearer <token>".
+# Sin token el endpoint solo responde con DEBUG activo.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Requests más lentas que esto (ms) se registran en el logger core.slow_requests
+# con sus consultas SQL más costosas. 0 desactiva la captura.
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', '0'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
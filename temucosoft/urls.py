@@ -2,15 +2,21 @@ from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import RedirectView
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
+from core.async_views import async_urlpatterns
+from core.metrics import metrics_view
 from core.views import (
     BranchViewSet,
     CompanyViewSet,
     InventoryViewSet,
+    LoginTokenObtainPairView,
     OrderViewSet,
     ProductViewSet,
     PurchaseViewSet,
+    ReportViewSet,
     SaleViewSet,
+    StockAlertViewSet,
+    StockTransferViewSet,
     SubscriptionViewSet,
     SupplierViewSet,
     UserViewSet,
@@ -38,16 +44,21 @@ router.register(r'subscriptions', SubscriptionViewSet, basename='subscription')
 router.register(r'suppliers', SupplierViewSet, basename='supplier')
 router.register(r'purchases', PurchaseViewSet, basename='purchase')
 router.register(r'orders', OrderViewSet, basename='order')
+router.register(r'reports', ReportViewSet, basename='report')
+router.register(r'stock-alerts', StockAlertViewSet, basename='stock-alert')
+router.register(r'stock-transfers', StockTransferViewSet, basename='stock-transfer')
 
 urlpatterns = [
     # Redirección raíz a login
     path('', RedirectView.as_view(url='/login/', permanent=False)),
     
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
+    path('api/async/', include(async_urlpatterns())),
     path('api/', include(router.urls)),
     
     # JWT Auth
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/', LoginTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
     # Rutas Frontend